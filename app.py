@@ -2,22 +2,60 @@ import os
 import sys
 import time
 import json
+import math
 import re
+import base64
 import hashlib
 import threading
-import queue
-import subprocess
-import tempfile
 import logging
-import requests
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import date
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from urllib.parse import quote
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None  # Streaming voice input over WebSocket is disabled without flask-sock
 import google.generativeai as genai
-from gtts import gTTS
 from dotenv import load_dotenv
-from typing import Dict, List
 import datetime
+from app.helpers.audio import VOICE_MAX_SECONDS, convert_to_wav, encode_for_upload, get_audio_stats, wav_size
+from app.helpers.audio_cache import get_audio_cache
+from app.helpers.fastpath import fast_path
+from app.helpers.ffmpeg import FFmpegBusyError, ffmpeg_available, ffmpeg_pool
+from app.helpers.geocoding import Geocoder, RateLimitedError, geohash_decode, geohash_encode, normalize_query
+from app.helpers.llm import (
+    GENERATION_CONFIG, SYSTEM_HISTORY_ENTRIES, SYSTEM_INSTRUCTION_SUPPORTED,
+    get_model, start_chat, warm_models, with_system_instruction
+)
+from app.helpers.maps import MapProviderClient, all_map_client_stats
+from app.helpers.phrases import FALLBACK_RESPONSE, phrase_bank, phrase_text
+from app.helpers.readiness import ReadinessProbes
+from app.helpers.response_cache import ResponseCache, context_fingerprint
+from app.helpers.route_cache import RouteCache
+from app.helpers.poi import POIIndex, POI_CATEGORIES, POI_MAX_RADIUS_KM, valid_coordinates
+from app.helpers.prompts import (
+    CHAT_SYSTEM_INSTRUCTION, INTENT_PROFILES, SMV_CHATBOT_SYSTEM_INSTRUCTION, build_chat_context, classify_intent,
+    intent_needs_places, prompt_stats
+)
+from app.helpers.sessions import SessionStore, all_session_stats
+from app.helpers.singleflight import SingleFlight, all_singleflight_stats
+from app.helpers.tts_jobs import TTSJobQueue
+from app.helpers.voice_stream import VoiceStream, stream_decoder_pool
+from app.helpers.tts import (
+    clean_text_for_tts,
+    derive_speed_variant,
+    join_segments,
+    get_tts_stats,
+    parse_speed,
+    speed_bucket,
+    split_into_sentences,
+    submit_segment,
+    synthesize_playlist,
+    synthesize_segments,
+    synthesize_text,
+)
 
 # Load environment variables
 load_dotenv()
@@ -35,45 +73,56 @@ logging.basicConfig(
 # Create a named logger that can be imported elsewhere
 logger = logging.getLogger(__name__)
 
-# Try to import speech_recognition, but provide a fallback
-SPEECH_RECOGNITION_AVAILABLE = False
-SPEECH_RECOGNITION_ERROR = "Module not installed"
+# Fast boot: run startup checks as background readiness probes instead of
+# blocking module import (set SMV_FAST_BOOT=false to run them synchronously)
+FAST_BOOT = os.getenv('SMV_FAST_BOOT', 'true').lower() == 'true'
 
-try:
-    # Check if aifc module is available without importing it directly
-    aifc_available = False
-    try:
-        # Try to import a module that depends on aifc
-        import importlib.util
-        aifc_spec = importlib.util.find_spec('aifc')
-        aifc_available = aifc_spec is not None
-        
-        if aifc_available:
-            logger.info("aifc module is available.")
-        else:
-            logger.error("aifc module is not available. This is required by speech_recognition.")
-            SPEECH_RECOGNITION_ERROR = "Missing aifc module (required dependency)"
-    except Exception as e:
-        logger.error(f"Error checking for aifc module: {e}")
-        SPEECH_RECOGNITION_ERROR = "Error checking for required dependencies"
-    
-    # Only try to import speech_recognition if aifc is available
-    if aifc_available:
-        import speech_recognition as sr
-        # Test if we can create a recognizer to confirm the module is working
-        test_recognizer = sr.Recognizer()
-        SPEECH_RECOGNITION_AVAILABLE = True
-        logger.info("Speech recognition module successfully imported and initialized.")
-except ImportError as e:
-    logger.warning(f"speech_recognition module could not be imported: {e}. Speech-to-text functionality will be disabled.")
-    SPEECH_RECOGNITION_ERROR = f"Import error: {str(e)}"
-except Exception as e:
-    logger.warning(f"Error initializing speech recognition: {e}. Speech-to-text functionality will be disabled.")
-    SPEECH_RECOGNITION_ERROR = f"Initialization error: {str(e)}"
+# speech_recognition is imported lazily on first use, see get_speech_recognition()
+sr = None
+SPEECH_RECOGNITION_AVAILABLE = None  # Unknown until first checked
+SPEECH_RECOGNITION_ERROR = "Not checked yet"
+_speech_recognition_lock = threading.Lock()
+
+def get_speech_recognition():
+    """
+    Import speech_recognition on first use.
+    Returns the module, or None if it is not usable on this system.
+    """
+    global sr, SPEECH_RECOGNITION_AVAILABLE, SPEECH_RECOGNITION_ERROR
+    
+    if SPEECH_RECOGNITION_AVAILABLE is None:
+        with _speech_recognition_lock:
+            if SPEECH_RECOGNITION_AVAILABLE is None:
+                try:
+                    # speech_recognition depends on aifc, which newer Pythons drop
+                    import importlib.util
+                    if importlib.util.find_spec('aifc') is None:
+                        SPEECH_RECOGNITION_ERROR = "Missing aifc module (required dependency)"
+                        logger.error("aifc module is not available. This is required by speech_recognition.")
+                        SPEECH_RECOGNITION_AVAILABLE = False
+                    else:
+                        import speech_recognition
+                        # Test if we can create a recognizer to confirm the module is working
+                        speech_recognition.Recognizer()
+                        sr = speech_recognition
+                        SPEECH_RECOGNITION_ERROR = None
+                        SPEECH_RECOGNITION_AVAILABLE = True
+                        logger.info("Speech recognition module successfully imported and initialized.")
+                except ImportError as e:
+                    logger.warning(f"speech_recognition module could not be imported: {e}. Speech-to-text functionality will be disabled.")
+                    SPEECH_RECOGNITION_ERROR = f"Import error: {str(e)}"
+                    SPEECH_RECOGNITION_AVAILABLE = False
+                except Exception as e:
+                    logger.warning(f"Error initializing speech recognition: {e}. Speech-to-text functionality will be disabled.")
+                    SPEECH_RECOGNITION_ERROR = f"Initialization error: {str(e)}"
+                    SPEECH_RECOGNITION_AVAILABLE = False
+    
+    return sr if SPEECH_RECOGNITION_AVAILABLE else None
 
 # Initialize Flask app directly
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+sock = Sock(app) if Sock is not None else None
 app.config['SECRET_KEY'] = 'your-secret-key'
 
 # Ensure necessary directories exist
@@ -88,68 +137,104 @@ TOMTOM_API_KEY = os.getenv('TOMTOM_API_KEY', "n0iAXNs9HZyBNXupJL3xQUeA96jlOgXJ")
 
 # OpenStreetMap Configuration
 OPENSTREETMAP_NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+OPENSTREETMAP_REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
 OPENSTREETMAP_USER_AGENT = "E-RickshawAssistant/1.0"  # Required by OSM Nominatim API
 
-# Initialize Google Generative AI with API key
+# Pooled map provider clients with timeouts and retries, one per host.
+# Nominatim requests are paced by the geocoder's rate limiter, which takes one
+# token per request, so retries (including on 429) would exceed the limit
+nominatim_client = MapProviderClient('nominatim', 'https://nominatim.openstreetmap.org',
+                                     headers={'User-Agent': OPENSTREETMAP_USER_AGENT}, max_retries=0)
+tomtom_client = MapProviderClient('tomtom', 'https://api.tomtom.com')
+
+# Persistent geocoding cache with a Nominatim rate limit shared across workers
+geocoder = Geocoder()
+
+# Routes by grid-snapped endpoints; traffic timings expire much sooner than geometry
+route_cache = RouteCache()
+
+# Nearby places served from a prebuilt OSM extract, never from Overpass per request
+poi_index = POIIndex.load()
+
+# Ranking search results by ETA routes the top candidates concurrently
+ETA_RANK_TOP_N = int(os.getenv('ETA_RANK_TOP_N', 5))
+ETA_RANK_DEADLINE = float(os.getenv('ETA_RANK_DEADLINE', 4.0))
+ROUTING_MAX_WORKERS = int(os.getenv('ROUTING_MAX_WORKERS', 8))
+routing_executor = ThreadPoolExecutor(max_workers=ROUTING_MAX_WORKERS, thread_name_prefix='routing')
+
+# Initialize Google Generative AI with API key (no network access)
 try:
     genai.configure(api_key=GOOGLE_API_KEY)
     logger.info("Successfully configured Google Generative AI client")
-    
-    # Test the configuration by creating a simple model
-    test_model = genai.GenerativeModel("gemini-2.0-flash")
-    logger.info("Successfully created test model")
-    
-    # Self-test the Gemini API configuration
-    def test_gemini_api():
-        try:
-            # Use gemini-1.5-flash model for testing
-            test_model = genai.GenerativeModel("gemini-1.5-flash")
-            test_response = test_model.generate_content("Respond with 'API working' if you can read this.")
-            
-            if test_response and test_response.text and "API working" in test_response.text:
-                logger.info("✅ Gemini API self-test successful")
-                return True
-            else:
-                logger.error("❌ Gemini API self-test failed: Unexpected response")
-                return False
-        except Exception as e:
-            logger.error(f"❌ Gemini API self-test failed with error: {e}")
-            return False
-
-    # Run the self-test
-    gemini_api_working = test_gemini_api()
-    
 except Exception as e:
     logger.error(f"Error configuring Google Generative AI: {e}")
     print(f"API KEY CONFIGURATION ERROR: {e}")
 
-# Generation configuration for the model
-GENERATION_CONFIG = {
-    "temperature": 0.7,
-    "top_p": 0.95,
-    "top_k": 40,
-    "max_output_tokens": 1024,
-}
+# ----- Readiness Probes -----
+readiness = ReadinessProbes()
+
+def probe_gemini_models():
+    """Pre-create the shared models used by the endpoints (see app/helpers/llm.py)."""
+    warm_models([
+        ("gemini-1.5-flash", GENERATION_CONFIG, CHAT_SYSTEM_INSTRUCTION),
+        ("gemini-1.5-flash", None, SMV_CHATBOT_SYSTEM_INSTRUCTION),
+        ("gemini-2.0-flash", None),
+    ])
+    return True, "Models registered"
+
+def test_gemini_api():
+    """Self-test the Gemini API configuration with a live request."""
+    try:
+        # Use gemini-1.5-flash model for testing
+        test_model = get_model("gemini-1.5-flash")
+        test_response = test_model.generate_content("Respond with 'API working' if you can read this.")
+        
+        if test_response and test_response.text and "API working" in test_response.text:
+            logger.info("✅ Gemini API self-test successful")
+            return True, "API working"
+        else:
+            logger.error("❌ Gemini API self-test failed: Unexpected response")
+            return False, "Unexpected response"
+    except Exception as e:
+        logger.error(f"❌ Gemini API self-test failed with error: {e}")
+        return False, str(e)
+
+def probe_speech_recognition():
+    """Check whether the speech_recognition module can be used."""
+    available = get_speech_recognition() is not None
+    return available, "Available" if available else SPEECH_RECOGNITION_ERROR
+
+def probe_ffmpeg():
+    """Check whether ffmpeg can be run, caching the result for the request paths."""
+    available = ffmpeg_available(refresh=True)
+    return available, "Available" if available else "Not found"
+
+def probe_phrase_bank():
+    """Pre-render greetings, fallbacks and other fixed phrases into the TTS cache."""
+    count = phrase_bank.warm(os.path.join(app.static_folder, 'audio', 'cache'))
+    return count > 0, f"{count} phrases rendered"
+
+readiness.register('gemini_models', probe_gemini_models)
+readiness.register('gemini_api', test_gemini_api)
+readiness.register('speech_recognition', probe_speech_recognition, required=False)
+readiness.register('ffmpeg', probe_ffmpeg, required=False)
+readiness.register('phrase_bank', probe_phrase_bank, required=False)
 
 # ----- Conversation Setup -----
-conversation_history = {}  # Dictionary to store conversation history for each session
+conversation_history = SessionStore('chat')  # Bounded store of conversation history for each session
 today = str(date.today())
 
 # ----- Global Variables -----
-tts_queue = queue.Queue()
-tts_cache = {}  # Cache for TTS audio files
+tts_queue = TTSJobQueue()  # Background TTS workers; holds the job table of pending and finished audio
 
 # ----- Map API Functions -----
 def geocode_with_openstreetmap(query):
     """
     Geocode an address or location name using OpenStreetMap's Nominatim API.
+    Results are cached persistently and upstream calls are rate limited.
     Returns location data including coordinates.
     """
-    try:
-        headers = {
-            'User-Agent': OPENSTREETMAP_USER_AGENT
-        }
-        
+    def fetch():
         params = {
             'q': query,
             'format': 'json',
@@ -157,42 +242,74 @@ def geocode_with_openstreetmap(query):
         }
         
         logger.info(f"Sending geocoding request to OpenStreetMap for query: {query}")
-        response = requests.get(
-            OPENSTREETMAP_NOMINATIM_URL,
-            params=params,
-            headers=headers
-        )
+        response = nominatim_client.get(OPENSTREETMAP_NOMINATIM_URL, params=params)
         
-        # Check if the request was successful
-        if response.status_code == 200:
-            data = response.json()
-            if data and len(data) > 0:
-                # Extract relevant information
-                location = data[0]
-                result = {
-                    'lat': float(location.get('lat')),
-                    'lon': float(location.get('lon')),
-                    'display_name': location.get('display_name'),
-                    'type': location.get('type'),
-                    'importance': location.get('importance')
-                }
-                logger.info(f"OpenStreetMap geocoding successful: {result}")
-                return result
-            else:
-                logger.warning(f"No results found for query: {query}")
-                return None
-        else:
-            logger.error(f"OpenStreetMap API error: {response.status_code}, {response.text}")
+        # Errors are raised so they are not cached like an empty result
+        response.raise_for_status()
+        data = response.json()
+        if not data:
+            logger.warning(f"No results found for query: {query}")
             return None
-            
+        
+        # Extract relevant information
+        location = data[0]
+        result = {
+            'lat': float(location.get('lat')),
+            'lon': float(location.get('lon')),
+            'display_name': location.get('display_name'),
+            'type': location.get('type'),
+            'importance': location.get('importance')
+        }
+        logger.info(f"OpenStreetMap geocoding successful: {result}")
+        return result
+    
+    try:
+        return geocoder.lookup('search', normalize_query(query), fetch)
+    except RateLimitedError as e:
+        logger.warning(str(e))
+        return None
     except Exception as e:
         logger.error(f"Error in OpenStreetMap geocoding: {e}")
         return None
 
-def search_with_tomtom(query, lat=None, lon=None):
+def reverse_geocode(lat, lon):
+    """
+    Reverse geocode coordinates using OpenStreetMap's Nominatim API.
+    
+    Lookups are snapped to the center of their geohash cell, so every driver
+    within the same cell shares one cached result.
+    Returns the Nominatim reverse result, or None if nothing was found.
+    Raises RateLimitedError when the shared rate limit is exhausted, and
+    ValueError for non-finite or out-of-range coordinates (which would map
+    to a bogus cell in the persistent cache).
+    """
+    if not valid_coordinates(lat, lon):
+        raise ValueError(f"Invalid coordinates: lat={lat}, lon={lon}")
+    cell = geohash_encode(lat, lon)
+    cell_lat, cell_lon = geohash_decode(cell)
+    
+    def fetch():
+        params = {
+            'format': 'json',
+            'lat': f"{cell_lat:.6f}",
+            'lon': f"{cell_lon:.6f}",
+            'zoom': 18,
+            'addressdetails': 1
+        }
+        logger.info(f"Sending reverse geocoding request to OpenStreetMap for cell {cell}")
+        response = nominatim_client.get(OPENSTREETMAP_REVERSE_URL, params=params)
+        response.raise_for_status()
+        data = response.json()
+        # Nominatim reports "nothing here" as an error object
+        return None if 'error' in data else data
+    
+    return geocoder.lookup('reverse', cell, fetch)
+
+def search_with_tomtom(query, lat=None, lon=None, timeout=None):
     """
     Search for places using TomTom's Search API.
-    Can search by query string or by coordinates.
+    Can search by query string or by coordinates. Pass a timeout in seconds
+    to bound the call (e.g. by a deadline); it is then not retried.
     """
     if not TOMTOM_API_KEY:
         logger.error("TomTom API key is not configured")
@@ -212,11 +329,14 @@ def search_with_tomtom(query, lat=None, lon=None):
             params['lat'] = lat
             params['lon'] = lon
         
-        # Construct the URL with the query
-        url = f"{base_url}/{query}.json"
+        # Construct the URL with the query, escaped since it is a path segment
+        url = f"{base_url}/{quote(query, safe='')}.json"
         
         logger.info(f"Sending search request to TomTom API for query: {query}")
-        response = requests.get(url, params=params)
+        if timeout is None:
+            response = tomtom_client.get(url, params=params)
+        else:
+            response = tomtom_client.get(url, params=params, timeout=timeout, max_retries=0)
         
         if response.status_code == 200:
             data = response.json()
@@ -252,10 +372,50 @@ def search_with_tomtom(query, lat=None, lon=None):
         logger.error(f"Error in TomTom search: {e}")
         return None
 
+def fetch_route_with_tomtom(start_lat, start_lon, end_lat, end_lon, mode='car', summary_only=False):
+    """
+    Request a traffic-aware route from TomTom's Routing API.
+    
+    Returns the first route of the response (its summary only when
+    summary_only is set), or None if no route was found. Raises on
+    provider errors.
+    """
+    base_url = "https://api.tomtom.com/routing/1/calculateRoute"
+    
+    # Construct the coordinates part of the URL
+    coordinates = f"{start_lat},{start_lon}:{end_lat},{end_lon}"
+    
+    # Set up the parameters
+    params = {
+        'key': TOMTOM_API_KEY,
+        'travelMode': mode,
+        'traffic': 'true',
+        'language': 'en-US'
+    }
+    if summary_only:
+        params['routeRepresentation'] = 'summaryOnly'
+    else:
+        params['instructionsType'] = 'text'
+    
+    # Construct the full URL
+    url = f"{base_url}/{coordinates}/json"
+    
+    logger.info(f"Sending {'summary ' if summary_only else ''}routing request to TomTom API from {start_lat},{start_lon} to {end_lat},{end_lon}")
+    response = tomtom_client.get(url, params=params)
+    if response.status_code != 200:
+        raise RuntimeError(f"TomTom Routing API error: {response.status_code}, {response.text}")
+    
+    routes = response.json().get('routes', [])
+    return routes[0] if routes else None
+
 def get_route_with_tomtom(start_lat, start_lon, end_lat, end_lon, mode='car'):
     """
     Get routing information between two points using TomTom's Routing API.
     
+    Routes are cached by grid-snapped start/end and mode: distance and
+    instructions for a long time, traffic timings only briefly, refreshed
+    with a summary-only request.
+    
     Args:
         start_lat: Starting point latitude
         start_lon: Starting point longitude
@@ -271,69 +431,131 @@ def get_route_with_tomtom(start_lat, start_lon, end_lat, end_lon, mode='car'):
         return None
         
     try:
-        base_url = "https://api.tomtom.com/routing/1/calculateRoute"
-        
-        # Construct the coordinates part of the URL
-        coordinates = f"{start_lat},{start_lon}:{end_lat},{end_lon}"
+        key = route_cache.key(start_lat, start_lon, end_lat, end_lon, mode)
+        (snapped_start_lat, snapped_start_lon), (snapped_end_lat, snapped_end_lon), _ = key
+        static, traffic = route_cache.get(key)
         
-        # Set up the parameters
-        params = {
-            'key': TOMTOM_API_KEY,
-            'travelMode': mode,
-            'traffic': 'true',
-            'instructionsType': 'text',
-            'language': 'en-US'
-        }
-        
-        # Construct the full URL
-        url = f"{base_url}/{coordinates}/json"
-        
-        logger.info(f"Sending routing request to TomTom API from {start_lat},{start_lon} to {end_lat},{end_lon}")
-        response = requests.get(url, params=params)
-        
-        if response.status_code == 200:
-            data = response.json()
-            routes = data.get('routes', [])
+        if static is None:
+            route = fetch_route_with_tomtom(snapped_start_lat, snapped_start_lon, snapped_end_lat, snapped_end_lon, mode)
+            if route is None:
+                logger.warning("No routes found")
+                return None
+            summary = route.get('summary', {})
             
-            if routes:
-                route = routes[0]  # Get the first (best) route
-                summary = route.get('summary', {})
-                
-                # Extract the relevant information
-                result = {
-                    'distance_meters': summary.get('lengthInMeters'),
-                    'travel_time_seconds': summary.get('travelTimeInSeconds'),
-                    'traffic_delay_seconds': summary.get('trafficDelayInSeconds', 0),
-                    'instructions': []
-                }
-                
-                # Extract turn-by-turn instructions
-                for leg in route.get('legs', []):
-                    for instruction in leg.get('instructions', []):
-                        result['instructions'].append({
-                            'instruction': instruction.get('message'),
-                            'distance_meters': instruction.get('routeOffsetInMeters'),
-                            'travel_time_seconds': instruction.get('travelTimeInSeconds')
-                        })
-                
-                logger.info(f"TomTom routing successful, route is {result['distance_meters']} meters")
-                return result
-            else:
+            # Static part: distance and turn-by-turn instructions
+            static = {
+                'distance_meters': summary.get('lengthInMeters'),
+                'instructions': []
+            }
+            for leg in route.get('legs', []):
+                for instruction in leg.get('instructions', []):
+                    static['instructions'].append({
+                        'instruction': instruction.get('message'),
+                        'distance_meters': instruction.get('routeOffsetInMeters'),
+                        'travel_time_seconds': instruction.get('travelTimeInSeconds')
+                    })
+            traffic = {
+                'travel_time_seconds': summary.get('travelTimeInSeconds'),
+                'traffic_delay_seconds': summary.get('trafficDelayInSeconds', 0)
+            }
+            route_cache.put(key, static=static, traffic=traffic)
+        elif traffic is None:
+            route = fetch_route_with_tomtom(snapped_start_lat, snapped_start_lon, snapped_end_lat, snapped_end_lon, mode, summary_only=True)
+            if route is None:
                 logger.warning("No routes found")
                 return None
-        else:
-            logger.error(f"TomTom Routing API error: {response.status_code}, {response.text}")
-            return None
+            summary = route.get('summary', {})
+            traffic = {
+                'travel_time_seconds': summary.get('travelTimeInSeconds'),
+                'traffic_delay_seconds': summary.get('trafficDelayInSeconds', 0)
+            }
+            route_cache.put(key, traffic=traffic)
+        
+        result = {
+            'distance_meters': static['distance_meters'],
+            'travel_time_seconds': traffic['travel_time_seconds'],
+            'traffic_delay_seconds': traffic['traffic_delay_seconds'],
+            'instructions': static['instructions']
+        }
+        logger.info(f"TomTom routing successful, route is {result['distance_meters']} meters")
+        return result
             
     except Exception as e:
         logger.error(f"Error in TomTom routing: {e}")
         return None
 
+def rank_places_by_eta(query, lat, lon, mode='car', top_n=ETA_RANK_TOP_N, deadline=ETA_RANK_DEADLINE):
+    """
+    Search places with TomTom and rank the nearest ones by travel time.
+    
+    Routes from (lat, lon) to the top_n results (by straight-line distance)
+    are computed concurrently on the routing pool, so ranking costs about one
+    routing round trip instead of top_n sequential ones. Whatever has not
+    been routed when the deadline passes is ranked after the routed places.
+    
+    Args:
+        query: Search query, e.g. "charging station"
+        lat: Origin latitude
+        lon: Origin longitude
+        mode: Transportation mode (car, pedestrian, bicycle)
+        top_n: Number of search results to route
+        deadline: Seconds to wait for routes, counted from the start of the search
+        
+    Returns:
+        (places, complete): places sorted by travel_time_seconds, each with
+        travel_time_seconds, traffic_delay_seconds and route_distance_meters
+        (None if not routed), and whether every route arrived in time;
+        an empty incomplete list if the search itself overran the deadline,
+        or (None, False) if the search failed
+    """
+    started = time.monotonic()
+    # The search shares the deadline, so it gets the time left and no retries
+    results = search_with_tomtom(query, lat, lon, timeout=deadline)
+    remaining = deadline - (time.monotonic() - started)
+    if results is None:
+        if remaining <= 0:
+            logger.warning(f"ETA ranking for '{query}': search overran the {deadline}s deadline")
+            return [], False
+        return None, False
+    
+    candidates = sorted(
+        (place for place in results if place['lat'] is not None and place['lon'] is not None),
+        key=lambda place: place['distance'] if place['distance'] is not None else float('inf')
+    )[:top_n]
+    if remaining <= 0:
+        # No time left to route: return the nearest results unranked
+        logger.warning(f"ETA ranking for '{query}': no time left to route after the search")
+        return [
+            {**place, 'travel_time_seconds': None, 'traffic_delay_seconds': None, 'route_distance_meters': None}
+            for place in candidates
+        ], False
+    futures = {
+        routing_executor.submit(get_route_with_tomtom, lat, lon, place['lat'], place['lon'], mode): place
+        for place in candidates
+    }
+    done, pending = wait(futures, timeout=max(0.0, deadline - (time.monotonic() - started)))
+    for future in pending:
+        future.cancel()
+    if pending:
+        logger.warning(f"ETA ranking for '{query}': {len(pending)} of {len(futures)} routes missed the {deadline}s deadline")
+    
+    places = []
+    for future, place in futures.items():
+        route = future.result() if future in done else None
+        places.append({
+            **place,
+            'travel_time_seconds': route['travel_time_seconds'] if route else None,
+            'traffic_delay_seconds': route['traffic_delay_seconds'] if route else None,
+            'route_distance_meters': route['distance_meters'] if route else None
+        })
+    # Routed places by travel time first, then the rest in search order
+    places.sort(key=lambda place: (place['travel_time_seconds'] is None, place['travel_time_seconds'] or 0))
+    return places, not pending
+
 # ----- Other Functions -----
 def get_session_history(session_id):
     """Get or initialize conversation history for a session."""
-    if session_id not in conversation_history:
-        conversation_history[session_id] = [
+    return conversation_history.get_or_create(session_id, lambda: [
             {"role": "system", "content": """You are SMV's specialized E-rickshaw Assistant, focused exclusively on helping drivers with their e-rickshaw related queries. 
 
 Key Guidelines:
@@ -413,44 +635,11 @@ Remember:
 - Include relevant dashboard data
 - End every response with SMV contact information
 - Only address e-rickshaw related queries."""}
-        ]
-    return conversation_history[session_id]
+        ])
 
 def check_ffmpeg_available():
-    """Check if ffmpeg is available on the system."""
-    try:
-        subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        logger.warning("FFmpeg is not available. Audio conversion will not work.")
-        return False
-
-def convert_webm_to_wav(webm_file):
-    """Convert WebM audio file to WAV format using ffmpeg."""
-    try:
-        # Create a temporary WAV file
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_wav:
-            wav_file = temp_wav.name
-        
-        logger.info(f"Converting WebM file {webm_file} to WAV format {wav_file}")
-        
-        # Use ffmpeg to convert WebM to WAV
-        process = subprocess.run(
-            ['ffmpeg', '-i', webm_file, '-ar', '16000', '-ac', '1', '-y', wav_file], 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE, 
-            check=True
-        )
-        
-        logger.info(f"Conversion completed successfully")
-        return wav_file
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error converting WebM to WAV: {e}")
-        logger.error(f"FFmpeg stderr: {e.stderr.decode() if e.stderr else 'No error output'}")
-        return None
-    except Exception as e:
-        logger.error(f"Unexpected error in conversion: {e}")
-        return None
+    """Check if ffmpeg is available on the system (probed once, then cached)."""
+    return ffmpeg_available()
 
 def direct_transcribe_audio(audio_file):
     """
@@ -458,7 +647,7 @@ def direct_transcribe_audio(audio_file):
     This is a fallback method when the speech_recognition library is not available.
     
     Args:
-        audio_file: Path to the WAV audio file
+        audio_file: WAV file object (see convert_to_wav)
         
     Returns:
         Transcribed text or None if transcription failed
@@ -470,20 +659,18 @@ def direct_transcribe_audio(audio_file):
             return None
             
         # Use Google's Generative AI API for transcription
-        # First, convert the audio file to base64
-        with open(audio_file, 'rb') as f:
-            audio_content = f.read()
+        # First, encode the in-memory audio compactly and convert it to base64
+        audio_content, mime_type = encode_for_upload(audio_file)
         
-        import base64
         audio_b64 = base64.b64encode(audio_content).decode('utf-8')
         
-        # Create a model instance
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        # Shared model instance
+        model = get_model('gemini-2.0-flash')
         
         # Send the audio to the model with a prompt to transcribe it
         response = model.generate_content([
             "Please transcribe the following audio accurately. Just return the transcription text without any additional commentary.",
-            {"mime_type": "audio/wav", "data": audio_b64}
+            {"mime_type": mime_type, "data": audio_b64}
         ])
         
         # Extract the transcription from the response
@@ -503,12 +690,14 @@ def transcribe_audio_with_google_api(audio_file):
     """
     Use Google's Speech Recognition API to transcribe audio.
     """
-    if not SPEECH_RECOGNITION_AVAILABLE:
+    sr = get_speech_recognition()
+    if sr is None:
         logger.warning("Speech recognition is not available")
         return None
     
     try:
-        logger.info(f"Transcribing audio file: {audio_file}")
+        logger.info("Transcribing in-memory WAV audio")
+        audio_file.seek(0)
         recognizer = sr.Recognizer()
         with sr.AudioFile(audio_file) as source:
             audio_data = recognizer.record(source)
@@ -527,44 +716,45 @@ def transcribe_audio_with_google_api(audio_file):
         logger.error(f"Error in transcription: {e}")
         return None
 
+def transcribe_wav(wav_file):
+    """
+    Transcribe a WAV file object with the best available recognizer.
+    Returns the transcribed text or None.
+    """
+    logger.info(f"Transcribing WAV audio, size: {wav_size(wav_file)} bytes")
+    
+    # Use direct Google API for transcription if speech_recognition is not available
+    if get_speech_recognition() is None:
+        logger.info("Using direct transcription method since speech_recognition is not available")
+        return direct_transcribe_audio(wav_file)
+    
+    # Use speech_recognition if available
+    logger.info("Using speech_recognition for transcription")
+    return transcribe_audio_with_google_api(wav_file)
+
 def chat_with_google(prompt, session_id):
     """
     Append user's prompt to conversation history and generate a response
     using Google Generative AI.
     """
-    history = get_session_history(session_id)
-    history.append({"role": "user", "content": prompt})
-    
-    full_prompt = "\n".join(
-        [f'{msg["role"].capitalize()}: {msg["content"]}' for msg in history]
-    )
+    with conversation_history.lock(session_id):
+        history = get_session_history(session_id) + [{"role": "user", "content": prompt}]
+        
+        full_prompt = "\n".join(
+            [f'{msg["role"].capitalize()}: {msg["content"]}' for msg in history]
+        )
 
-    model = genai.GenerativeModel("gemini-1.5-flash", generation_config=GENERATION_CONFIG)
-    response = model.generate_content(full_prompt)
-    reply = response.text if response.text else ""
+        model = get_model("gemini-1.5-flash", GENERATION_CONFIG)
+        response = model.generate_content(full_prompt)
+        reply = response.text if response.text else ""
 
-    history.append({"role": "assistant", "content": reply})
+        conversation_history.append(
+            session_id,
+            {"role": "user", "content": prompt},
+            {"role": "assistant", "content": reply}
+        )
     return reply.strip()
 
-def clean_text_for_tts(text):
-    """Clean text for text-to-speech."""
-    # Remove markdown formatting
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # Bold
-    text = re.sub(r'\*(.*?)\*', r'\1', text)      # Italic
-    text = re.sub(r'`(.*?)`', r'\1', text)        # Code
-    text = re.sub(r'```.*?\n(.*?)```', r'\1', text, flags=re.DOTALL)  # Code blocks
-    
-    # Remove "Assistant:" prefix if present
-    text = re.sub(r'^Assistant:\s*', '', text)
-    
-    # Remove URLs
-    text = re.sub(r'https?://\S+', '', text)
-    
-    # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
-    
-    return text
-
 def clean_text_for_display(text):
     """Clean text for display in the UI, removing markdown formatting."""
     # Remove asterisks used for bold/italic in markdown
@@ -580,91 +770,77 @@ def clean_text_for_display(text):
     
     return text
 
-def get_cache_key(text, lang, slow):
-    """Generate a unique cache key based on text content and TTS parameters."""
-    # Create a string that includes all parameters that affect the audio output
-    key_string = f"{text}_{lang}_{slow}"
-    # Generate a hash of this string to use as the cache key
-    return hashlib.md5(key_string.encode()).hexdigest()
-
 def google_tts(text, lang='en', slow=False, speed=1.0):
     """
     Generate TTS audio using Google Text-to-Speech (gTTS).
+    
+    The text is split into sentences which are synthesized concurrently and
+    cached individually, then joined into a single file for the whole reply.
     Returns the filename of the generated audio or None if an error occurs.
     """
     try:
         # Clean the text for TTS
         text = clean_text_for_tts(text)
         
-        # Generate a cache key
-        cache_key = get_cache_key(text, lang, slow)
         cache_dir = os.path.join(app.static_folder, 'audio', 'cache')
-        os.makedirs(cache_dir, exist_ok=True)
-        
-        # Check if we already have this text cached
-        cache_file = os.path.join(cache_dir, f"{cache_key}.mp3")
-        if os.path.exists(cache_file):
-            logger.info(f"Using cached audio file: {cache_file}")
-            return f"audio/cache/{cache_key}.mp3"
-        
-        # If text is too long, take just the first part
-        max_length = 1000
-        if len(text) > max_length:
-            logger.warning(f"Text too long ({len(text)} chars), truncating to {max_length}")
-            text = text[:max_length] + "..."
-        
-        # Create MP3 file with gTTS
-        logger.info(f"Generating new TTS audio for text: {text[:50]}...")
-        tts = gTTS(text=text, lang=lang, slow=slow)
-        tts.save(cache_file)
+        filename = synthesize_text(text, lang, slow, cache_dir)
+        if not filename:
+            logger.error("No TTS audio could be generated")
+            return None
         
-        # Apply speed adjustment if needed
+        # Serve a cached tempo variant; the 1.0x master is never modified
         if speed != 1.0:
-            process_audio_speed(cache_file, speed)
+            filename = derive_speed_variant(filename, speed, cache_dir)
             
-        return f"audio/cache/{cache_key}.mp3"
+        return f"audio/cache/{filename}"
     except Exception as e:
         logger.error(f"Error in google_tts: {e}", exc_info=True)
         return None
 
+def google_tts_playlist(text, lang='en', slow=False, speed=1.0):
+    """
+    Generate TTS audio as an ordered playlist of per-sentence files.
+    Returns a list of audio URLs (empty if an error occurs).
+    """
+    try:
+        text = clean_text_for_tts(text)
+        cache_dir = os.path.join(app.static_folder, 'audio', 'cache')
+        filenames = synthesize_playlist(text, lang, slow, cache_dir)
+        if not filenames:
+            return []
+        return [f"audio/cache/{derive_speed_variant(filename, speed, cache_dir)}" for filename in filenames]
+    except Exception as e:
+        logger.error(f"Error in google_tts_playlist: {e}", exc_info=True)
+        return []
+
+def phrase_audio_url(phrase_id, lang='en'):
+    """Audio URL of a pre-rendered phrase, or None if the phrase bank is not warm yet."""
+    filename = phrase_bank.audio_filename(phrase_id, lang)
+    return f"audio/cache/{filename}" if filename else None
+
 def append_to_log(session_id, text):
     """Append text to a daily log file."""
     log_filename = f"chatlog-{today}.txt"
     with open(log_filename, "a") as f:
         f.write(f"Session {session_id}: {text}\n")
 
-def process_audio_speed(audio_path, speed):
-    """
-    Process audio file to change its speed.
-    
-    Args:
-        audio_path: Path to the audio file
-        speed: Speed factor (1.0 is normal speed)
-    """
-    try:
-        # Create a temporary file for the processed audio
-        temp_path = audio_path + ".temp.mp3"
-        
-        # Use ffmpeg to change the audio speed
-        subprocess.run([
-            'ffmpeg', '-i', audio_path, 
-            '-filter:a', f'atempo={speed}', 
-            '-y', temp_path
-        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        
-        # Replace the original file with the processed one
-        os.replace(temp_path, audio_path)
-        logger.info(f"Audio speed processed: {audio_path}, speed: {speed}")
-        
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error processing audio speed: {e}")
-        logger.error(f"FFmpeg stderr: {e.stderr.decode() if e.stderr else 'No error output'}")
-        # If there's an error, we'll just use the original audio file
-    except Exception as e:
-        logger.error(f"Error processing audio speed: {e}")
-        # If there's an error, we'll just use the original audio file
-
 # ----- Routes -----
+@app.before_request
+def start_readiness_probes():
+    """Kick off the background readiness probes on the first request."""
+    readiness.start()
+
+@app.route('/healthz')
+def healthz():
+    """Liveness endpoint: the process is up and serving requests."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness endpoint reporting the cached startup probe results."""
+    status = readiness.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @app.route('/')
 def index():
     """Render the main page."""
@@ -742,8 +918,9 @@ def debug_page():
 # New class to manage chatbot state and interactions
 class SMVChatbot:
     def __init__(self):
-        self.model = genai.GenerativeModel("gemini-1.5-flash")
-        self.conversations: Dict[str, genai.ChatSession] = {}
+        self.model = get_model("gemini-1.5-flash", system_instruction=SMV_CHATBOT_SYSTEM_INSTRUCTION)
+        # Keeps the seeded system instruction (if any) at the head of each chat history
+        self.conversations = SessionStore('smv_chatbot', keep_head=SYSTEM_HISTORY_ENTRIES)
         
     def get_dashboard_data(self) -> dict:
         """Get real-time dashboard data"""
@@ -756,63 +933,24 @@ class SMVChatbot:
             "current_location": "Lucknow, Uttar Pradesh, 226014, India"
         }
 
-    def get_system_prompt(self, dashboard_data: dict) -> str:
-        """Generate system prompt with current data"""
-        return f"""You are an AI assistant specifically designed for SMV e-rickshaw drivers. You must ALWAYS:
-
-1. Start EVERY response with "Namaste! I am your SMV e-rickshaw assistant."
-
-2. CURRENT DASHBOARD STATUS:
-   - Battery: {dashboard_data['battery_percentage']}%
-   - Vehicle: {dashboard_data['vehicle_number']}
-   - Last Service: {dashboard_data['last_service']}
-   - Next Service: {dashboard_data['next_service']}
-   - Driver Rating: {dashboard_data['driver_rating']}
-
-3. RESPONSE RULES:
-   - ONLY answer questions about e-rickshaws, maintenance, battery, or dashboard
-   - Include relevant dashboard data in EVERY response
-   - Add safety warnings when discussing technical issues
-   - End EVERY response with "For immediate assistance, contact SMV support at 1800-XXX-XXXX"
-
-4. For BATTERY ISSUES:
-   - First state current battery level
-   - List specific troubleshooting steps
-   - Include charging safety warnings
-   - Mention if service check needed
-
-5. For MAINTENANCE QUERIES:
-   - Reference last service date
-   - State next service date
-   - Provide specific maintenance tips
-
-6. For NON-E-RICKSHAW questions:
-   Respond ONLY with: "I am specialized in e-rickshaw support. Please ask me about your e-rickshaw, its maintenance, battery, or dashboard information."
-
-7. SAFETY FIRST:
-   For any critical issues (smoke, damage, unusual sounds):
-   - Advise to stop vehicle immediately
-   - Provide emergency steps
-   - Emphasize contacting SMV support urgently"""
-
     def get_chat_session(self, session_id: str) -> genai.ChatSession:
         """Get or create a chat session for the user"""
-        if session_id not in self.conversations:
-            chat = self.model.start_chat(history=[])
-            dashboard_data = self.get_dashboard_data()
-            system_prompt = self.get_system_prompt(dashboard_data)
-            chat.send_message(system_prompt)
-            self.conversations[session_id] = chat
-        return self.conversations[session_id]
+        return self.conversations.get_or_create(session_id, self._start_chat_session)
+
+    def _start_chat_session(self) -> genai.ChatSession:
+        """Start a chat session following the system instruction (no priming round trip)"""
+        return start_chat(self.model, SMV_CHATBOT_SYSTEM_INSTRUCTION)
 
     def handle_message(self, message: str, session_id: str) -> str:
         """Process a message and return the response"""
         try:
-            chat = self.get_chat_session(session_id)
-            
-            # Enhance user message with context
-            dashboard_data = self.get_dashboard_data()
-            enhanced_message = f"""User Query: {message}
+            # A chat session must not be used by two requests at once
+            with self.conversations.lock(session_id):
+                chat = self.get_chat_session(session_id)
+                
+                # Enhance user message with context
+                dashboard_data = self.get_dashboard_data()
+                enhanced_message = f"""User Query: {message}
 
 Current Dashboard Status:
 - Battery: {dashboard_data['battery_percentage']}%
@@ -822,176 +960,357 @@ Current Dashboard Status:
 
 Please provide a helpful response following the system prompt guidelines."""
 
-            response = chat.send_message(enhanced_message)
-            return response.text if response.text else "I apologize, I'm having trouble responding. Please try again."
+                response = chat.send_message(enhanced_message)
+                self.conversations.trim(session_id)
+            prompt_stats.record('smv_chatbot', SMV_CHATBOT_SYSTEM_INSTRUCTION, enhanced_message,
+                                inlined=not SYSTEM_INSTRUCTION_SUPPORTED, response=response)
+            return response.text if response.text else phrase_text('trouble_responding')
             
         except Exception as e:
             logger.error(f"Error in chat handling: {e}")
-            return "I apologize, I'm having technical difficulties. Please try again."
+            return phrase_text('technical_difficulties_short')
 
 # Initialize the chatbot
 smv_chatbot = SMVChatbot()
 
-# Update the chat endpoint
-@app.route('/api/chat', methods=['POST'])
-def chat():
-    """API endpoint for chat."""
-    data = request.json
-    message = data.get('message', '')
-    session_id = data.get('session_id', 'default')
-    language = data.get('language', 'en')
-    speed = float(data.get('speed', 1.0))
-    
+# ----- Chat Prompt -----
+def get_chat_dashboard():
+    """Get the dashboard data embedded in the chat prompt."""
+    return {
+        "battery_percentage": "93",
+        "vehicle_number": "UP32 BZ 5678",
+        "last_service": "10 June 2024",
+        "next_service": "10 December 2025",
+        "driver_rating": "4.5",
+        "location": "Lucknow, Uttar Pradesh"
+    }
+
+def request_location(values):
+    """
+    Read optional lat/lon fields from request values.
+    Returns (lat, lon), or None if they are missing, non-finite or out of range.
+    """
     try:
-        # Log the request details for debugging
-        logger.info(f"Chat endpoint called with message: '{message}', session_id: {session_id}")
-        
-        # Dashboard data
-        dashboard = {
-            "battery_percentage": "93",
-            "vehicle_number": "UP32 BZ 5678",
-            "last_service": "10 June 2024",
-            "next_service": "10 December 2025",
-            "driver_rating": "4.5",
-            "location": "Lucknow, Uttar Pradesh"
-        }
-        
-        # Get nearby places data from the map
-        nearby_places = {
-            "schools": [
-                {"name": "APS Academy", "distance": "1.1 km"},
-                {"name": "City Montessori School", "distance": "2.3 km"}
-            ],
-            "bus_stations": [
-                {"name": "Central Bus Terminal", "distance": "0.7 km"},
-                {"name": "Charbagh Bus Station", "distance": "3.5 km"}
-            ],
-            "malls": [
-                {"name": "City Center Mall", "distance": "1.5 km"},
-                {"name": "Phoenix Palassio", "distance": "4.2 km"}
-            ]
+        lat, lon = float(values['lat']), float(values['lon'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return (lat, lon) if valid_coordinates(lat, lon) else None
+
+def get_nearby_places(location=None):
+    """
+    Get the nearby places embedded in the chat prompt.
+    
+    Uses the POI index around the driver's (lat, lon) when both are
+    available, otherwise the default places.
+    """
+    if location is not None and poi_index.loaded:
+        places = poi_index.nearby(*location, categories=list(POI_CATEGORIES), k=2)
+        return {
+            category: [{"name": place['name'], "distance": f"{place['distance_km']:.1f} km"} for place in entries]
+            for category, entries in places.items()
         }
+    return {
+        "schools": [
+            {"name": "APS Academy", "distance": "1.1 km"},
+            {"name": "City Montessori School", "distance": "2.3 km"}
+        ],
+        "bus_stations": [
+            {"name": "Central Bus Terminal", "distance": "0.7 km"},
+            {"name": "Charbagh Bus Station", "distance": "3.5 km"}
+        ],
+        "malls": [
+            {"name": "City Center Mall", "distance": "1.5 km"},
+            {"name": "Phoenix Palassio", "distance": "4.2 km"}
+        ]
+    }
+
+def is_first_session_message(session_id):
+    """Check if this is the first message in the session."""
+    return len(conversation_history.get(session_id) or []) <= 1
+
+def store_chat_turn(session_id, message, response_text):
+    """Store the conversation for future reference."""
+    conversation_history.append(
+        session_id,
+        {"role": "user", "content": message},
+        {"role": "assistant", "content": response_text}
+    )
+
+# Replies to repeated questions, invalidated when the dashboard data changes
+response_cache = ResponseCache()
+
+# Concurrent identical prompts share one Gemini call
+chat_flight = SingleFlight('chat')
+
+def get_chat_model():
+    """Shared chat model, carrying the static instructions as its system instruction."""
+    return get_model("gemini-1.5-flash", GENERATION_CONFIG, CHAT_SYSTEM_INSTRUCTION)
+
+def record_chat_prompt(context, response, intent):
+    """Record the size of a chat prompt per intent (see /api/stats)."""
+    prompt_stats.record(f"chat:{intent}", CHAT_SYSTEM_INSTRUCTION, context,
+                        inlined=not SYSTEM_INSTRUCTION_SUPPORTED, response=response)
+
+def generate_chat_reply(context, intent):
+    """
+    Generate a reply to a chat turn's context (see build_chat_context) with
+    Gemini; intent is the message's classified intent, for prompt stats.
+    Returns the reply text, or None if the response was empty.
+    """
+    def generate():
+        # Shared model instance with explicit configuration
+        model = get_chat_model()
+        logger.info("Sending prompt to Gemini API")
+        response = model.generate_content(with_system_instruction(CHAT_SYSTEM_INSTRUCTION, context))
+        record_chat_prompt(context, response, intent)
+        if hasattr(response, 'text') and response.text:
+            return response.text
+        return None
+    
+    return chat_flight.do(hashlib.md5(context.encode()).hexdigest(), generate)
+
+def reply_audio_url(entry, text, language, speed):
+    """
+    Get the audio URL of a reply, reusing the audio already rendered for a
+    cached reply in the same language and speed.
+    """
+    variant = f"{language}:{speed_bucket(speed):g}"
+    if entry is not None:
+        audio_url = entry['audio'].get(variant)
+        cache = get_audio_cache(os.path.join(app.static_folder, 'audio', 'cache'))
+        if audio_url and cache.contains(os.path.basename(audio_url)):
+            return audio_url
+    audio_url = google_tts(text, lang=language, speed=speed)
+    response_cache.remember_audio(entry, variant, audio_url)
+    return audio_url
+
+def sse_event(payload):
+    """Format a payload as a Server-Sent Events data frame."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+def run_chat_turn(message, session_id, language='en', speed=1.0, async_audio=True, location=None):
+    """
+    Run one chat turn: answer the message and render (or queue) its audio.
+    
+    Shared by the HTTP and voice endpoints. Never raises; failures are
+    reported in the 'error' field alongside the fallback reply. location is
+    the driver's (lat, lon), if known, for the nearby places in the prompt.
+    
+    Returns:
+        The response payload: response, audio_url, audio_job_id, session_id,
+        cached and fast_path
+    """
+    try:
+        dashboard = get_chat_dashboard()
+        intent = classify_intent(message)
+        nearby_places = get_nearby_places(location) if intent_needs_places(intent) else None
+        is_first_message = is_first_session_message(session_id)
+        fingerprint = context_fingerprint(dashboard)
+        # Nearby places differ per driver, so they partition the cache instead of invalidating it
+        scope = context_fingerprint(nearby_places) if nearby_places else ''
         
-        # Check if this is the first message in the session
-        is_first_message = session_id not in conversation_history or len(conversation_history.get(session_id, [])) <= 1
-        
-        # Create a new model instance for each request with explicit configuration
         try:
-            generation_config = {
-                "temperature": 0.7,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 1024,
-            }
-            
-            model = genai.GenerativeModel(
-                "gemini-1.5-flash",
-                generation_config=generation_config
-            )
-            logger.info("Successfully created Gemini model instance")
-            
-            # Completely revised prompt with better instructions for professional responses
-            prompt = f"""You are the SMV E-rickshaw Assistant, a professional and helpful AI assistant for e-rickshaw drivers.
-
-CORE PRINCIPLES:
-1. Maintain a professional, helpful tone at all times
-2. Only answer questions about e-rickshaws, maintenance, battery, dashboard, or nearby locations
-3. For non-e-rickshaw questions, politely redirect to e-rickshaw topics
-4. Only suggest contacting the SMV team (1800-XXX-XXXX) for serious technical issues that cannot be resolved with advice
-5. Provide specific, actionable information when possible
-
-DASHBOARD DATA (ONLY mention when DIRECTLY relevant and NECESSARY for answering the specific question):
-- Battery: {dashboard['battery_percentage']}%
-- Vehicle: {dashboard['vehicle_number']}
-- Last Service: {dashboard['last_service']}
-- Next Service: {dashboard['next_service']}
-- Driver Rating: {dashboard['driver_rating']}
-- Location: {dashboard['location']}
-
-NEARBY PLACES (ONLY for location-related questions):
-- Schools: {', '.join([f"{school['name']} ({school['distance']})" for school in nearby_places['schools']])}
-- Bus Stations: {', '.join([f"{station['name']} ({station['distance']})" for station in nearby_places['bus_stations']])}
-- Malls: {', '.join([f"{mall['name']} ({mall['distance']})" for mall in nearby_places['malls']])}
-
-RESPONSE GUIDELINES:
-- For greetings: Respond professionally without mentioning dashboard data
-- For battery issues: Provide specific troubleshooting advice first, only mention current battery percentage if directly relevant
-- For maintenance issues: Provide specific advice first, mention service dates only if directly relevant
-- For location questions: Provide specific information about nearby places
-- For general questions: Provide helpful information without mentioning dashboard data
-- Only suggest contacting SMV for issues that clearly require professional assistance
-- Use "Namaste" only for the first message in a conversation (this is message {'1' if is_first_message else 'not the first'})
-- Never use casual expressions like "Arre wah!" or other colloquial phrases
-
-EXAMPLES OF GOOD RESPONSES:
-
-For "hi":
-"Hello! I'm your SMV E-rickshaw assistant. How can I help you today with your e-rickshaw?"
-
-For "my e-rickshaw is not starting":
-"This could be due to several reasons: 1) Check if the key is fully inserted and turned, 2) Ensure the battery connections are secure, 3) Verify the emergency cut-off switch is in the correct position. If these steps don't help, please contact SMV support at 1800-XXX-XXXX for technical assistance."
-
-For "is there any school nearby?":
-"Yes, the nearest school is APS Academy, about 1.1 km away. There's also City Montessori School at a distance of 2.3 km from your current location."
-
-For "when was my last service":
-"Your last service was on June 10th, 2024, and your next scheduled service is on December 10th, 2024. Regular maintenance helps ensure optimal performance of your e-rickshaw."
-
-For "my battery is taking too much time to charge":
-"This could be happening for several reasons: 1) The charger might be malfunctioning, 2) There could be loose connections, 3) The battery might be aging. Try using a different charger if available, and ensure all connections are secure. If the problem persists, it would be best to have it checked by a technician."
-
-USER QUESTION: {message}"""
-            
-            # Generate response with the model
-            logger.info("Sending prompt to Gemini API")
-            response = model.generate_content(prompt)
-            
-            # Extract and validate the response text
-            if hasattr(response, 'text') and response.text:
-                response_text = response.text
-                logger.info(f"Received valid response from Gemini: {response_text[:100]}...")
-                
-                # Store the conversation for future reference
-                if session_id not in conversation_history:
-                    conversation_history[session_id] = []
-                conversation_history[session_id].append({"role": "user", "content": message})
-                conversation_history[session_id].append({"role": "assistant", "content": response_text})
+            # Dashboard questions are answered from templates without calling Gemini
+            response_text = fast_path.answer(message, dashboard, language)
+            from_fast_path = response_text is not None
+            cached = None if from_fast_path else response_cache.get(message, fingerprint, is_first_message, scope)
+            from_cache = cached is not None
+            if from_fast_path:
+                store_chat_turn(session_id, message, response_text)
+            elif from_cache:
+                response_text = cached['response']
+                logger.info(f"Using cached response: {response_text[:100]}...")
+                store_chat_turn(session_id, message, response_text)
             else:
-                logger.error("Invalid or empty response from Gemini API")
-                response_text = "I apologize, but I'm experiencing technical difficulties. Please try again later."
+                context = build_chat_context(message, dashboard, nearby_places, is_first_message, intent)
+                
+                # Generate and validate the response text
+                response_text = generate_chat_reply(context, intent)
+                if response_text:
+                    logger.info(f"Received valid response from Gemini: {response_text[:100]}...")
+                    store_chat_turn(session_id, message, response_text)
+                    cached = response_cache.put(message, fingerprint, is_first_message, response_text, scope)
+                else:
+                    logger.error("Invalid or empty response from Gemini API")
+                    response_text = FALLBACK_RESPONSE
             
             # Generate TTS audio (in try block to prevent errors)
             audio_url = None
+            audio_job_id = None
             try:
-                audio_url = google_tts(response_text, lang=language, speed=speed)
-                logger.info(f"Generated audio URL: {audio_url}")
+                if async_audio:
+                    # Reply with the text now; the client fetches the audio from the job
+                    audio_job_id = tts_queue.submit(reply_audio_url, cached, response_text, language, speed)
+                    logger.info(f"Queued TTS job: {audio_job_id}")
+                else:
+                    audio_url = reply_audio_url(cached, response_text, language, speed)
+                    logger.info(f"Generated audio URL: {audio_url}")
             except Exception as audio_error:
                 logger.error(f"Error generating audio: {audio_error}")
             
             # Return successful response with all expected fields
-            return jsonify({
+            return {
                 'response': response_text,
                 'audio_url': audio_url,
-                'session_id': session_id
-            })
+                'audio_job_id': audio_job_id,
+                'session_id': session_id,
+                'cached': from_cache,
+                'fast_path': from_fast_path
+            }
             
         except Exception as api_error:
             logger.error(f"API error: {str(api_error)}", exc_info=True)
             # Return a structured error response that the frontend can handle
-            return jsonify({
+            return {
                 'error': str(api_error),
-                'response': "I apologize, but I'm experiencing technical difficulties. Please try again later.",
+                'response': FALLBACK_RESPONSE,
+                'audio_url': phrase_audio_url('technical_difficulties'),
                 'session_id': session_id
-            })
+            }
             
     except Exception as e:
-        logger.error(f"Unhandled error in chat endpoint: {str(e)}", exc_info=True)
+        logger.error(f"Unhandled error in chat turn: {str(e)}", exc_info=True)
         # Return error response with all expected fields
-        return jsonify({
+        return {
             'error': str(e),
-            'response': "I apologize, but I'm experiencing technical difficulties. Please try again later.",
+            'response': FALLBACK_RESPONSE,
+            'audio_url': phrase_audio_url('technical_difficulties'),
+            'session_id': session_id
+        }
+
+# Update the chat endpoint
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    """API endpoint for chat."""
+    data = request.json
+    message = data.get('message', '')
+    session_id = data.get('session_id', 'default')
+    language = data.get('language', 'en')
+    try:
+        speed = parse_speed(data.get('speed', 1.0))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    # Audio is rendered by the TTS workers unless the client asks to wait for it
+    async_audio = data.get('async_audio', True)
+    
+    # Log the request details for debugging
+    logger.info(f"Chat endpoint called with message: '{message}', session_id: {session_id}")
+    
+    location = request_location(data)
+    
+    return jsonify(run_chat_turn(message, session_id, language, speed, async_audio, location))
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of the chat endpoint.
+    
+    Pushes the Gemini reply to the browser as Server-Sent Events while it is
+    being generated: one 'delta' event per text chunk, one 'audio' event per
+    synthesized sentence, then a 'done' event carrying the full response and
+    the audio playlist (or an 'error' event).
+    """
+    data = request.json
+    message = data.get('message', '')
+    session_id = data.get('session_id', 'default')
+    language = data.get('language', 'en')
+    try:
+        speed = parse_speed(data.get('speed', 1.0))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    location = request_location(data)
+    
+    logger.info(f"Chat stream endpoint called with message: '{message}', session_id: {session_id}")
+    
+    dashboard = get_chat_dashboard()
+    intent = classify_intent(message)
+    nearby_places = get_nearby_places(location) if intent_needs_places(intent) else None
+    is_first_message = is_first_session_message(session_id)
+    fingerprint = context_fingerprint(dashboard)
+    # Nearby places differ per driver, so they partition the cache instead of invalidating it
+    scope = context_fingerprint(nearby_places) if nearby_places else ''
+    context = build_chat_context(message, dashboard, nearby_places, is_first_message, intent)
+    
+    def generate():
+        chunks = []
+        try:
+            # Dashboard questions are answered from templates without calling Gemini
+            fast_reply = fast_path.answer(message, dashboard, language)
+            cached = None if fast_reply is not None else response_cache.get(message, fingerprint, is_first_message, scope)
+            if fast_reply is not None:
+                chunks.append(fast_reply)
+                yield sse_event({'type': 'delta', 'text': fast_reply})
+            elif cached is not None:
+                # Cached replies are sent in one delta; their sentence audio is already cached
+                logger.info(f"Using cached response: {cached['response'][:100]}...")
+                chunks.append(cached['response'])
+                yield sse_event({'type': 'delta', 'text': cached['response']})
+            else:
+                model = get_chat_model()
+                
+                logger.info("Streaming prompt to Gemini API")
+                response = model.generate_content(with_system_instruction(CHAT_SYSTEM_INSTRUCTION, context), stream=True)
+                
+                for chunk in response:
+                    # Chunks without text parts (e.g. safety metadata) raise on .text
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue
+                    if text:
+                        chunks.append(text)
+                        yield sse_event({'type': 'delta', 'text': text})
+                record_chat_prompt(context, response, intent)
+        except Exception as api_error:
+            logger.error(f"API error while streaming: {str(api_error)}", exc_info=True)
+            yield sse_event({
+                'type': 'error',
+                'error': str(api_error),
+                'response': FALLBACK_RESPONSE,
+                'audio_url': phrase_audio_url('technical_difficulties'),
+                'session_id': session_id
+            })
+            return
+        
+        response_text = "".join(chunks)
+        if response_text:
+            logger.info(f"Streamed valid response from Gemini: {response_text[:100]}...")
+            store_chat_turn(session_id, message, response_text)
+            if cached is None and fast_reply is None:
+                response_cache.put(message, fingerprint, is_first_message, response_text, scope)
+        else:
+            logger.error("Invalid or empty streamed response from Gemini API")
+            response_text = FALLBACK_RESPONSE
+        
+        audio_playlist = []
+        try:
+            # Push each sentence's audio as soon as it is synthesized so the
+            # browser can start playing while the rest are still in flight
+            cache_dir = os.path.join(app.static_folder, 'audio', 'cache')
+            sentences = split_into_sentences(clean_text_for_tts(response_text))
+            for filename in synthesize_segments(sentences, language, False, cache_dir):
+                if filename:
+                    url = f"audio/cache/{derive_speed_variant(filename, speed, cache_dir)}"
+                    yield sse_event({'type': 'audio', 'index': len(audio_playlist), 'url': url})
+                    audio_playlist.append(url)
+        except Exception as audio_error:
+            logger.error(f"Error generating audio: {audio_error}")
+        
+        yield sse_event({
+            'type': 'done',
+            'response': response_text,
+            'audio_playlist': audio_playlist,
             'session_id': session_id
         })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Stop reverse proxies from buffering the stream
+        }
+    )
 
 @app.route('/api/transcribe', methods=['POST'])
 def transcribe():
@@ -1014,43 +1333,21 @@ def transcribe():
         logger.error("Empty audio file received")
         return jsonify({'error': 'Empty audio file received'}), 400
     
-    # Save the audio file temporarily
-    temp_webm = tempfile.NamedTemporaryFile(suffix='.webm', delete=False).name
-    audio_file.save(temp_webm)
-    logger.info(f"Saved temporary WebM file: {temp_webm}")
-    
-    # Check if the file was saved and has content
-    if os.path.getsize(temp_webm) == 0:
-        logger.error("Saved audio file is empty")
-        return jsonify({'error': 'Received audio file is empty'}), 400
-    
     try:
-        # Convert WebM to WAV
+        # Stream the upload through ffmpeg and keep the WAV in memory
         logger.info("Converting WebM to WAV")
-        wav_file = convert_webm_to_wav(temp_webm)
+        try:
+            wav_file = convert_to_wav(audio_file.stream)
+        except FFmpegBusyError as e:
+            logger.warning(f"Rejecting transcription: {e}")
+            return jsonify({'error': 'Server is busy processing audio, please try again.'}), 503
         
         if not wav_file:
             logger.error("Failed to convert audio format")
             return jsonify({'error': 'Failed to convert audio format'}), 500
         
-        logger.info(f"WAV file created: {wav_file}, size: {os.path.getsize(wav_file)} bytes")
-        
-        # Use direct Google API for transcription if speech_recognition is not available
-        if not SPEECH_RECOGNITION_AVAILABLE:
-            logger.info("Using direct transcription method since speech_recognition is not available")
-            text = direct_transcribe_audio(wav_file)
-        else:
-            # Use speech_recognition if available
-            logger.info("Using speech_recognition for transcription")
-            text = transcribe_audio_with_google_api(wav_file)
-        
-        # Clean up temporary files
-        try:
-            os.remove(temp_webm)
-            os.remove(wav_file)
-            logger.info("Temporary files cleaned up")
-        except Exception as e:
-            logger.warning(f"Error cleaning up temporary files: {e}")
+        with wav_file:
+            text = transcribe_wav(wav_file)
         
         if text:
             logger.info(f"Transcription successful: '{text}'")
@@ -1062,18 +1359,297 @@ def transcribe():
         logger.error(f"Error in transcription endpoint: {e}", exc_info=True)
         return jsonify({'error': f'Error processing audio: {str(e)}'}), 500
 
+# ----- Voice Turn -----
+# Streamed text is handed to TTS one complete sentence at a time
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?।])\s+')
+
+def elapsed_ms(started):
+    """Milliseconds since a time.monotonic() timestamp."""
+    return round((time.monotonic() - started) * 1000, 1)
+
+def run_voice_turn(message, session_id, language, speed, timings, location=None):
+    """
+    Run a chat turn for a voice query, overlapping generation and synthesis.
+    
+    The Gemini reply is streamed, and each sentence is queued for TTS as soon
+    as it is complete, so most of the audio is ready when the last token
+    arrives. Stage timings are added to the timings dict.
+    
+    Returns:
+        (response text, audio filename or None, whether the reply was cached)
+    """
+    cache_dir = os.path.join(app.static_folder, 'audio', 'cache')
+    dashboard = get_chat_dashboard()
+    intent = classify_intent(message)
+    nearby_places = get_nearby_places(location) if intent_needs_places(intent) else None
+    is_first_message = is_first_session_message(session_id)
+    fingerprint = context_fingerprint(dashboard)
+    # Nearby places differ per driver, so they partition the cache instead of invalidating it
+    scope = context_fingerprint(nearby_places) if nearby_places else ''
+    
+    started = time.monotonic()
+    # Dashboard questions are answered from templates without calling Gemini
+    fast_reply = fast_path.answer(message, dashboard, language)
+    cached = None if fast_reply is not None else response_cache.get(message, fingerprint, is_first_message, scope)
+    if fast_reply is not None or cached is not None:
+        response_text = fast_reply if fast_reply is not None else cached['response']
+        store_chat_turn(session_id, message, response_text)
+        timings['llm_ms'] = elapsed_ms(started)
+        tts_started = time.monotonic()
+        audio_url = reply_audio_url(cached, response_text, language, speed)
+        timings['tts_ms'] = elapsed_ms(tts_started)
+        return response_text, audio_url and os.path.basename(audio_url), cached is not None
+    
+    futures = []
+    sentences = []
+    
+    def queue_sentences(text):
+        for sentence in split_into_sentences(clean_text_for_tts(text)):
+            sentences.append(sentence)
+            futures.append(submit_segment(sentence, language, False, cache_dir))
+    
+    chunks = []
+    pending = ""
+    model = get_chat_model()
+    context = build_chat_context(message, dashboard, nearby_places, is_first_message, intent)
+    response = model.generate_content(with_system_instruction(CHAT_SYSTEM_INSTRUCTION, context), stream=True)
+    for chunk in response:
+        # Chunks without text parts (e.g. safety metadata) raise on .text
+        try:
+            text = chunk.text
+        except ValueError:
+            continue
+        if not text:
+            continue
+        if not chunks:
+            timings['llm_first_token_ms'] = elapsed_ms(started)
+        chunks.append(text)
+        pending += text
+        boundaries = list(SENTENCE_BOUNDARY.finditer(pending))
+        if boundaries:
+            complete, pending = pending[:boundaries[-1].end()], pending[boundaries[-1].end():]
+            queue_sentences(complete)
+    timings['llm_ms'] = elapsed_ms(started)
+    record_chat_prompt(context, response, intent)
+    
+    response_text = "".join(chunks)
+    if response_text:
+        logger.info(f"Streamed valid response from Gemini: {response_text[:100]}...")
+        store_chat_turn(session_id, message, response_text)
+        response_cache.put(message, fingerprint, is_first_message, response_text, scope)
+        queue_sentences(pending)
+    else:
+        logger.error("Invalid or empty streamed response from Gemini API")
+        response_text = FALLBACK_RESPONSE
+        queue_sentences(response_text)
+    
+    tts_started = time.monotonic()
+    filenames = []
+    for sentence, future in zip(sentences, futures):
+        try:
+            filenames.append(future.result())
+        except Exception as e:
+            logger.error(f"Error generating TTS segment '{sentence[:50]}': {e}")
+            filenames.append(None)
+    filename = join_segments(filenames, " ".join(sentences), language, False, cache_dir)
+    if filename and speed != 1.0:
+        filename = derive_speed_variant(filename, speed, cache_dir)
+    # Only the synthesis still outstanding after the last token counts here
+    timings['tts_ms'] = elapsed_ms(tts_started)
+    return response_text, filename, False
+
+@app.route('/api/voice', methods=['POST'])
+def voice():
+    """
+    API endpoint for a whole voice turn in one round trip.
+    
+    Takes the recorded audio (multipart 'audio', plus optional session_id,
+    language, speed, inline_audio, lat and lon form fields), transcribes it, runs the
+    chat turn and returns the transcript, the reply text and its audio,
+    either as a URL or inline as base64 when inline_audio=true, together
+    with per-stage timings in milliseconds.
+    """
+    started = time.monotonic()
+    timings = {}
+    session_id = request.form.get('session_id', 'default')
+    language = request.form.get('language', 'en')
+    try:
+        speed = parse_speed(request.form.get('speed', 1.0))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    inline_audio = request.form.get('inline_audio', 'false').lower() == 'true'
+    location = request_location(request.form)
+    logger.info(f"Voice endpoint called, session_id: {session_id}")
+    
+    if not check_ffmpeg_available():
+        return jsonify({'error': 'FFmpeg is not available on this server. Audio conversion cannot be performed.'}), 503
+    audio_file = request.files.get('audio')
+    if audio_file is None or audio_file.filename == '':
+        return jsonify({'error': 'No audio file provided'}), 400
+    
+    try:
+        stage = time.monotonic()
+        try:
+            wav_file = convert_to_wav(audio_file.stream)
+        except FFmpegBusyError as e:
+            logger.warning(f"Rejecting voice turn: {e}")
+            return jsonify({'error': 'Server is busy processing audio, please try again.'}), 503
+        timings['decode_ms'] = elapsed_ms(stage)
+        if not wav_file:
+            return jsonify({'error': 'Failed to convert audio format', 'timings': timings}), 500
+        
+        stage = time.monotonic()
+        with wav_file:
+            transcript = transcribe_wav(wav_file)
+        timings['transcribe_ms'] = elapsed_ms(stage)
+        if not transcript:
+            timings['total_ms'] = elapsed_ms(started)
+            return jsonify({'error': 'Could not transcribe audio', 'timings': timings}), 500
+        
+        try:
+            response_text, filename, from_cache = run_voice_turn(transcript, session_id, language, speed, timings, location)
+        except Exception as api_error:
+            logger.error(f"API error in voice turn: {str(api_error)}", exc_info=True)
+            timings['total_ms'] = elapsed_ms(started)
+            return jsonify({
+                'error': str(api_error),
+                'transcript': transcript,
+                'response': FALLBACK_RESPONSE,
+                'audio_url': phrase_audio_url('technical_difficulties'),
+                'session_id': session_id,
+                'timings': timings
+            })
+        
+        payload = {
+            'transcript': transcript,
+            'response': response_text,
+            'audio_url': f"audio/cache/{filename}" if filename else None,
+            'session_id': session_id,
+            'cached': from_cache
+        }
+        if inline_audio and filename:
+            cache = get_audio_cache(os.path.join(app.static_folder, 'audio', 'cache'))
+            with open(cache.path(filename), 'rb') as f:
+                payload['audio_base64'] = base64.b64encode(f.read()).decode('ascii')
+            payload['audio_mime_type'] = 'audio/mpeg'
+        timings['total_ms'] = elapsed_ms(started)
+        payload['timings'] = timings
+        logger.info(f"Voice turn timings: {timings}")
+        return jsonify(payload)
+    except Exception as e:
+        logger.error(f"Error in voice endpoint: {e}", exc_info=True)
+        return jsonify({'error': f'Error processing audio: {str(e)}', 'timings': timings}), 500
+
+# ----- Streaming Voice Input -----
+def voice_stream(ws):
+    """
+    WebSocket endpoint streaming voice input: /ws/voice
+    
+    Query parameters: session_id, language, speed, lat and lon, and
+    chat=true to run the chat turn on the transcript. The client sends binary audio chunks (e.g.
+    MediaRecorder WebM with a short timeslice) while the driver speaks, and
+    may send {"type": "end"} to stop early. The server decodes the chunks as
+    they arrive and detects the end of the utterance itself, then sends JSON
+    events: ready, speech_start, end_of_utterance, transcript, reply (the
+    /api/chat payload) or error, and closes the socket.
+    """
+    session_id = request.args.get('session_id', 'default')
+    language = request.args.get('language', 'en')
+    run_chat = request.args.get('chat', 'false').lower() == 'true'
+    location = request_location(request.args)
+    
+    def send(payload):
+        ws.send(json.dumps(payload))
+    
+    try:
+        speed = parse_speed(request.args.get('speed', 1.0))
+    except (TypeError, ValueError) as e:
+        send({'type': 'error', 'error': str(e)})
+        return
+    
+    if not check_ffmpeg_available():
+        send({'type': 'error', 'error': 'FFmpeg is not available on this server. Audio conversion cannot be performed.'})
+        return
+    
+    stream = VoiceStream()
+    try:
+        stream.start()
+    except FFmpegBusyError as e:
+        logger.warning(f"Rejecting voice stream: {e}")
+        send({'type': 'error', 'error': 'Server is busy processing audio, please try again.'})
+        return
+    
+    send({'type': 'ready'})
+    speech_announced = False
+    deadline = time.monotonic() + VOICE_MAX_SECONDS + 5
+    try:
+        # A decoder that exited early (e.g. undecodable input) ends the utterance too
+        while not stream.ended.is_set() and not stream.done and time.monotonic() < deadline:
+            message = ws.receive(timeout=0.1)
+            if stream.speech_started and not speech_announced:
+                send({'type': 'speech_start'})
+                speech_announced = True
+            if message is None:
+                continue
+            if isinstance(message, str):
+                try:
+                    if json.loads(message).get('type') == 'end':
+                        break
+                except (ValueError, AttributeError):
+                    logger.warning(f"Ignoring malformed voice stream message: {message[:100]}")
+                continue
+            stream.feed(message)
+    except Exception as e:
+        # The client disconnected mid-utterance
+        logger.info(f"Voice stream closed by client: {e}")
+        stream.abort()
+        return
+    
+    send({'type': 'end_of_utterance'})
+    try:
+        with stream.finish() as wav_file:
+            text = transcribe_wav(wav_file)
+    except Exception as e:
+        logger.error(f"Error processing voice stream: {e}", exc_info=True)
+        send({'type': 'error', 'error': f'Error processing audio: {str(e)}'})
+        return
+    
+    if not text:
+        send({'type': 'error', 'error': 'Could not transcribe audio'})
+        return
+    
+    logger.info(f"Streamed transcription successful: '{text}'")
+    send({'type': 'transcript', 'text': text})
+    if run_chat:
+        send({'type': 'reply', **run_chat_turn(text, session_id, language, speed, location=location)})
+
+if sock is not None:
+    sock.route('/ws/voice')(voice_stream)
+else:
+    logger.info("flask-sock is not installed, /ws/voice is disabled")
+
 @app.route('/api/tts', methods=['POST'])
 def text_to_speech():
     """API endpoint for text-to-speech."""
     data = request.json
     text = data.get('text', '')
     lang = data.get('language', 'en')
-    speed = float(data.get('speed', 1.0))
+    try:
+        speed = parse_speed(data.get('speed', 1.0))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     slow = speed < 1.0
     
     if not text:
         return jsonify({'error': 'No text provided'}), 400
     
+    # Return one file per sentence when the client can play a playlist
+    if data.get('playlist'):
+        audio_playlist = google_tts_playlist(text, lang=lang, slow=slow, speed=speed)
+        if audio_playlist:
+            return jsonify({'audio_url': audio_playlist[0], 'audio_playlist': audio_playlist})
+        return jsonify({'error': 'Failed to generate audio'}), 500
+    
     # Generate audio
     audio_file = google_tts(text, lang=lang, slow=slow, speed=speed)
     
@@ -1082,6 +1658,125 @@ def text_to_speech():
     else:
         return jsonify({'error': 'Failed to generate audio'}), 500
 
+@app.route('/api/tts/jobs/<job_id>', methods=['GET'])
+def tts_job(job_id):
+    """
+    API endpoint for the state of a background TTS job.
+    Pass ?wait=<seconds> to long-poll until the audio is ready.
+    """
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        wait = -1.0
+    if not (math.isfinite(wait) and wait >= 0):
+        return jsonify({'error': 'wait must be a non-negative number of seconds'}), 400
+    wait = min(wait, 30.0)
+    job = tts_queue.wait(job_id, wait) if wait > 0 else tts_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired TTS job'}), 404
+    return jsonify(job)
+
+@app.route('/api/reverse-geocode', methods=['GET'])
+def reverse_geocode_endpoint():
+    """API endpoint for reverse geocoding: /api/reverse-geocode?lat=..&lon=.."""
+    location = request_location(request.args)
+    if location is None:
+        return jsonify({'error': 'Valid lat and lon query parameters are required'}), 400
+    
+    try:
+        result = reverse_geocode(*location)
+    except RateLimitedError:
+        return jsonify({'error': 'Geocoding is busy, please try again shortly'}), 429
+    except Exception as e:
+        logger.error(f"Error in reverse geocoding: {e}")
+        return jsonify({'error': 'Reverse geocoding failed'}), 502
+    
+    if result is None:
+        return jsonify({'error': 'No address found'}), 404
+    return jsonify(result)
+
+@app.route('/api/nearby', methods=['GET'])
+def nearby():
+    """
+    API endpoint for nearby places: /api/nearby?lat=..&lon=..
+    
+    Optional parameters: categories (comma-separated, default all), k
+    (places per category, default 1) and radius_km. Returns the k nearest
+    places of every category in one call.
+    """
+    location = request_location(request.args)
+    if location is None:
+        return jsonify({'error': 'Valid lat and lon query parameters are required'}), 400
+    
+    categories = [c for c in request.args.get('categories', ','.join(POI_CATEGORIES)).split(',') if c in POI_CATEGORIES]
+    try:
+        k = max(1, min(int(request.args.get('k', 1)), 10))
+        radius_km = float(request.args.get('radius_km', POI_MAX_RADIUS_KM))
+    except ValueError:
+        return jsonify({'error': 'k and radius_km must be numbers'}), 400
+    if not (math.isfinite(radius_km) and radius_km > 0):
+        return jsonify({'error': 'radius_km must be a positive number'}), 400
+    radius_km = min(radius_km, POI_MAX_RADIUS_KM)
+    if not poi_index.loaded:
+        return jsonify({'error': 'Nearby places are not available'}), 503
+    
+    return jsonify({'places': poi_index.nearby(*location, categories=categories, k=k, max_km=radius_km)})
+
+@app.route('/api/places/ranked', methods=['GET'])
+def ranked_places():
+    """
+    API endpoint ranking search results by traffic-aware travel time:
+    /api/places/ranked?q=charging+station&lat=..&lon=..
+    
+    Optional parameters: mode (car, pedestrian, bicycle) and limit (number
+    of nearest results to route). Responds within ETA_RANK_DEADLINE seconds;
+    'complete' is false if some routes didn't arrive in time.
+    """
+    query = request.args.get('q', '').strip()
+    location = request_location(request.args)
+    if not query or location is None:
+        return jsonify({'error': 'q, lat and lon query parameters are required'}), 400
+    mode = request.args.get('mode', 'car')
+    try:
+        top_n = max(1, min(int(request.args.get('limit', ETA_RANK_TOP_N)), 10))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    
+    places, complete = rank_places_by_eta(query, *location, mode=mode, top_n=top_n)
+    if places is None:
+        return jsonify({'error': 'Place search failed'}), 502
+    return jsonify({'places': places, 'complete': complete})
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """API endpoint exposing runtime stats for monitoring."""
+    return jsonify({
+        'sessions': all_session_stats(),
+        'audio_cache': get_audio_cache(os.path.join(app.static_folder, 'audio', 'cache')).stats(),
+        'tts': get_tts_stats(),
+        'response_cache': response_cache.stats(),
+        'tts_jobs': tts_queue.stats(),
+        'single_flight': all_singleflight_stats(),
+        'ffmpeg': ffmpeg_pool.stats(),
+        'ffmpeg_stream': stream_decoder_pool.stats(),
+        'speech_audio': get_audio_stats(),
+        'maps': all_map_client_stats(),
+        'geocoding': geocoder.stats(),
+        'routes': route_cache.stats(),
+        'poi': poi_index.stats(),
+        'fast_path': fast_path.stats(),
+        'prompts': {
+            'system_instruction_supported': SYSTEM_INSTRUCTION_SUPPORTED,
+            'intent_token_budgets': {intent: profile['budget'] for intent, profile in INTENT_PROFILES.items()},
+            **prompt_stats.stats()
+        }
+    })
+
+# Without fast boot, block startup until the readiness probes have run
+if not FAST_BOOT:
+    readiness.start()
+    readiness.wait()
+
 # ----- Main Function -----
 if __name__ == "__main__":
     # Create necessary directories
@@ -0,0 +1,269 @@
+import io
+import os
+import sys
+import math
+import wave
+import tempfile
+import threading
+import logging
+from array import array
+from app.helpers.ffmpeg import AUDIO_SPOOL_MAX_BYTES, FFmpegBusyError, FFmpegError, ffmpeg_pool
+
+logger = logging.getLogger(__name__)
+
+# Speech recognition input format: 16 kHz mono 16-bit PCM
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+
+CHUNK_SIZE = 64 * 1024
+
+# ----- Voice Activity Detection -----
+# Leading/trailing silence is trimmed before audio is sent for recognition
+VAD_ENABLED = os.getenv('VAD_ENABLED', 'true').lower() == 'true'
+VAD_FRAME_MS = 30
+# Audio kept around the detected speech so word onsets and endings survive
+VAD_PADDING_MS = int(os.getenv('VAD_PADDING_MS', 250))
+# A frame is speech when its energy exceeds the noise floor by this factor...
+VAD_THRESHOLD_RATIO = float(os.getenv('VAD_THRESHOLD_RATIO', 3.0))
+# ...and this absolute RMS level (16-bit samples), so quiet rooms aren't all "speech"
+VAD_MIN_RMS = int(os.getenv('VAD_MIN_RMS', 200))
+
+# Silence after speech that ends an utterance on a live stream
+VAD_END_SILENCE_MS = int(os.getenv('VAD_END_SILENCE_MS', 700))
+# Consecutive loud frames before a live stream counts as speech
+VAD_SPEECH_START_FRAMES = 3
+# Longest utterance accepted on a live stream
+VOICE_MAX_SECONDS = int(os.getenv('VOICE_MAX_SECONDS', 30))
+
+# Encoding of audio uploaded to Gemini for transcription: wav, flac or opus
+AUDIO_UPLOAD_ENCODING = os.getenv('AUDIO_UPLOAD_ENCODING', 'flac').lower()
+
+UPLOAD_ENCODINGS = {
+    'flac': (['-c:a', 'flac', '-f', 'flac'], 'audio/flac'),
+    'opus': (['-c:a', 'libopus', '-b:a', '24k', '-f', 'ogg'], 'audio/ogg')
+}
+
+_audio_stats = {
+    'clips': 0,
+    'pcm_bytes_in': 0,
+    'pcm_bytes_kept': 0,
+    'upload_bytes_wav': 0,
+    'upload_bytes_sent': 0
+}
+_audio_stats_lock = threading.Lock()
+
+def _count(**amounts):
+    with _audio_stats_lock:
+        for stat, amount in amounts.items():
+            _audio_stats[stat] += amount
+
+def get_audio_stats():
+    """Return counters of audio trimmed and bytes saved before recognition."""
+    with _audio_stats_lock:
+        stats = dict(_audio_stats)
+    stats['bytes_saved_trimming'] = stats['pcm_bytes_in'] - stats['pcm_bytes_kept']
+    stats['bytes_saved_encoding'] = stats['upload_bytes_wav'] - stats['upload_bytes_sent']
+    return stats
+
+def frame_energies(pcm_bytes, sample_rate=SAMPLE_RATE, frame_ms=VAD_FRAME_MS):
+    """Return the RMS energy of each frame of raw mono 16-bit PCM."""
+    samples = array('h')
+    samples.frombytes(pcm_bytes[:len(pcm_bytes) - len(pcm_bytes) % SAMPLE_WIDTH])
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    frame_length = max(1, sample_rate * frame_ms // 1000)
+    energies = []
+    for start in range(0, len(samples), frame_length):
+        frame = samples[start:start + frame_length]
+        energies.append(math.sqrt(sum(sample * sample for sample in frame) / len(frame)))
+    return energies
+
+def trim_silence(pcm_bytes, sample_rate=SAMPLE_RATE):
+    """
+    Trim leading and trailing silence from raw mono 16-bit PCM.
+
+    Uses an energy-based voice activity detector: the noise floor is taken
+    from the quietest fifth of the frames, so it adapts to the cab's
+    background noise, and frames well above it count as speech. Audio
+    between the first and last speech frame is kept, with VAD_PADDING_MS on
+    either side. If no speech is detected the audio is returned unchanged.
+    """
+    energies = frame_energies(pcm_bytes, sample_rate)
+    if not energies:
+        return pcm_bytes
+
+    noise_floor = sorted(energies)[len(energies) // 5]
+    threshold = max(VAD_MIN_RMS, noise_floor * VAD_THRESHOLD_RATIO)
+    speech = [i for i, energy in enumerate(energies) if energy > threshold]
+    if not speech:
+        logger.info("No speech detected, keeping audio untrimmed")
+        return pcm_bytes
+
+    frame_bytes = sample_rate * VAD_FRAME_MS // 1000 * SAMPLE_WIDTH
+    padding_bytes = sample_rate * VAD_PADDING_MS // 1000 * SAMPLE_WIDTH
+    start = max(0, speech[0] * frame_bytes - padding_bytes)
+    end = min(len(pcm_bytes), (speech[-1] + 1) * frame_bytes + padding_bytes)
+    return pcm_bytes[start:end]
+
+class EndpointDetector:
+    """
+    Incremental end-of-utterance detection on a live PCM stream.
+
+    Feed raw mono 16-bit PCM as it is decoded. The noise floor starts from
+    the first frame and then follows the non-speech frames, so it adapts to
+    the cab's background noise. Speech starts after a few loud
+    frames in a row; the utterance ends once speech has been followed by
+    end_silence_ms of silence, or once max_seconds of audio were heard.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, end_silence_ms=VAD_END_SILENCE_MS,
+                 max_seconds=VOICE_MAX_SECONDS):
+        self.sample_rate = sample_rate
+        self.frame_bytes = sample_rate * VAD_FRAME_MS // 1000 * SAMPLE_WIDTH
+        self.end_silence_frames = max(1, end_silence_ms // VAD_FRAME_MS)
+        self.max_frames = int(max_seconds * 1000 // VAD_FRAME_MS)
+        self.speech_started = False
+        self.ended = False
+        self.noise_floor = None
+        self.frames = 0
+        self._pending = b''
+        self._loud_run = 0
+        self._silent_run = 0
+
+    def feed(self, pcm_bytes):
+        """Process more PCM. Returns True once the utterance has ended."""
+        self._pending += pcm_bytes
+        while not self.ended and len(self._pending) >= self.frame_bytes:
+            frame, self._pending = self._pending[:self.frame_bytes], self._pending[self.frame_bytes:]
+            self._process(frame_energies(frame, self.sample_rate)[0])
+        return self.ended
+
+    def _process(self, energy):
+        self.frames += 1
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        threshold = max(VAD_MIN_RMS, self.noise_floor * VAD_THRESHOLD_RATIO)
+
+        if energy > threshold:
+            self._loud_run += 1
+            self._silent_run = 0
+            if self._loud_run >= VAD_SPEECH_START_FRAMES:
+                self.speech_started = True
+        else:
+            self._loud_run = 0
+            self._silent_run += 1
+            # Follow the background down at once, but up only slowly so a
+            # passing horn or a driver who starts talking right away doesn't lift it
+            if energy < self.noise_floor:
+                self.noise_floor = energy
+            else:
+                self.noise_floor = 0.95 * self.noise_floor + 0.05 * energy
+
+        if self.speech_started and self._silent_run >= self.end_silence_frames:
+            self.ended = True
+        elif self.frames >= self.max_frames:
+            self.ended = True
+
+def decode_to_pcm(source, sample_rate=SAMPLE_RATE):
+    """
+    Decode encoded audio (WebM, Ogg, ...) to raw mono 16-bit PCM via pipes.
+    Runs as a job on the ffmpeg pool; returns a spooled file positioned at
+    the start of the PCM data.
+    """
+    return ffmpeg_pool.pipe(
+        ['-i', 'pipe:0', '-f', 's16le', '-acodec', 'pcm_s16le',
+         '-ar', str(sample_rate), '-ac', str(CHANNELS), 'pipe:1'],
+        source
+    )
+
+def resample_pcm(pcm, from_rate, to_rate=SAMPLE_RATE):
+    """
+    Resample raw mono 16-bit PCM via pipes.
+    Runs as a job on the ffmpeg pool; returns a spooled file positioned at
+    the start of the resampled PCM.
+    """
+    return ffmpeg_pool.pipe(
+        ['-f', 's16le', '-ar', str(from_rate), '-ac', str(CHANNELS), '-i', 'pipe:0',
+         '-f', 's16le', '-ar', str(to_rate), '-ac', str(CHANNELS), 'pipe:1'],
+        pcm
+    )
+
+def pcm_to_wav(pcm, sample_rate=SAMPLE_RATE):
+    """
+    Wrap raw mono 16-bit PCM into a WAV container.
+    Returns a spooled file positioned at the start of the WAV data.
+    """
+    wav = tempfile.SpooledTemporaryFile(max_size=AUDIO_SPOOL_MAX_BYTES)
+    with wave.open(wav, 'wb') as writer:
+        writer.setnchannels(CHANNELS)
+        writer.setsampwidth(SAMPLE_WIDTH)
+        writer.setframerate(sample_rate)
+        while True:
+            chunk = pcm.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.writeframes(chunk)
+    wav.seek(0)
+    return wav
+
+def speech_wav(pcm_bytes, sample_rate=SAMPLE_RATE, trim=VAD_ENABLED):
+    """
+    Prepare decoded PCM for recognition: trim silence and wrap it as WAV.
+    Returns a spooled WAV file positioned at the start.
+    """
+    kept = trim_silence(pcm_bytes, sample_rate) if trim else pcm_bytes
+    _count(clips=1, pcm_bytes_in=len(pcm_bytes), pcm_bytes_kept=len(kept))
+    wav = pcm_to_wav(io.BytesIO(kept), sample_rate)
+    logger.info(
+        f"Prepared speech audio, kept {len(kept) / (sample_rate * SAMPLE_WIDTH):.1f}s "
+        f"of {len(pcm_bytes) / (sample_rate * SAMPLE_WIDTH):.1f}s, WAV size: {wav_size(wav)} bytes"
+    )
+    return wav
+
+def convert_to_wav(source, sample_rate=SAMPLE_RATE, trim=VAD_ENABLED):
+    """
+    Convert an uploaded audio stream to a 16 kHz mono WAV file object,
+    trimming leading and trailing silence unless VAD is disabled.
+    Returns the WAV file object (the caller closes it), or None on failure.
+    Raises FFmpegBusyError when the ffmpeg pool is saturated.
+    """
+    try:
+        with decode_to_pcm(source, sample_rate) as pcm:
+            return speech_wav(pcm.read(), sample_rate, trim)
+    except FFmpegBusyError:
+        raise
+    except FFmpegError as e:
+        logger.error(f"Error converting audio to WAV: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error in conversion: {e}")
+    return None
+
+def wav_size(wav):
+    """Return the size of a seekable file object without moving its position."""
+    position = wav.tell()
+    wav.seek(0, os.SEEK_END)
+    size = wav.tell()
+    wav.seek(position)
+    return size
+
+def encode_for_upload(wav, encoding=AUDIO_UPLOAD_ENCODING):
+    """
+    Encode a WAV file object compactly for upload to a recognition API.
+
+    FLAC is lossless and roughly halves speech audio; Opus is far smaller
+    but lossy. Falls back to the WAV itself if encoding fails.
+    Returns (audio bytes, mime type).
+    """
+    wav.seek(0)
+    wav_bytes = wav.read()
+    data, mime_type = wav_bytes, 'audio/wav'
+    if encoding in UPLOAD_ENCODINGS:
+        codec_args, encoded_mime_type = UPLOAD_ENCODINGS[encoding]
+        try:
+            with ffmpeg_pool.pipe(['-i', 'pipe:0'] + codec_args + ['pipe:1'], io.BytesIO(wav_bytes)) as encoded:
+                data, mime_type = encoded.read(), encoded_mime_type
+        except (FFmpegError, OSError) as e:
+            logger.warning(f"Could not encode audio as {encoding}, uploading WAV: {e}")
+    _count(upload_bytes_wav=len(wav_bytes), upload_bytes_sent=len(data))
+    return data, mime_type
@@ -0,0 +1,324 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import threading
+import logging
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # No cross-process index lock (e.g. on Windows); run a single worker there
+
+logger = logging.getLogger(__name__)
+
+# Cache limits, overridable from the environment
+AUDIO_CACHE_MAX_BYTES = int(os.getenv('AUDIO_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+AUDIO_CACHE_JANITOR_INTERVAL = int(os.getenv('AUDIO_CACHE_JANITOR_INTERVAL', 300))
+# Temp files older than this are considered left behind by a crashed writer
+AUDIO_CACHE_ORPHAN_AGE = int(os.getenv('AUDIO_CACHE_ORPHAN_AGE', 600))
+# Eviction frees space down to this share of the budget, so it runs in batches
+AUDIO_CACHE_EVICT_TARGET = float(os.getenv('AUDIO_CACHE_EVICT_TARGET', 0.9))
+
+INDEX_FILENAME = 'index.json'
+INDEX_LOCK_FILENAME = 'index.lock'
+TEMP_SUFFIXES = ('.part', '.temp.mp3')
+
+class AudioCache:
+    """
+    Size-bounded cache of audio files with an on-disk index.
+
+    The index records size, last hit time and hit count per file, so
+    eviction can drop the least recently used files once the cache exceeds
+    its byte budget. Files are written to a temp file and renamed into place,
+    so readers never see a partial MP3. A janitor thread removes orphaned
+    temp files, reconciles the index with the directory and persists it.
+
+    Every worker process keeps its own in-memory index of the shared
+    directory. Persisting and evicting happen under a file lock on a merge
+    of the on-disk index and the local one, so the byte budget holds across
+    processes and no worker's entries are lost. Files evicted by another
+    worker are noticed on lookup and treated as misses.
+    """
+
+    def __init__(self, cache_dir, max_bytes=AUDIO_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(cache_dir, INDEX_FILENAME)
+        self._index = {}  # filename -> {"size", "last_hit", "hits"}
+        self._pinned = set()  # Files that are never evicted
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._janitor = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.orphans_removed = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def path(self, filename):
+        """Return the absolute path of a cached file."""
+        return os.path.join(self.cache_dir, filename)
+
+    def lookup(self, filename):
+        """
+        Look up a cached file, counting a hit or miss.
+        Returns the file path, or None if the file is not cached.
+        """
+        with self._lock:
+            entry = self._index.get(filename)
+            if entry is not None and not os.path.exists(self.path(filename)):
+                # Evicted by another worker process
+                self._total_bytes -= self._index.pop(filename)['size']
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            entry['hits'] += 1
+            entry['last_hit'] = time.time()
+            self.hits += 1
+            self._dirty = True
+            return self.path(filename)
+
+    def contains(self, filename):
+        """Check whether a file is cached without counting a hit or miss."""
+        with self._lock:
+            return filename in self._index
+
+    def put(self, filename, writer):
+        """
+        Atomically add a file to the cache.
+
+        Args:
+            filename: Name of the file inside the cache directory
+            writer: Callable that writes the file to the temp path it is given
+
+        Returns:
+            The path of the cached file
+        """
+        final_path = self.path(filename)
+        temp_path = f"{final_path}.{uuid.uuid4().hex}.part"
+        try:
+            writer(temp_path)
+            os.replace(temp_path, final_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self.record(filename)
+        with self._lock:
+            self.writes += 1
+        self.evict()
+        return final_path
+
+    def put_bytes(self, filename, data):
+        """Atomically add a file with the given contents to the cache."""
+        def write(path):
+            with open(path, 'wb') as f:
+                f.write(data)
+        return self.put(filename, write)
+
+    def record(self, filename):
+        """(Re)record an existing file in the index, e.g. after it was rewritten in place."""
+        try:
+            size = os.path.getsize(self.path(filename))
+        except OSError:
+            return
+        with self._lock:
+            entry = self._index.get(filename)
+            if entry is None:
+                entry = {'size': 0, 'last_hit': time.time(), 'hits': 0}
+                self._index[filename] = entry
+            self._total_bytes += size - entry['size']
+            entry['size'] = size
+            entry['last_hit'] = time.time()
+            self._dirty = True
+
+    def pin(self, filename):
+        """Exempt a file from eviction (e.g. pre-rendered phrases)."""
+        with self._lock:
+            self._pinned.add(filename)
+
+    def evict(self):
+        """Enforce the byte budget (across processes) once this process sees it exceeded."""
+        with self._lock:
+            if self._total_bytes <= self.max_bytes:
+                return
+        self.flush(force=True)
+
+    def cleanup_orphans(self, max_age=AUDIO_CACHE_ORPHAN_AGE):
+        """
+        Remove stale temp files and reconcile the index with the directory.
+        Files missing from disk are dropped from the index; untracked audio
+        files are adopted into it.
+        """
+        now = time.time()
+        on_disk = set()
+        for name in os.listdir(self.cache_dir):
+            path = self.path(name)
+            if name in (INDEX_FILENAME, INDEX_LOCK_FILENAME) or not os.path.isfile(path):
+                continue
+            if name.endswith(TEMP_SUFFIXES):
+                try:
+                    if now - os.path.getmtime(path) > max_age:
+                        os.remove(path)
+                        self.orphans_removed += 1
+                        logger.info(f"Removed orphaned audio temp file: {name}")
+                except OSError:
+                    pass
+                continue
+            on_disk.add(name)
+
+        with self._lock:
+            for filename in set(self._index) - on_disk:
+                self._total_bytes -= self._index.pop(filename)['size']
+                self._dirty = True
+            untracked = on_disk - set(self._index)
+
+        for filename in untracked:
+            self.record(filename)
+
+    def flush(self, force=False):
+        """
+        Merge the index with the on-disk one, evict least recently used files
+        beyond the byte budget and persist the result. Does nothing unless the
+        index changed or force is set.
+        """
+        with self._lock:
+            if not self._dirty and not force:
+                return
+        victims = []
+        try:
+            with self._index_lock():
+                with self._lock:
+                    merged = self._read_index()
+                    for filename, entry in self._index.items():
+                        other = merged.get(filename) or {}
+                        if entry['last_hit'] >= other.get('last_hit', 0):
+                            # The most recent hit wins; flags like 'pinned' from either side are kept
+                            merged[filename] = {**other, **entry, 'hits': max(entry['hits'], other.get('hits', 0))}
+                    # Pins are shared, so a worker that didn't pin a phrase won't evict it
+                    for filename in self._pinned & merged.keys():
+                        merged[filename]['pinned'] = True
+                    # Drop entries whose files another process already removed
+                    merged = {filename: entry for filename, entry in merged.items() if os.path.exists(self.path(filename))}
+                    total_bytes = sum(entry['size'] for entry in merged.values())
+                    if total_bytes > self.max_bytes:
+                        target = self.max_bytes * AUDIO_CACHE_EVICT_TARGET
+                        for filename, entry in sorted(merged.items(), key=lambda item: item[1]['last_hit']):
+                            if total_bytes <= target:
+                                break
+                            if entry.get('pinned'):
+                                continue
+                            victims.append(filename)
+                            total_bytes -= entry['size']
+                        for filename in victims:
+                            del merged[filename]
+                        self.evictions += len(victims)
+                    self._index = merged
+                    self._total_bytes = total_bytes
+                    self._dirty = False
+                    snapshot = json.dumps(merged)
+                # Remove victims before publishing the index that no longer lists them
+                for filename in victims:
+                    try:
+                        os.remove(self.path(filename))
+                    except OSError as e:
+                        logger.warning(f"Could not remove evicted audio file {filename}: {e}")
+                temp_path = f"{self.index_file}.{uuid.uuid4().hex}.part"
+                with open(temp_path, 'w') as f:
+                    f.write(snapshot)
+                os.replace(temp_path, self.index_file)
+        except OSError as e:
+            logger.warning(f"Could not write audio cache index: {e}")
+        if victims:
+            logger.info(f"Audio cache evicted {len(victims)} files, {self._total_bytes} bytes in use")
+
+    def start_janitor(self, interval=AUDIO_CACHE_JANITOR_INTERVAL):
+        """Start the background janitor thread (only the first call has an effect)."""
+        with self._lock:
+            if self._janitor is not None:
+                return
+            self._janitor = threading.Thread(
+                target=self._janitor_loop, args=(interval,), name='audio-cache-janitor', daemon=True
+            )
+        self._janitor.start()
+
+    def stats(self):
+        """Return hit/miss counters and size of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'files': len(self._index),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'pinned': len(self._pinned),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'orphans_removed': self.orphans_removed
+            }
+
+    def _janitor_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.cleanup_orphans()
+                self.flush(force=self._total_bytes > self.max_bytes)
+            except Exception as e:
+                logger.error(f"Audio cache janitor error: {e}", exc_info=True)
+
+    def _read_index(self):
+        """Read the on-disk index, or an empty one if it is missing or unusable."""
+        try:
+            with open(self.index_file) as f:
+                index = json.load(f)
+            if all(isinstance(entry.get('size'), int) for entry in index.values()):
+                return index
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {}
+
+    @contextmanager
+    def _index_lock(self):
+        """Hold the cross-process lock on the on-disk index."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.cache_dir, INDEX_LOCK_FILENAME), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self):
+        """Load the on-disk index, rebuilding it from the directory if unusable."""
+        self._index = self._read_index()
+        self._total_bytes = sum(entry['size'] for entry in self._index.values())
+        # Pick up files written by other processes or before the index existed
+        self.cleanup_orphans()
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_audio_cache(cache_dir):
+    """Get the process-wide AudioCache for a directory, starting its janitor."""
+    cache_dir = os.path.abspath(cache_dir)
+    cache = _caches.get(cache_dir)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(cache_dir)
+            if cache is None:
+                cache = AudioCache(cache_dir)
+                cache.start_janitor()
+                atexit.register(cache.flush)
+                _caches[cache_dir] = cache
+    return cache
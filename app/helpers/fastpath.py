@@ -0,0 +1,224 @@
+import os
+import re
+import time
+import threading
+import logging
+from app.helpers.phrases import phrase_text
+from app.helpers.response_cache import normalize_message
+
+logger = logging.getLogger(__name__)
+
+# Share of the message's words a rule must account for before it answers
+FASTPATH_MIN_CONFIDENCE = float(os.getenv('FASTPATH_MIN_CONFIDENCE', 0.85))
+FASTPATH_ENABLED = os.getenv('FASTPATH_ENABLED', 'true').lower() == 'true'
+
+# Question words that don't change which fact is asked for (after normalize_message)
+COMMON_WORDS = {
+    'what', 'whats', 'is', 'was', 'are', 'the', 'my', 'me', 'of', 'a', 'tell', 'show', 'check', 'current',
+    'currently', 'now', 'please', 'can', 'you', 'i', 'know', 'want', 'to', 'do', 'does', 'will', 'be',
+    'mera', 'mujhe', 'kya', 'hai', 'batao', 'abhi', 'ka', 'ki', 'ke', 'kitna', 'kab', 'tha', 'hua',
+    'hoga', 'meri', 'apna', 'apni', 'e', 'rickshaw', 'erickshaw', 'vehicle', 'gadi',
+    'मेरा', 'मेरी', 'क्या', 'है', 'कितनी', 'कितना', 'कब', 'बताओ', 'था', 'की', 'का'
+}
+
+def words(*alternatives):
+    """
+    Regex matching any of the given words or phrases as whole words.
+    Whitespace is the boundary, since \\b breaks on Devanagari vowel signs.
+    """
+    return r'(?<!\S)(?:' + '|'.join(re.escape(alternative) for alternative in alternatives) + r')(?!\S)'
+
+# Problem reports and how-to questions need advice, not a dashboard value; those go to the LLM
+FALLTHROUGH_PATTERN = re.compile(words(
+    'not', 'nahi', 'why', 'kyun', 'kyon', 'problem', 'issue', 'slow', 'fast', 'quickly', 'jaldi',
+    'time', 'long', 'low', 'drain', 'draining', 'khatam', 'kharab', 'damage', 'smoke', 'kaise',
+    'how to', 'how can', 'how do', 'how long', 'increase', 'improve', 'help',
+    'नहीं', 'क्यों', 'कैसे', 'समस्या', 'खराब'
+))
+
+class FastPathRule:
+    """
+    A question answerable from dashboard data alone.
+
+    The rule applies when its pattern matches the normalized message and its
+    exclude pattern doesn't; its confidence is the share of the message's
+    words found in the rule's vocabulary or COMMON_WORDS, so extra
+    unexplained words lower it.
+    """
+
+    def __init__(self, name, pattern, vocabulary, templates, exclude=None):
+        """
+        Args:
+            name: Rule name used in stats
+            pattern: Regex searched in the normalized message
+            vocabulary: Words the rule accounts for besides COMMON_WORDS
+            templates: Answer per language, formatted with the dashboard fields
+                (or a callable taking the dashboard and language)
+            exclude: Optional regex of cues that the question is about something else
+        """
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.vocabulary = set(vocabulary)
+        self.templates = templates
+        self.exclude = re.compile(exclude) if exclude else None
+
+    def confidence(self, normalized):
+        """Return the rule's confidence for a normalized message (0 if it doesn't match)."""
+        if not self.pattern.search(normalized):
+            return 0.0
+        if self.exclude is not None and self.exclude.search(normalized):
+            return 0.0
+        tokens = normalized.split()
+        explained = sum(token in self.vocabulary or token in COMMON_WORDS for token in tokens)
+        return explained / len(tokens)
+
+    def render(self, dashboard, language):
+        if callable(self.templates):
+            return self.templates(dashboard, language)
+        template = self.templates.get(language) or self.templates['en']
+        return template.format(**dashboard)
+
+SERVICE = words('service', 'servicing', 'सर्विस')
+BATTERY = words('battery', 'baitri', 'बैटरी')
+BATTERY_LEVEL = words('percent', 'percentage', 'level', 'status', 'charge', 'left', 'remaining', 'kitna',
+                      'bacha', 'bachi', 'how much', 'चार्ज', 'प्रतिशत', 'कितनी', 'कितना')
+# The battery rule only answers status questions about the vehicle: not how-to
+# questions ("how do I charge my battery"), charging instructions or other devices
+BATTERY_EXCLUDE = (
+    r'(?<!\S)how(?! much(?!\S))(?!\S)|' + words(
+        'why', 'kaise', 'charge my', 'charge the', 'charge battery', 'charge it', 'charging', 'charger',
+        'phone', 'mobile', 'laptop', 'watch', 'remote', 'फोन', 'मोबाइल', 'कैसे'
+    )
+)
+
+FASTPATH_RULES = [
+    FastPathRule(
+        'greeting',
+        r'^(?:(?:hi|namaste|नमस्ते|good morning|good evening|good afternoon)(?: |$))+$',
+        {'hi', 'namaste', 'good', 'morning', 'evening', 'afternoon', 'नमस्ते'},
+        lambda dashboard, language: phrase_text('welcome', language)
+    ),
+    FastPathRule(
+        'battery_level',
+        BATTERY + '.*' + BATTERY_LEVEL + '|' + BATTERY_LEVEL + '.*' + BATTERY + '|^' + BATTERY + '$',
+        {'battery', 'baitri', 'percent', 'percentage', 'level', 'status', 'charge', 'left', 'remaining',
+         'bacha', 'bachi', 'much', 'how', 'बैटरी', 'चार्ज', 'प्रतिशत'},
+        {
+            'en': "Your battery is at {battery_percentage}%.",
+            'hi': "आपकी बैटरी {battery_percentage}% चार्ज है।"
+        },
+        exclude=BATTERY_EXCLUDE
+    ),
+    FastPathRule(
+        'last_service',
+        words('last', 'previous', 'pichla', 'pichli', 'पिछली', 'पिछला') + '.*' + SERVICE
+        + '|' + SERVICE + '.*' + words('tha', 'hua', 'was', 'हुई', 'थी'),
+        {'last', 'previous', 'pichla', 'pichli', 'service', 'servicing', 'date', 'done', 'when', 'hui',
+         'thi', 'पिछली', 'पिछला', 'सर्विस', 'हुई', 'थी'},
+        {
+            'en': "Your last service was on {last_service}.",
+            'hi': "आपकी पिछली सर्विस {last_service} को हुई थी।"
+        }
+    ),
+    FastPathRule(
+        'next_service',
+        words('next', 'upcoming', 'agla', 'agli', 'अगली', 'अगला') + '.*' + SERVICE
+        + '|' + SERVICE + '.*' + words('due', 'hoga', 'hogi', 'karni', 'karwani', 'होगी'),
+        {'next', 'upcoming', 'agla', 'agli', 'service', 'servicing', 'due', 'date', 'when', 'hogi',
+         'karni', 'karwani', 'अगली', 'अगला', 'सर्विस', 'होगी'},
+        {
+            'en': "Your next service is due on {next_service}.",
+            'hi': "आपकी अगली सर्विस {next_service} को होनी है।"
+        }
+    ),
+    FastPathRule(
+        'vehicle_number',
+        words('vehicle', 'gadi', 'rickshaw', 'erickshaw', 'गाड़ी') + '.*' + words('number', 'no', 'नंबर')
+        + '|' + words('number plate', 'registration'),
+        {'number', 'no', 'registration', 'plate', 'नंबर', 'गाड़ी'},
+        {
+            'en': "Your vehicle number is {vehicle_number}.",
+            'hi': "आपकी गाड़ी का नंबर {vehicle_number} है।"
+        }
+    ),
+    FastPathRule(
+        'driver_rating',
+        words('rating', 'रेटिंग'),
+        {'rating', 'driver', 'score', 'रेटिंग', 'ड्राइवर'},
+        {
+            'en': "Your driver rating is {driver_rating}.",
+            'hi': "आपकी ड्राइवर रेटिंग {driver_rating} है।"
+        }
+    ),
+]
+
+class FastPath:
+    """
+    Template answers for deterministic dashboard questions, in front of the LLM.
+
+    Messages are normalized (Hinglish spellings folded, fillers dropped) and
+    scored against every rule; the best rule answers only if its confidence
+    reaches min_confidence and the message has no problem-report or how-to
+    words (e.g. "not", "why", "kharab"). Everything else falls through to Gemini.
+    """
+
+    def __init__(self, rules=FASTPATH_RULES, min_confidence=FASTPATH_MIN_CONFIDENCE, enabled=FASTPATH_ENABLED):
+        self.rules = rules
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.answered = 0
+        self.low_confidence = 0
+        self.by_rule = {}
+        self.answer_us_total = 0.0
+
+    def answer(self, message, dashboard, language='en'):
+        """Return a templated reply for a message, or None to fall through to the LLM."""
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        normalized = normalize_message(message)
+        rule, confidence = None, 0.0
+        if normalized and not FALLTHROUGH_PATTERN.search(normalized):
+            for candidate in self.rules:
+                score = candidate.confidence(normalized)
+                if score > confidence:
+                    rule, confidence = candidate, score
+
+        reply = None
+        if rule is not None and confidence >= self.min_confidence:
+            try:
+                reply = rule.render(dashboard, language)
+            except (KeyError, IndexError) as e:
+                logger.warning(f"Fast path rule {rule.name} could not render: {e}")
+        elapsed_us = (time.perf_counter() - started) * 1e6
+
+        with self._lock:
+            self.turns += 1
+            if reply is not None:
+                self.answered += 1
+                self.by_rule[rule.name] = self.by_rule.get(rule.name, 0) + 1
+                self.answer_us_total += elapsed_us
+            elif rule is not None:
+                self.low_confidence += 1
+        if reply is not None:
+            logger.info(f"Fast path answered with rule {rule.name} (confidence {confidence:.2f})")
+        elif rule is not None:
+            logger.info(f"Fast path fell through: rule {rule.name} confidence {confidence:.2f}")
+        return reply
+
+    def stats(self):
+        """Return how many turns the fast path absorbed, per rule."""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'turns': self.turns,
+                'answered': self.answered,
+                'answered_ratio': round(self.answered / self.turns, 3) if self.turns else None,
+                'low_confidence': self.low_confidence,
+                'by_rule': dict(self.by_rule),
+                'answer_us_avg': round(self.answer_us_total / self.answered, 1) if self.answered else None
+            }
+
+fast_path = FastPath()
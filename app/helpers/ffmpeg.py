@@ -0,0 +1,242 @@
+import os
+import math
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Concurrency limits, overridable from the environment
+FFMPEG_MAX_PROCESSES = int(os.getenv('FFMPEG_MAX_PROCESSES', os.cpu_count() or 2))
+# Jobs beyond this many queued or running are rejected instead of piling up
+FFMPEG_MAX_PENDING = int(os.getenv('FFMPEG_MAX_PENDING', 4 * FFMPEG_MAX_PROCESSES))
+# Longest a caller waits for its job to finish
+FFMPEG_JOB_TIMEOUT = float(os.getenv('FFMPEG_JOB_TIMEOUT', 30))
+
+# Pipe output is kept in memory up to this size, then spilled to disk
+AUDIO_SPOOL_MAX_BYTES = int(os.getenv('AUDIO_SPOOL_MAX_BYTES', 8 * 1024 * 1024))
+
+CHUNK_SIZE = 64 * 1024
+
+class FFmpegError(Exception):
+    """Raised when an ffmpeg job fails."""
+
+class FFmpegBusyError(FFmpegError):
+    """Raised when the ffmpeg pool is saturated and a job is rejected."""
+
+_available = None
+_available_lock = threading.Lock()
+
+def ffmpeg_available(refresh=False):
+    """
+    Check whether ffmpeg can be run.
+    The result of the first check is cached; pass refresh=True to probe again.
+    """
+    global _available
+    if _available is not None and not refresh:
+        return _available
+    with _available_lock:
+        if _available is None or refresh:
+            try:
+                subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+                _available = True
+            except (subprocess.CalledProcessError, OSError):
+                logger.warning("FFmpeg is not available. Audio conversion will not work.")
+                _available = False
+    return _available
+
+def atempo_filter(speed):
+    """
+    Build an atempo filter chain; a single atempo only accepts 0.5 to 2.0.
+    Raises ValueError for speeds that are not positive and finite.
+    """
+    if not math.isfinite(speed) or speed <= 0:
+        raise ValueError(f"Invalid tempo: {speed}")
+    filters = []
+    while speed > 2.0:
+        filters.append('atempo=2.0')
+        speed /= 2.0
+    while speed < 0.5:
+        filters.append('atempo=0.5')
+        speed /= 0.5
+    filters.append(f'atempo={speed:g}')
+    return ','.join(filters)
+
+def _feed(source, stdin):
+    """Copy a source stream into ffmpeg's stdin, closing it at the end."""
+    try:
+        shutil.copyfileobj(source, stdin, CHUNK_SIZE)
+    except (BrokenPipeError, ValueError):
+        # ffmpeg exited early; its exit status reports the reason
+        pass
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+def pipe_through_ffmpeg(args, source, on_output=None):
+    """
+    Run ffmpeg with stdin and stdout as pipes and collect its output.
+
+    The source stream is written to ffmpeg's stdin from a feeder thread while
+    the output is read from its stdout, so neither side touches the disk. The
+    output is collected in a SpooledTemporaryFile that only spills to disk
+    above AUDIO_SPOOL_MAX_BYTES.
+
+    Args:
+        args: ffmpeg arguments reading from pipe:0 and writing to pipe:1
+        source: Readable binary file-like object fed to stdin
+        on_output: Optional callable receiving each chunk of output as soon
+            as ffmpeg produces it, for incremental processing
+
+    Returns:
+        A spooled file positioned at the start of the output; the caller closes it
+    """
+    process = subprocess.Popen(
+        ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error'] + args,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    stderr = []
+    feeder = threading.Thread(target=_feed, args=(source, process.stdin), daemon=True)
+    drainer = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    feeder.start()
+    drainer.start()
+
+    output = tempfile.SpooledTemporaryFile(max_size=AUDIO_SPOOL_MAX_BYTES)
+    try:
+        while True:
+            chunk = process.stdout.read1(CHUNK_SIZE)
+            if not chunk:
+                break
+            output.write(chunk)
+            if on_output is not None:
+                on_output(chunk)
+        returncode = process.wait()
+        feeder.join()
+        drainer.join()
+    except BaseException:
+        process.kill()
+        output.close()
+        raise
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+
+    if returncode != 0 or output.tell() == 0:
+        output.close()
+        detail = b''.join(stderr).decode(errors='replace').strip() or 'no output'
+        raise FFmpegError(f"ffmpeg exited with {returncode}: {detail}")
+
+    output.seek(0)
+    return output
+
+def run_ffmpeg(args):
+    """Run ffmpeg on files, raising FFmpegError with its stderr on failure."""
+    try:
+        subprocess.run(
+            ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error'] + args,
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+    except subprocess.CalledProcessError as e:
+        detail = e.stderr.decode(errors='replace').strip() if e.stderr else 'No error output'
+        raise FFmpegError(f"ffmpeg exited with {e.returncode}: {detail}") from e
+
+class FFmpegPool:
+    """
+    Bounded pool for ffmpeg jobs.
+
+    A fixed set of long-lived worker threads runs the jobs, so at most
+    max_processes ffmpeg processes exist at any time however many requests
+    arrive. Jobs beyond max_pending queued or running are rejected with
+    FFmpegBusyError rather than queued without bound, which lets endpoints
+    answer 503 during a burst. ffmpeg handles one input per process, so each
+    job still starts its own process; the pool bounds and schedules them.
+    """
+
+    def __init__(self, max_processes=FFMPEG_MAX_PROCESSES, max_pending=FFMPEG_MAX_PENDING, name='ffmpeg'):
+        self.name = name
+        self.max_processes = max_processes
+        self.max_pending = max(max_pending, max_processes)
+        self._executor = ThreadPoolExecutor(max_workers=max_processes, thread_name_prefix=name)
+        self._pending = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue a job running fn(*args, **kwargs) on a pool worker.
+        Returns a Future; raises FFmpegBusyError if the pool is saturated.
+        """
+        if not self._pending.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise FFmpegBusyError(f"{self.name} pool saturated ({self.max_pending} jobs pending)")
+        try:
+            return self._executor.submit(self._run_job, fn, args, kwargs)
+        except BaseException:
+            self._pending.release()
+            raise
+
+    def call(self, fn, *args, timeout=FFMPEG_JOB_TIMEOUT, **kwargs):
+        """Run a job on the pool and wait for its result."""
+        return self.submit(fn, *args, **kwargs).result(timeout)
+
+    def pipe(self, args, source, timeout=FFMPEG_JOB_TIMEOUT):
+        """Job: pipe a stream through ffmpeg (see pipe_through_ffmpeg)."""
+        return self.call(pipe_through_ffmpeg, args, source, timeout=timeout)
+
+    def run(self, args, timeout=FFMPEG_JOB_TIMEOUT):
+        """Job: run ffmpeg on files (see run_ffmpeg)."""
+        return self.call(run_ffmpeg, args, timeout=timeout)
+
+    def atempo(self, input_path, output_path, speed, timeout=FFMPEG_JOB_TIMEOUT):
+        """Job: change the tempo of an MP3 file without changing its pitch."""
+        return self.run([
+            '-i', input_path,
+            '-filter:a', atempo_filter(speed),
+            '-f', 'mp3', '-y', output_path
+        ], timeout=timeout)
+
+    def stats(self):
+        """Return concurrency limits and job counters."""
+        with self._lock:
+            return {
+                'available': _available,
+                'max_processes': self.max_processes,
+                'max_pending': self.max_pending,
+                'active': self.active,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'busy_seconds': round(self.busy_seconds, 3)
+            }
+
+    def _run_job(self, fn, args, kwargs):
+        started = time.monotonic()
+        with self._lock:
+            self.active += 1
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.busy_seconds += time.monotonic() - started
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            self._pending.release()
+
+ffmpeg_pool = FFmpegPool()
@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Persistent cache and rate limiter state, shared by all worker processes
+GEOCODE_DB_PATH = os.getenv(
+    'GEOCODE_DB_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'geocode.sqlite3')
+)
+GEOCODE_CACHE_TTL = int(os.getenv('GEOCODE_CACHE_TTL', 30 * 24 * 3600))
+# Reverse lookups are keyed by geohash cell; precision 7 is roughly 150 m x 150 m
+REVERSE_GEOHASH_PRECISION = int(os.getenv('REVERSE_GEOHASH_PRECISION', 7))
+# Nominatim's usage policy allows at most one request per second per application
+NOMINATIM_RATE_PER_SECOND = float(os.getenv('NOMINATIM_RATE_PER_SECOND', 1.0))
+NOMINATIM_BURST = float(os.getenv('NOMINATIM_BURST', 1.0))
+# Longest a request waits for a rate limiter token before giving up
+GEOCODE_RATE_WAIT = float(os.getenv('GEOCODE_RATE_WAIT', 2.0))
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+class RateLimitedError(Exception):
+    """Raised when no rate limiter token became available in time."""
+
+def geohash_encode(lat, lon, precision=REVERSE_GEOHASH_PRECISION):
+    """Encode coordinates as a geohash of the given length."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, interval = (lon, lon_range) if even else (lat, lat_range)
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+def geohash_decode(geohash):
+    """Return the (lat, lon) center of a geohash cell."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+def normalize_query(query):
+    """Fold a free-text geocoding query for use as a cache key."""
+    return ' '.join((query or '').casefold().replace(',', ' ').split())
+
+class _Database:
+    """SQLite connection per thread, in WAL mode so worker processes can share the file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self.connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS geocode_cache ('
+                'kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT, created REAL NOT NULL, '
+                'PRIMARY KEY (kind, key))'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limits ('
+                'name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+
+    def connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+class TokenBucket:
+    """
+    Token bucket rate limiter stored in SQLite.
+
+    The bucket lives in the shared database, so every worker process draws
+    from the same budget; an IMMEDIATE transaction serializes the refill and
+    take across processes.
+    """
+
+    def __init__(self, db, name, rate, capacity):
+        self.db = db
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+
+    def acquire(self, timeout=GEOCODE_RATE_WAIT):
+        """Take a token, waiting up to timeout seconds. Returns False if none became available."""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(wait, remaining))
+
+    def _try_take(self):
+        """Take a token if available. Returns 0 on success, else the seconds until one refills."""
+        conn = self.db.connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM rate_limits WHERE name = ?', (self.name,)).fetchone()
+            tokens = self.capacity if row is None else min(self.capacity, row[0] + (now - row[1]) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limits (name, tokens, updated) VALUES (?, ?, ?)',
+                (self.name, tokens, now)
+            )
+            conn.execute('COMMIT')
+            return wait
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+class Geocoder:
+    """
+    Forward and reverse geocoding behind a persistent cache and a shared rate limit.
+
+    Results (including "not found") are cached in SQLite for ttl_seconds,
+    forward lookups keyed by the normalized query and reverse lookups by the
+    geohash cell of the coordinates, so nearby drivers share entries. Misses
+    take a token from the limiter before calling the provider; if none is
+    available in time, RateLimitedError is raised instead of exceeding the
+    provider's usage policy.
+    """
+
+    def __init__(self, db_path=GEOCODE_DB_PATH, ttl_seconds=GEOCODE_CACHE_TTL,
+                 rate=NOMINATIM_RATE_PER_SECOND, burst=NOMINATIM_BURST):
+        self.db = _Database(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.limiter = TokenBucket(self.db, 'nominatim', rate, burst)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rate_limited = 0
+
+    def lookup(self, kind, key, fetch):
+        """
+        Return the cached value for (kind, key), or fetch and cache it.
+
+        Args:
+            kind: Lookup type, e.g. 'search' or 'reverse'
+            key: Cache key within the kind
+            fetch: Callable calling the provider; returns a JSON-serializable
+                value (None for "not found") and raises on provider errors
+
+        Raises:
+            RateLimitedError if the provider's rate limit leaves no token in time
+        """
+        conn = self.db.connect()
+        row = conn.execute(
+            'SELECT value, created FROM geocode_cache WHERE kind = ? AND key = ?', (kind, key)
+        ).fetchone()
+        if row is not None and time.time() - row[1] <= self.ttl_seconds:
+            with self._lock:
+                self.hits += 1
+            return json.loads(row[0])
+
+        with self._lock:
+            self.misses += 1
+        if not self.limiter.acquire():
+            with self._lock:
+                self.rate_limited += 1
+            raise RateLimitedError(f"Geocoding rate limit reached for {kind} lookup")
+
+        value = fetch()
+        conn.execute(
+            'INSERT OR REPLACE INTO geocode_cache (kind, key, value, created) VALUES (?, ?, ?, ?)',
+            (kind, key, json.dumps(value), time.time())
+        )
+        return value
+
+    def purge_expired(self):
+        """Delete expired cache entries. Returns the number removed."""
+        conn = self.db.connect()
+        return conn.execute(
+            'DELETE FROM geocode_cache WHERE created < ?', (time.time() - self.ttl_seconds,)
+        ).rowcount
+
+    def stats(self):
+        """Return cache hit/miss and rate limiting counters."""
+        entries = self.db.connect().execute('SELECT COUNT(*) FROM geocode_cache').fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'rate_limited': self.rate_limited
+            }
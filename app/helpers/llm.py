@@ -1,43 +1,114 @@
 import google.generativeai as genai
+import inspect
 import logging
 import json
+import threading
+from app.helpers.phrases import FALLBACK_RESPONSE_WITH_CONTACT
+from app.helpers.prompts import ASSISTANT_SYSTEM_INSTRUCTION, prompt_stats
+from app.helpers.sessions import SessionStore
 
 logger = logging.getLogger(__name__)
 
-# Store conversation history
-conversation_history = {}
+# Generation configuration for the model
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 1024,
+}
+
+# google-generativeai gained system_instruction in 0.5; older SDKs get it inlined
+SYSTEM_INSTRUCTION_SUPPORTED = 'system_instruction' in inspect.signature(genai.GenerativeModel).parameters
+
+# History entries that carry the system instruction when it can't be sent separately
+SYSTEM_HISTORY_ENTRIES = 0 if SYSTEM_INSTRUCTION_SUPPORTED else 2
+
+# Store conversation history (chat sessions keep their system instruction exchange)
+conversation_history = SessionStore('llm', keep_head=SYSTEM_HISTORY_ENTRIES)
+
+# ----- Model Registry -----
+_models = {}  # (model name, generation config) -> shared GenerativeModel
+_models_lock = threading.Lock()
+
+def _config_key(generation_config):
+    """Make a hashable registry key from a generation config dict."""
+    return tuple(sorted((generation_config or {}).items()))
+
+def get_model(model_name, generation_config=None, system_instruction=None):
+    """
+    Get the process-wide GenerativeModel for a model name, generation config
+    and system instruction.
+    
+    GenerativeModel keeps no per-request state, so a single instance per
+    configuration is shared by all requests and chat sessions instead of
+    being rebuilt on every call. The system instruction is dropped when the
+    SDK doesn't support it; use with_system_instruction() for the contents.
+    """
+    if not SYSTEM_INSTRUCTION_SUPPORTED:
+        system_instruction = None
+    key = (model_name, _config_key(generation_config), system_instruction)
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                kwargs = {'system_instruction': system_instruction} if system_instruction else {}
+                model = genai.GenerativeModel(model_name, generation_config=generation_config, **kwargs)
+                _models[key] = model
+                logger.info(f"Registered Gemini model {model_name} with config {dict(key[1])}"
+                            f"{' and system instruction' if system_instruction else ''}")
+    return model
+
+def with_system_instruction(system_instruction, contents):
+    """
+    Return the request contents for a model from get_model(): the contents
+    alone, or with the system instruction inlined if the SDK can't send it.
+    """
+    if SYSTEM_INSTRUCTION_SUPPORTED:
+        return contents
+    return f"{system_instruction}\n\n{contents}"
+
+def start_chat(model, system_instruction):
+    """
+    Start a chat session following the system instruction.
+    
+    The instruction travels with the model, so no priming round trip is
+    needed; without SDK support it is seeded into the history (the first
+    SYSTEM_HISTORY_ENTRIES entries) instead of being sent as a message.
+    """
+    if SYSTEM_INSTRUCTION_SUPPORTED:
+        return model.start_chat(history=[])
+    return model.start_chat(history=[
+        {'role': 'user', 'parts': [system_instruction]},
+        {'role': 'model', 'parts': ["Understood."]}
+    ])
+
+def warm_models(specs):
+    """
+    Pre-create models and the shared API transport before the first request.
+    
+    Args:
+        specs: Iterable of (model name, generation config[, system instruction]) tuples
+    """
+    for spec in specs:
+        get_model(*spec)
+    
+    # All models talk through genai's default client; create its channel now
+    # instead of lazily inside the first user request
+    try:
+        from google.generativeai import client
+        client.get_default_generative_client()
+    except Exception as e:
+        logger.warning(f"Could not pre-create Gemini client: {e}")
 
 def get_llm_response(message, dashboard, session_id):
     """Get a response from the LLM for the user's message."""
     try:
-        # Create model
-        model = genai.GenerativeModel(
-            "gemini-pro",
-            generation_config={
-                "temperature": 0.7,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 1024,
-            }
-        )
+        # Shared model for this configuration; the rules travel as its system instruction
+        model = get_model("gemini-1.5-flash", GENERATION_CONFIG, ASSISTANT_SYSTEM_INSTRUCTION)
         
-        # Create or get chat session
-        if session_id in conversation_history:
-            # Use existing history
-            chat = conversation_history[session_id]
-        else:
-            # Create new chat session
-            chat = model.start_chat(history=[])
-            conversation_history[session_id] = chat
-            
-            # Initialize with system prompt
-            system_prompt = f"""You are the SMV E-rickshaw Assistant. You MUST follow these rules:
-
-1. ALWAYS begin with "Namaste! I am your SMV E-rickshaw assistant."
-2. ONLY answer questions about e-rickshaws, their maintenance, battery issues, or dashboard
-3. For ANY non-e-rickshaw questions, respond ONLY with: "I can only assist with e-rickshaw related questions."
-4. ALWAYS include relevant dashboard data in your responses
-5. ALWAYS end with: "For assistance, contact SMV at 1800-XXX-XXXX"
+        # Add dashboard context to the user message
+        enhanced_message = f"""User Query: {message}
 
 Current dashboard data:
 - Battery: {dashboard['battery_percentage']}%
@@ -46,30 +117,29 @@ Current dashboard data:
 - Next service: {dashboard['next_service']}
 - Driver rating: {dashboard['driver_rating']}
 - Location: {dashboard['location']}"""
-            
-            # Send system prompt to initialize conversation
-            chat.send_message(system_prompt)
-        
-        # Add dashboard context to the user message
-        enhanced_message = f"""User Query: {message}
-
-Remember to check the dashboard:
-- Battery: {dashboard['battery_percentage']}%
-- Vehicle: {dashboard['vehicle_number']}
-- Last service: {dashboard['last_service']}
-- Next service: {dashboard['next_service']}"""
         
-        # Send message and get response
-        logger.info(f"Sending message to Gemini: {enhanced_message[:100]}...")
-        response = chat.send_message(enhanced_message)
+        # Send message and get response; a chat session must not be used
+        # by two requests at once
+        with conversation_history.lock(session_id):
+            # Create or get chat session
+            chat = conversation_history.get_or_create(
+                session_id, lambda: start_chat(model, ASSISTANT_SYSTEM_INSTRUCTION)
+            )
+            
+            logger.info(f"Sending message to Gemini: {enhanced_message[:100]}...")
+            response = chat.send_message(enhanced_message)
+            conversation_history.trim(session_id)
+        prompt_stats.record('assistant', ASSISTANT_SYSTEM_INSTRUCTION, enhanced_message,
+                            inlined=not SYSTEM_INSTRUCTION_SUPPORTED, response=response)
         
         if not response.text:
             logger.error("Empty response from LLM")
-            return "Namaste! I am your SMV E-rickshaw assistant. I apologize, but I'm experiencing technical difficulties. Please try again. For assistance, contact SMV at 1800-XXX-XXXX"
+            return FALLBACK_RESPONSE_WITH_CONTACT
             
         logger.info(f"LLM response: {response.text[:100]}...")
         return response.text
         
     except Exception as e:
         logger.error(f"Error getting LLM response: {e}", exc_info=True)
+        return FALLBACK_RESPONSE_WITH_CONTACT
  
\ No newline at end of file
@@ -1 +1,159 @@
- 
\ No newline at end of file
+import os
+import time
+import random
+import threading
+import logging
+from collections import deque
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Client limits, overridable from the environment
+MAPS_CONNECT_TIMEOUT = float(os.getenv('MAPS_CONNECT_TIMEOUT', 3.05))
+MAPS_READ_TIMEOUT = float(os.getenv('MAPS_READ_TIMEOUT', 10))
+MAPS_MAX_RETRIES = int(os.getenv('MAPS_MAX_RETRIES', 2))
+MAPS_BACKOFF_BASE = float(os.getenv('MAPS_BACKOFF_BASE', 0.5))
+MAPS_BACKOFF_MAX = float(os.getenv('MAPS_BACKOFF_MAX', 8))
+MAPS_POOL_SIZE = int(os.getenv('MAPS_POOL_SIZE', 10))
+
+# Responses worth retrying: rate limiting and transient upstream failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Every client created in this process, for stats reporting
+_clients = []
+
+class MapProviderClient:
+    """
+    HTTP client for one map provider host.
+
+    Holds a pooled requests.Session, so calls reuse warm connections instead
+    of paying DNS and TLS setup each time, and applies connect/read timeouts
+    so a hung upstream can't hold a worker forever. Connection errors,
+    timeouts and 429/5xx responses are retried up to max_retries times with
+    full-jitter exponential backoff, honoring Retry-After when the provider
+    sends one. Latency and outcome counters are kept per provider.
+    """
+
+    def __init__(self, name, base_url, headers=None, timeout=(MAPS_CONNECT_TIMEOUT, MAPS_READ_TIMEOUT),
+                 max_retries=MAPS_MAX_RETRIES, pool_size=MAPS_POOL_SIZE):
+        """
+        Args:
+            name: Provider name used in logs and stats
+            base_url: Scheme and host of the provider, e.g. https://api.tomtom.com
+            headers: Headers sent with every request (e.g. a User-Agent)
+            timeout: (connect, read) timeout in seconds
+            max_retries: Retries after the first attempt
+            pool_size: Connections kept open to the host
+        """
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        if headers:
+            self.session.headers.update(headers)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=500)  # Recent request latencies in ms
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.statuses = {}
+        _clients.append(self)
+
+    def get(self, url, params=None, timeout=None, max_retries=None):
+        """
+        Send a GET request, retrying transient failures.
+
+        Args:
+            url: Absolute URL or path relative to base_url
+            params: Query parameters
+            timeout: Overrides the client's (connect, read) timeout
+            max_retries: Overrides the client's retry count (e.g. 0 under a deadline)
+
+        Returns:
+            The final requests.Response (which may still be an error status)
+
+        Raises:
+            requests.RequestException if every attempt failed to get a response
+        """
+        if not url.startswith('http'):
+            url = f"{self.base_url}/{url.lstrip('/')}"
+        if max_retries is None:
+            max_retries = self.max_retries
+        for attempt in range(max_retries + 1):
+            started = time.monotonic()
+            try:
+                response = self.session.get(url, params=params, timeout=timeout or self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(started, type(e).__name__)
+                if attempt >= max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{self.name} request failed ({e}), retrying in {delay:.2f}s")
+            else:
+                self._record(started, response.status_code)
+                if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                logger.warning(f"{self.name} returned {response.status_code}, retrying in {delay:.2f}s")
+            with self._lock:
+                self.retries += 1
+            time.sleep(delay)
+
+    def stats(self):
+        """Return request counters and latency percentiles."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            statuses = dict(self.statuses)
+            requests_made, retries, failures = self.requests, self.retries, self.failures
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else None
+
+        return {
+            'requests': requests_made,
+            'retries': retries,
+            'failures': failures,
+            'statuses': statuses,
+            'latency_ms_p50': percentile(0.5),
+            'latency_ms_p95': percentile(0.95),
+            'latency_ms_max': latencies[-1] if latencies else None
+        }
+
+    def _record(self, started, status):
+        latency = round((time.monotonic() - started) * 1000, 1)
+        with self._lock:
+            self.requests += 1
+            self._latencies.append(latency)
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+    @staticmethod
+    def _backoff(attempt):
+        """Full-jitter exponential backoff, so clients don't retry in lockstep."""
+        return random.uniform(0, min(MAPS_BACKOFF_MAX, MAPS_BACKOFF_BASE * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response):
+        """Parse a Retry-After header (seconds or HTTP date), capped at MAPS_BACKOFF_MAX."""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(MAPS_BACKOFF_MAX, max(0.0, delay))
+
+def all_map_client_stats():
+    """Return stats for every map provider client in the process, keyed by name."""
+    return {client.name: client.stats() for client in _clients}
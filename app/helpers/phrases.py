@@ -0,0 +1,149 @@
+import os
+import sys
+import argparse
+import logging
+import threading
+from app.helpers.audio_cache import get_audio_cache
+from app.helpers.tts import (
+    clean_text_for_tts, register_template_phrases, split_into_sentences, synthesize_playlist, synthesize_text
+)
+
+logger = logging.getLogger(__name__)
+
+# Languages pre-rendered at startup, overridable from the environment
+PHRASE_BANK_LANGS = [lang.strip() for lang in os.getenv('PHRASE_BANK_LANGS', 'en,hi').split(',') if lang.strip()]
+
+# Fixed prompts, fallbacks and greetings used across the chat code paths
+PHRASES = {
+    'greeting': {
+        'en': "Namaste! I am your SMV E-rickshaw assistant.",
+        'hi': "नमस्ते! मैं आपका SMV ई-रिक्शा सहायक हूँ।"
+    },
+    'welcome': {
+        'en': "Hello! I'm your SMV E-rickshaw assistant. How can I help you today?",
+        'hi': "नमस्ते! मैं आपका SMV ई-रिक्शा सहायक हूँ। आज मैं आपकी क्या मदद कर सकता हूँ?"
+    },
+    'contact': {
+        'en': "For assistance, contact SMV at 1800-XXX-XXXX",
+        'hi': "सहायता के लिए SMV से 1800-XXX-XXXX पर संपर्क करें।"
+    },
+    'contact_support': {
+        'en': "For immediate assistance, contact SMV support at 1800-XXX-XXXX",
+        'hi': "तुरंत सहायता के लिए SMV सपोर्ट से 1800-XXX-XXXX पर संपर्क करें।"
+    },
+    'technical_difficulties': {
+        'en': "I apologize, but I'm experiencing technical difficulties. Please try again later.",
+        'hi': "क्षमा करें, अभी तकनीकी समस्या आ रही है। कृपया थोड़ी देर बाद फिर से प्रयास करें।"
+    },
+    'technical_difficulties_retry': {
+        'en': "I apologize, but I'm experiencing technical difficulties. Please try again.",
+        'hi': "क्षमा करें, अभी तकनीकी समस्या आ रही है। कृपया फिर से प्रयास करें।"
+    },
+    'technical_difficulties_short': {
+        'en': "I apologize, I'm having technical difficulties. Please try again.",
+        'hi': "क्षमा करें, अभी तकनीकी समस्या आ रही है। कृपया फिर से प्रयास करें।"
+    },
+    'trouble_responding': {
+        'en': "I apologize, I'm having trouble responding. Please try again.",
+        'hi': "क्षमा करें, मुझे जवाब देने में परेशानी हो रही है। कृपया फिर से प्रयास करें।"
+    },
+    'off_topic': {
+        'en': "I am specialized in e-rickshaw support. Please ask me about your e-rickshaw, its maintenance, battery, or dashboard information.",
+        'hi': "मैं केवल ई-रिक्शा से जुड़ी सहायता देता हूँ। कृपया अपने ई-रिक्शा, उसके रखरखाव, बैटरी या डैशबोर्ड के बारे में पूछें।"
+    },
+    'off_topic_short': {
+        'en': "I can only assist with e-rickshaw related questions.",
+        'hi': "मैं केवल ई-रिक्शा से जुड़े सवालों में मदद कर सकता हूँ।"
+    }
+}
+
+def phrase_text(phrase_id, lang='en'):
+    """Get the text of a phrase, falling back to English."""
+    variants = PHRASES[phrase_id]
+    return variants.get(lang) or variants['en']
+
+# Reply returned by the chat endpoints when the LLM call fails
+FALLBACK_RESPONSE = phrase_text('technical_difficulties')
+
+# Full fallback reply of the blueprint chat endpoint
+FALLBACK_RESPONSE_WITH_CONTACT = " ".join([
+    phrase_text('greeting'),
+    phrase_text('technical_difficulties_retry'),
+    phrase_text('contact')
+])
+
+class PhraseBank:
+    """
+    Pre-synthesized audio for the fixed phrases.
+
+    warm() renders every phrase once per language through the regular TTS
+    pipeline, so the files live in the audio cache under the same keys a
+    reply containing the phrase would use, and pins them there so they are
+    never evicted. The filenames are also kept in memory, letting fallback
+    paths attach audio without touching the synthesis pipeline at all.
+    The phrase sentences are registered as TTS templates, so replies that
+    embed them mid-sentence splice in the pre-rendered audio.
+    """
+
+    def __init__(self, phrases=PHRASES):
+        self.phrases = phrases
+        self._filenames = {}  # (cleaned text, lang) -> cached filename
+        self._lock = threading.Lock()
+
+    def warm(self, cache_dir, langs=None):
+        """
+        Render all phrases for the given languages into the cache.
+        Returns the number of phrases available.
+        """
+        cache = get_audio_cache(cache_dir)
+        for phrase_id, variants in self.phrases.items():
+            for lang in langs or PHRASE_BANK_LANGS:
+                if lang not in variants:
+                    continue
+                text = clean_text_for_tts(variants[lang])
+                sentences = split_into_sentences(text) or [text]
+                try:
+                    segment_filenames = synthesize_playlist(text, lang, False, cache_dir)
+                    filename = synthesize_text(text, lang, False, cache_dir)
+                except Exception as e:
+                    logger.error(f"Could not pre-render phrase '{phrase_id}' ({lang}): {e}")
+                    continue
+                for segment_filename in segment_filenames or []:
+                    cache.pin(segment_filename)
+                register_template_phrases(sentences)
+                if filename:
+                    cache.pin(filename)
+                    with self._lock:
+                        self._filenames[(text, lang)] = filename
+        logger.info(f"Phrase bank ready with {len(self._filenames)} phrases")
+        return len(self._filenames)
+
+    def lookup(self, text, lang='en'):
+        """Return the cached filename of a pre-rendered phrase text, or None."""
+        return self._filenames.get((clean_text_for_tts(text), lang))
+
+    def audio_filename(self, phrase_id, lang='en'):
+        """Return the cached filename of a phrase by id, or None if not rendered."""
+        return self.lookup(phrase_text(phrase_id, lang), lang)
+
+    def __len__(self):
+        return len(self._filenames)
+
+phrase_bank = PhraseBank()
+
+def main(argv=None):
+    """CLI to warm the phrase bank, e.g. as a build or deploy step."""
+    default_cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'audio', 'cache')
+    parser = argparse.ArgumentParser(description="Pre-render the SMV phrase bank into the TTS audio cache.")
+    parser.add_argument('--lang', action='append', dest='langs', help="Language to render (repeatable, default: PHRASE_BANK_LANGS)")
+    parser.add_argument('--cache-dir', default=default_cache_dir, help="TTS audio cache directory")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    count = phrase_bank.warm(args.cache_dir, args.langs)
+    get_audio_cache(args.cache_dir).flush()
+    print(f"Rendered {count} phrases into {args.cache_dir}")
+    return 0 if count else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Prebuilt OSM extract for our operating cities (see main() below)
+POI_DATA_PATH = os.getenv(
+    'POI_DATA_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'poi.json')
+)
+# Grid cell size in degrees; 0.01 is roughly 1.1 km north-south
+POI_GRID_DEGREES = float(os.getenv('POI_GRID_DEGREES', 0.01))
+POI_MAX_RADIUS_KM = float(os.getenv('POI_MAX_RADIUS_KM', 5))
+# Lucknow by default: south,west,north,east
+POI_BBOX = os.getenv('POI_BBOX', '26.70,80.80,27.00,81.10')
+OVERPASS_URL = os.getenv('OVERPASS_URL', 'https://overpass-api.de/api/interpreter')
+
+# OSM tags of each category served by the index
+POI_CATEGORIES = {
+    'schools': [('amenity', 'school')],
+    'bus_stations': [('amenity', 'bus_station'), ('highway', 'bus_stop')],
+    'malls': [('shop', 'mall')]
+}
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometers."""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def valid_coordinates(lat, lon):
+    """True if lat and lon are finite and within [-90, 90] and [-180, 180]."""
+    return math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180
+
+def classify_element(tags):
+    """Return the category of an OSM element from its tags, or None."""
+    for category, pairs in POI_CATEGORIES.items():
+        if any(tags.get(key) == value for key, value in pairs):
+            return category
+    return None
+
+def places_from_overpass(data):
+    """Convert Overpass JSON ('out center') into {category: [[lat, lon, name], ...]}."""
+    places = {category: [] for category in POI_CATEGORIES}
+    for element in data.get('elements', []):
+        tags = element.get('tags') or {}
+        name = tags.get('name')
+        category = classify_element(tags)
+        lat = element.get('lat', (element.get('center') or {}).get('lat'))
+        lon = element.get('lon', (element.get('center') or {}).get('lon'))
+        if name and category and lat is not None and lon is not None:
+            places[category].append([lat, lon, name])
+    return places
+
+class POIIndex:
+    """
+    In-memory spatial index of points of interest.
+
+    Places are bucketed per category into a lat/lon grid of grid_degrees
+    cells. A nearest-places query scans rings of cells outward from the
+    query point and stops once the k best results are closer than anything
+    in the unscanned rings, so it only ever touches a handful of cells.
+    Rows further than max_km north or south are never scanned, which keeps
+    queries near the poles (where cells get narrow) cheap.
+    """
+
+    def __init__(self, places=None, grid_degrees=POI_GRID_DEGREES):
+        self.grid_degrees = grid_degrees
+        self._cells = {}  # (category, row, col) -> [(lat, lon, name), ...]
+        self._counts = {}
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.query_us_total = 0.0
+        self.query_us_max = 0.0
+        for category, entries in (places or {}).items():
+            for lat, lon, name in entries:
+                self.add(category, lat, lon, name)
+
+    @classmethod
+    def load(cls, path=POI_DATA_PATH):
+        """
+        Load an index from a JSON file: either the output of main() or a raw
+        Overpass 'out center' extract. A missing file gives an empty index.
+        """
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"POI data file {path} not found, nearby places are unavailable")
+            return cls()
+        places = places_from_overpass(data) if 'elements' in data else data.get('places', {})
+        index = cls(places)
+        logger.info(f"Loaded POI index from {path}: {index.counts()}")
+        return index
+
+    @property
+    def loaded(self):
+        return bool(self._counts)
+
+    def counts(self):
+        """Return the number of indexed places per category."""
+        return dict(self._counts)
+
+    def add(self, category, lat, lon, name):
+        self._cells.setdefault((category,) + self._cell(lat, lon), []).append((lat, lon, name))
+        self._counts[category] = self._counts.get(category, 0) + 1
+
+    def nearest(self, lat, lon, category, k=2, max_km=POI_MAX_RADIUS_KM):
+        """
+        Return up to k places of a category within max_km, nearest first, as
+        (distance_km, lat, lon, name) tuples. Places sharing a name (e.g. the
+        bus stops on both sides of a road) are reported once.
+        Raises ValueError for invalid coordinates or a radius that is not
+        finite and positive.
+        """
+        if not valid_coordinates(lat, lon) or not (math.isfinite(max_km) and max_km > 0):
+            raise ValueError(f"Invalid nearby query: lat={lat}, lon={lon}, max_km={max_km}")
+        row, col = self._cell(lat, lon)
+        # Cells are a fixed height, so only rows this close can hold places within max_km
+        row_km = self.grid_degrees * KM_PER_DEGREE_LAT
+        max_rows = math.ceil(max_km / row_km) + 1
+        # Smallest distance covered by one ring of cells (cells narrow toward the poles)
+        ring_km = row_km * max(0.01, math.cos(math.radians(abs(lat) + self.grid_degrees)))
+        candidates = []
+        ring = 0
+        while True:
+            for r, c in self._ring(row, col, ring, max_rows):
+                for place_lat, place_lon, name in self._cells.get((category, r, c), ()):
+                    distance = haversine_km(lat, lon, place_lat, place_lon)
+                    if distance <= max_km:
+                        candidates.append((distance, place_lat, place_lon, name))
+            covered_km = ring * ring_km
+            best = self._distinct(candidates, k)
+            if covered_km >= max_km or (len(best) == k and best[-1][0] <= covered_km):
+                return best
+            if 2 * ring * self.grid_degrees >= 360:
+                return best  # Every longitude has been scanned
+            ring += 1
+
+    def nearby(self, lat, lon, categories=None, k=2, max_km=POI_MAX_RADIUS_KM):
+        """
+        Return the k nearest places of several categories in one call.
+
+        Returns:
+            {category: [{'name', 'lat', 'lon', 'distance_km'}, ...]}
+        """
+        started = time.perf_counter()
+        result = {}
+        for category in categories or POI_CATEGORIES:
+            result[category] = [
+                {'name': name, 'lat': place_lat, 'lon': place_lon, 'distance_km': round(distance, 2)}
+                for distance, place_lat, place_lon, name in self.nearest(lat, lon, category, k, max_km)
+            ]
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        with self._lock:
+            self.queries += 1
+            self.query_us_total += elapsed_us
+            self.query_us_max = max(self.query_us_max, elapsed_us)
+        return result
+
+    def stats(self):
+        """Return index size and query latency counters."""
+        with self._lock:
+            return {
+                'places': self.counts(),
+                'cells': len(self._cells),
+                'queries': self.queries,
+                'query_us_avg': round(self.query_us_total / self.queries, 1) if self.queries else None,
+                'query_us_max': round(self.query_us_max, 1)
+            }
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.grid_degrees), math.floor(lon / self.grid_degrees)
+
+    @staticmethod
+    def _ring(row, col, ring, max_rows):
+        """Yield the perimeter cells of a ring, skipping rows more than max_rows away."""
+        if ring == 0:
+            yield row, col
+            return
+        if ring <= max_rows:
+            for c in range(col - ring, col + ring + 1):
+                yield row - ring, c
+                yield row + ring, c
+        span = min(ring - 1, max_rows)
+        for r in range(row - span, row + span + 1):
+            yield r, col - ring
+            yield r, col + ring
+
+    @staticmethod
+    def _distinct(candidates, k):
+        best, names = [], set()
+        for candidate in sorted(candidates):
+            if candidate[3] not in names:
+                names.add(candidate[3])
+                best.append(candidate)
+                if len(best) == k:
+                    break
+        return best
+
+def build_overpass_query(bbox):
+    """Overpass QL fetching every indexed category inside a south,west,north,east bbox."""
+    selectors = []
+    for pairs in POI_CATEGORIES.values():
+        for key, value in pairs:
+            selectors.append(f'nwr["{key}"="{value}"]["name"]({bbox});')
+    return f"[out:json][timeout:180];({''.join(selectors)});out center;"
+
+def main(argv=None):
+    """Build the POI data file from Overpass, e.g. as a deploy or nightly step."""
+    from app.helpers.maps import MapProviderClient
+
+    parser = argparse.ArgumentParser(description="Build the SMV nearby-places index from OpenStreetMap.")
+    parser.add_argument('--bbox', action='append', dest='bboxes',
+                        help="south,west,north,east area to extract (repeatable, default: POI_BBOX)")
+    parser.add_argument('--output', default=POI_DATA_PATH, help="POI data file to write")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    client = MapProviderClient('overpass', OVERPASS_URL, timeout=(5, 200))
+    places = {category: [] for category in POI_CATEGORIES}
+    for bbox in args.bboxes or [POI_BBOX]:
+        logger.info(f"Fetching places for bbox {bbox} from Overpass")
+        response = client.get(OVERPASS_URL, params={'data': build_overpass_query(bbox)})
+        response.raise_for_status()
+        for category, entries in places_from_overpass(response.json()).items():
+            places[category].extend(entries)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    tmp_path = f"{args.output}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'built': int(time.time()), 'places': places}, f, ensure_ascii=False)
+    os.replace(tmp_path, args.output)
+    print(f"Wrote {sum(len(entries) for entries in places.values())} places to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+import threading
+import logging
+from app.helpers.response_cache import normalize_message
+
+logger = logging.getLogger(__name__)
+
+# ----- Chat Assistant -----
+# Static instructions, sent as the model's system instruction; each turn's
+# context is assembled by build_chat_context() from the sections its intent needs
+CHAT_SYSTEM_INSTRUCTION = """You are the SMV E-rickshaw Assistant, a professional and helpful AI assistant for e-rickshaw drivers.
+
+CORE PRINCIPLES:
+1. Maintain a professional, helpful tone at all times
+2. Only answer questions about e-rickshaws, maintenance, battery, dashboard, or nearby locations
+3. For non-e-rickshaw questions, politely redirect to e-rickshaw topics
+4. Only suggest contacting the SMV team (1800-XXX-XXXX) for serious technical issues that cannot be resolved with advice
+5. Provide specific, actionable information when possible
+
+Each message gives the CONVERSATION state and the USER QUESTION, plus only the DASHBOARD DATA, NEARBY PLACES and EXAMPLES relevant to it.
+- Only mention dashboard data when DIRECTLY relevant and NECESSARY for answering the specific question
+- Follow the style of the examples when given
+
+RESPONSE GUIDELINES:
+- For greetings: Respond professionally without mentioning dashboard data
+- For battery issues: Provide specific troubleshooting advice first, only mention current battery percentage if directly relevant
+- For maintenance issues: Provide specific advice first, mention service dates only if directly relevant
+- For location questions: Provide specific information about nearby places
+- For general questions: Provide helpful information without mentioning dashboard data
+- Only suggest contacting SMV for issues that clearly require professional assistance
+- Use "Namaste" only for the first message in a conversation, as given in CONVERSATION
+- Never use casual expressions like "Arre wah!" or other colloquial phrases"""
+
+# Worked examples, included only for the intents they illustrate
+CHAT_EXAMPLES = {
+    'hi': """For "hi":
+"Hello! I'm your SMV E-rickshaw assistant. How can I help you today with your e-rickshaw?\"""",
+    'not_starting': """For "my e-rickshaw is not starting":
+"This could be due to several reasons: 1) Check if the key is fully inserted and turned, 2) Ensure the battery connections are secure, 3) Verify the emergency cut-off switch is in the correct position. If these steps don't help, please contact SMV support at 1800-XXX-XXXX for technical assistance.\"""",
+    'school_nearby': """For "is there any school nearby?":
+"Yes, the nearest school is APS Academy, about 1.1 km away. There's also City Montessori School at a distance of 2.3 km from your current location.\"""",
+    'last_service': """For "when was my last service":
+"Your last service was on June 10th, 2024, and your next scheduled service is on December 10th, 2024. Regular maintenance helps ensure optimal performance of your e-rickshaw.\"""",
+    'slow_charging': """For "my battery is taking too much time to charge":
+"This could be happening for several reasons: 1) The charger might be malfunctioning, 2) There could be loose connections, 3) The battery might be aging. Try using a different charger if available, and ensure all connections are secure. If the problem persists, it would be best to have it checked by a technician.\"""",
+    'off_topic': """For "who won the cricket match?":
+"I can help with your e-rickshaw, its battery, maintenance or nearby places. Is there anything about your e-rickshaw I can help you with?\""""
+}
+
+# Dashboard fields as labelled in the prompt
+DASHBOARD_LABELS = {
+    'battery_percentage': ('Battery', '%'),
+    'vehicle_number': ('Vehicle', ''),
+    'last_service': ('Last Service', ''),
+    'next_service': ('Next Service', ''),
+    'driver_rating': ('Driver Rating', ''),
+    'location': ('Location', '')
+}
+
+NEARBY_LABELS = {'schools': 'Schools', 'bus_stations': 'Bus Stations', 'malls': 'Malls'}
+
+# What each intent's prompt contains, and its budget in estimated tokens
+INTENT_PROFILES = {
+    'greeting': {'dashboard': [], 'places': False, 'examples': ['hi'], 'budget': 150},
+    'battery': {'dashboard': ['battery_percentage'], 'places': False,
+                'examples': ['slow_charging', 'not_starting'], 'budget': 450},
+    'service': {'dashboard': ['vehicle_number', 'last_service', 'next_service'], 'places': False,
+                'examples': ['last_service'], 'budget': 350},
+    'location': {'dashboard': ['location'], 'places': True, 'examples': ['school_nearby'], 'budget': 450},
+    'off_topic': {'dashboard': [], 'places': False, 'examples': ['off_topic'], 'budget': 150},
+    'general': {'dashboard': list(DASHBOARD_LABELS), 'places': False, 'examples': ['not_starting'], 'budget': 500}
+}
+
+# Keywords of each intent, matched against the normalized message (see normalize_message)
+INTENT_KEYWORDS = {
+    'battery': {'battery', 'batteries', 'baitri', 'charge', 'charging', 'charger', 'charged', 'range',
+                'mileage', 'backup', 'बैटरी', 'चार्ज', 'चार्जिंग'},
+    'service': {'service', 'servicing', 'maintenance', 'repair', 'mechanic', 'tyre', 'tire', 'brake',
+                'brakes', 'oil', 'puncture', 'सर्विस', 'मरम्मत'},
+    'location': {'nearby', 'near', 'nearest', 'paas', 'kahan', 'where', 'school', 'schools', 'bus',
+                 'station', 'stand', 'mall', 'malls', 'hospital', 'route', 'distance', 'location',
+                 'पास', 'कहाँ', 'कहां', 'स्कूल'},
+    'off_topic': {'cricket', 'movie', 'movies', 'film', 'song', 'songs', 'joke', 'politics', 'election',
+                  'recipe', 'actor', 'actress', 'match', 'stock', 'shares'}
+}
+
+# Messages made only of these words are greetings
+GREETING_WORDS = {'hi', 'namaste', 'good', 'morning', 'evening', 'afternoon', 'thanks', 'thank', 'you',
+                  'ok', 'okay', 'bye', 'how', 'are', 'kaise', 'ho', 'aap', 'shukriya', 'dhanyavad',
+                  'नमस्ते', 'धन्यवाद'}
+
+# Tie-break order when several intents match equally
+INTENT_PRIORITY = ['battery', 'service', 'location', 'off_topic']
+
+def classify_intent(message):
+    """
+    Classify a chat message by keyword matching.
+    Returns one of the INTENT_PROFILES keys.
+    """
+    words = normalize_message(message).split()
+    if not words:
+        return 'general'
+    scores = {intent: sum(word in keywords for word in words) for intent, keywords in INTENT_KEYWORDS.items()}
+    best = max(INTENT_PRIORITY, key=lambda intent: (scores[intent], -INTENT_PRIORITY.index(intent)))
+    if scores[best]:
+        return best
+    if all(word in GREETING_WORDS for word in words):
+        return 'greeting'
+    return 'general'
+
+def intent_needs_places(intent):
+    """Whether prompts for an intent include nearby places."""
+    return INTENT_PROFILES[intent]['places']
+
+def estimate_tokens(text):
+    """Rough token estimate (about four characters per token)."""
+    return len(text) // 4 + 1
+
+def format_places(places):
+    """Format nearby places as 'Name (distance), ...' for a prompt."""
+    return ', '.join(f"{place['name']} ({place['distance']})" for place in places) or 'none nearby'
+
+def build_chat_context(message, dashboard, nearby_places, is_first_message, intent=None):
+    """
+    Build the per-turn part of the chat prompt for a message's intent.
+
+    Only the dashboard fields, nearby places and examples the intent needs
+    are included. The question and conversation state are always sent;
+    beyond the intent's budget, examples are dropped first, then the
+    nearby places are cut to the nearest one per category.
+    """
+    profile = INTENT_PROFILES[intent or classify_intent(message)]
+    required = [
+        f"CONVERSATION: {'this is the first message' if is_first_message else 'this is not the first message'}",
+        f"USER QUESTION: {message}"
+    ]
+    sections = []
+    if profile['dashboard']:
+        lines = [f"- {DASHBOARD_LABELS[field][0]}: {dashboard[field]}{DASHBOARD_LABELS[field][1]}"
+                 for field in profile['dashboard']]
+        sections.append("DASHBOARD DATA:\n" + "\n".join(lines))
+    places_index = None
+    if profile['places'] and nearby_places:
+        places_index = len(sections)
+        sections.append(_places_section(nearby_places))
+    examples = [CHAT_EXAMPLES[name] for name in profile['examples']]
+
+    def assemble():
+        parts = sections + (["EXAMPLES:\n" + "\n\n".join(examples)] if examples else []) + required
+        return "\n\n".join(parts)
+
+    context = assemble()
+    while estimate_tokens(context) > profile['budget'] and examples:
+        examples.pop()
+        context = assemble()
+    if estimate_tokens(context) > profile['budget'] and places_index is not None:
+        sections[places_index] = _places_section(nearby_places, limit=1)
+        context = assemble()
+    return context
+
+def _places_section(nearby_places, limit=None):
+    lines = [f"- {label}: {format_places(nearby_places.get(category, [])[:limit])}"
+             for category, label in NEARBY_LABELS.items()]
+    return "NEARBY PLACES:\n" + "\n".join(lines)
+
+# ----- SMV Chatbot Sessions -----
+SMV_CHATBOT_SYSTEM_INSTRUCTION = """You are an AI assistant specifically designed for SMV e-rickshaw drivers. You must ALWAYS:
+
+1. Start EVERY response with "Namaste! I am your SMV e-rickshaw assistant."
+
+2. CURRENT DASHBOARD STATUS:
+   - Every message includes the current dashboard status; use those values
+
+3. RESPONSE RULES:
+   - ONLY answer questions about e-rickshaws, maintenance, battery, or dashboard
+   - Include relevant dashboard data in EVERY response
+   - Add safety warnings when discussing technical issues
+   - End EVERY response with "For immediate assistance, contact SMV support at 1800-XXX-XXXX"
+
+4. For BATTERY ISSUES:
+   - First state current battery level
+   - List specific troubleshooting steps
+   - Include charging safety warnings
+   - Mention if service check needed
+
+5. For MAINTENANCE QUERIES:
+   - Reference last service date
+   - State next service date
+   - Provide specific maintenance tips
+
+6. For NON-E-RICKSHAW questions:
+   Respond ONLY with: "I am specialized in e-rickshaw support. Please ask me about your e-rickshaw, its maintenance, battery, or dashboard information."
+
+7. SAFETY FIRST:
+   For any critical issues (smoke, damage, unusual sounds):
+   - Advise to stop vehicle immediately
+   - Provide emergency steps
+   - Emphasize contacting SMV support urgently"""
+
+# ----- Blueprint Assistant -----
+ASSISTANT_SYSTEM_INSTRUCTION = """You are the SMV E-rickshaw Assistant. You MUST follow these rules:
+
+1. ALWAYS begin with "Namaste! I am your SMV E-rickshaw assistant."
+2. ONLY answer questions about e-rickshaws, their maintenance, battery issues, or dashboard
+3. For ANY non-e-rickshaw questions, respond ONLY with: "I can only assist with e-rickshaw related questions."
+4. ALWAYS include relevant dashboard data in your responses, from the dashboard given with each message
+5. ALWAYS end with: "For assistance, contact SMV at 1800-XXX-XXXX\""""
+
+# ----- Prompt Size Instrumentation -----
+class PromptStats:
+    """
+    Size counters for prompts sent to Gemini, per prompt name.
+
+    Records the bytes of the system instruction and of the per-request
+    context, and what was actually sent as request contents, so the saving
+    over inlining the instruction in every prompt is visible, plus the
+    token counts Gemini reports in usage metadata.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._prompts = {}
+
+    def record(self, name, system_instruction, context, inlined=False, response=None):
+        """
+        Record one request.
+
+        Args:
+            name: Prompt name, e.g. 'chat'
+            system_instruction: Static instruction text
+            context: Per-request text
+            inlined: Whether the instruction was sent inside the contents
+                (models without system instruction support)
+            response: Gemini response; its usage metadata supplies token counts
+        """
+        system_bytes = len(system_instruction.encode('utf-8'))
+        context_bytes = len(context.encode('utf-8'))
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', None) or 0
+        cached_tokens = getattr(usage, 'cached_content_token_count', None) or 0
+        with self._lock:
+            entry = self._prompts.setdefault(name, {
+                'requests': 0, 'system_bytes': 0, 'context_bytes': 0, 'sent_bytes': 0,
+                'prompt_tokens': 0, 'cached_tokens': 0, 'token_reports': 0
+            })
+            entry['requests'] += 1
+            entry['system_bytes'] = system_bytes
+            entry['context_bytes'] += context_bytes
+            entry['sent_bytes'] += context_bytes + (system_bytes if inlined else 0)
+            if usage is not None:
+                entry['token_reports'] += 1
+                entry['prompt_tokens'] += prompt_tokens
+                entry['cached_tokens'] += cached_tokens
+
+    def stats(self):
+        """Return average prompt sizes per prompt name."""
+        with self._lock:
+            result = {}
+            for name, entry in self._prompts.items():
+                requests = entry['requests']
+                reports = entry['token_reports']
+                result[name] = {
+                    'requests': requests,
+                    'system_instruction_bytes': entry['system_bytes'],
+                    'context_bytes_avg': round(entry['context_bytes'] / requests),
+                    # Request contents with the instruction inlined vs. as actually sent
+                    'inlined_prompt_bytes_avg': round(entry['context_bytes'] / requests + entry['system_bytes']),
+                    'contents_bytes_avg': round(entry['sent_bytes'] / requests),
+                    'prompt_tokens_avg': round(entry['prompt_tokens'] / reports) if reports else None,
+                    'cached_tokens_avg': round(entry['cached_tokens'] / reports) if reports else None
+                }
+            return result
+
+prompt_stats = PromptStats()
@@ -0,0 +1,122 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Backoff between re-runs of failed required probes, in seconds
+READINESS_RETRY_INITIAL = float(os.getenv('READINESS_RETRY_INITIAL', 5))
+READINESS_RETRY_MAX = float(os.getenv('READINESS_RETRY_MAX', 300))
+
+class ReadinessProbes:
+    """
+    Named startup checks that run in the background with cached results.
+
+    Each probe is a callable returning (ok, detail). Probes run in a daemon
+    thread started by start(), so slow checks (network self-tests, optional
+    module imports) never block application startup or request handling.
+    The app is ready once every required probe has passed; required probes
+    that fail (e.g. on a transient network error) are re-run with
+    exponential backoff until they pass.
+    """
+
+    def __init__(self, retry_initial=READINESS_RETRY_INITIAL, retry_max=READINESS_RETRY_MAX):
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self._probes = OrderedDict()  # name -> (fn, required)
+        self._results = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._first_run = threading.Event()
+
+    def register(self, name, fn, required=True):
+        """Register a probe. Optional probes are reported but don't gate readiness."""
+        self._probes[name] = (fn, required)
+
+    def start(self):
+        """
+        Run all probes in a background thread, then keep retrying failed
+        required probes (only the first call has an effect).
+        """
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run_until_ready, name='readiness-probes', daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout=None):
+        """Block until the first run of the probes started by start() has finished."""
+        if self._thread is not None:
+            self._first_run.wait(timeout)
+
+    def run(self):
+        """Run all probes in the calling thread."""
+        for name in list(self._probes):
+            self.run_probe(name)
+
+    def failed_required(self):
+        """Return the names of required probes that have run and failed."""
+        return [
+            name for name, (_, required) in self._probes.items()
+            if required and name in self._results and not self._results[name]['ok']
+        ]
+
+    def _run_until_ready(self):
+        self.run()
+        self._first_run.set()
+        delay = self.retry_initial
+        while True:
+            failed = self.failed_required()
+            if not failed:
+                return
+            logger.info(f"Retrying failed readiness probes {failed} in {delay:g}s")
+            time.sleep(delay)
+            for name in failed:
+                self.run_probe(name)
+            delay = min(delay * 2, self.retry_max)
+
+    def run_probe(self, name):
+        """Run a single probe and cache its result."""
+        fn, required = self._probes[name]
+        started = time.monotonic()
+        try:
+            ok, detail = fn()
+        except Exception as e:
+            ok, detail = False, f"Probe raised: {e}"
+        self._attempts[name] = self._attempts.get(name, 0) + 1
+        result = {
+            'ok': bool(ok),
+            'detail': detail,
+            'required': required,
+            'attempts': self._attempts[name],
+            'checked_at': time.time(),
+            'duration_ms': round((time.monotonic() - started) * 1000, 1)
+        }
+        self._results[name] = result
+        log = logger.info if ok else logger.warning
+        log(f"Readiness probe '{name}': {'ok' if ok else 'failed'} ({detail})")
+        return result
+
+    def result(self, name):
+        """Return the cached result of a probe, or None if it has not run yet."""
+        return self._results.get(name)
+
+    def is_ready(self):
+        """True once every required probe has run and passed."""
+        return all(
+            self._results.get(name, {}).get('ok')
+            for name, (_, required) in self._probes.items()
+            if required
+        )
+
+    def status(self):
+        """Return readiness and the cached result of every probe."""
+        probes = {}
+        for name, (_, required) in self._probes.items():
+            probes[name] = self._results.get(name) or {'ok': None, 'detail': 'pending', 'required': required}
+        return {'ready': self.is_ready(), 'probes': probes}
@@ -0,0 +1,167 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Cache limits, overridable from the environment
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 3600))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 2000))
+
+# Romanized Hindi (and chat shorthand) spelling variants folded onto one form
+HINGLISH_VARIANTS = {
+    'h': 'hai', 'he': 'hai', 'hain': 'hai', 'hei': 'hai',
+    'nhi': 'nahi', 'nai': 'nahi', 'nahin': 'nahi', 'nahee': 'nahi',
+    'kyaa': 'kya', 'kia': 'kya',
+    'meri': 'mera', 'mere': 'mera', 'muje': 'mujhe',
+    'kb': 'kab',
+    'kese': 'kaise', 'kaisay': 'kaise',
+    'btao': 'batao', 'bataao': 'batao', 'bataiye': 'batao', 'bata': 'batao',
+    'gaadi': 'gadi', 'gaddi': 'gadi',
+    'rha': 'raha', 'rhi': 'raha', 'rahi': 'raha', 'rahe': 'raha',
+    'kitni': 'kitna', 'kitne': 'kitna',
+    'hello': 'hi', 'hey': 'hi', 'hii': 'hi', 'helo': 'hi', 'hlo': 'hi',
+    'namaskar': 'namaste', 'namastey': 'namaste',
+    'u': 'you', 'ur': 'your', 'r': 'are',
+}
+
+# Politeness fillers that don't change the answer
+FILLER_WORDS = {'please', 'pls', 'plz', 'kindly', 'bhai', 'bhaiya', 'ji', 'sir', 'madam', 'yaar'}
+
+def normalize_message(message):
+    """
+    Fold a chat message onto a canonical form for cache lookups.
+
+    Case, punctuation and whitespace are folded, stretched letters ("hiii")
+    are collapsed (digits are not), common Hinglish spelling variants are
+    unified and politeness fillers are dropped. Devanagari text keeps its
+    vowel signs.
+    """
+    text = unicodedata.normalize('NFKC', message or '').casefold()
+    # Drop punctuation and symbols (including the danda), keep letters, marks and digits
+    text = ''.join(' ' if unicodedata.category(ch)[0] in 'PS' else ch for ch in text)
+    # Only letters are collapsed; repeated digits are part of numbers ("1000 km")
+    text = re.sub(r'([^\W\d_])\1{2,}', r'\1', text)
+    words = []
+    for word in text.split():
+        word = HINGLISH_VARIANTS.get(word, word)
+        if word not in FILLER_WORDS:
+            words.append(word)
+    return ' '.join(words)
+
+def context_fingerprint(*contexts):
+    """Fingerprint the data embedded in a prompt (dashboard, nearby places, ...)."""
+    payload = json.dumps(contexts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+class ResponseCache:
+    """
+    LLM reply cache keyed by normalized message and prompt context.
+
+    Keys combine the normalized message, whether it opens a conversation
+    (which changes the greeting), the fingerprint of the dashboard data in
+    the prompt and an optional scope for per-request context such as the
+    driver's nearby places. Entries expire after ttl_seconds, the
+    least recently used entry is evicted beyond max_entries, and every entry
+    is dropped as soon as a different context fingerprint shows up, since
+    the dashboard values the answers were based on have changed. Entries
+    also remember the audio rendered for them per language and speed.
+    """
+
+    def __init__(self, ttl_seconds=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> entry dict
+        self._fingerprint = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, message, fingerprint, is_first_message, scope=''):
+        """Return the cache key of a message, or None if it normalizes to nothing."""
+        normalized = normalize_message(message)
+        if not normalized:
+            return None
+        return f"{fingerprint}:{scope}:{int(bool(is_first_message))}:{normalized}"
+
+    def get(self, message, fingerprint, is_first_message, scope=''):
+        """
+        Return the cached entry for a message, or None on a miss.
+        Unlike a fingerprint change, a different scope doesn't invalidate other entries.
+        """
+        key = self.key(message, fingerprint, is_first_message, scope)
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            entry = self._entries.get(key) if key else None
+            if entry is not None and time.monotonic() - entry['created'] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            entry['hits'] += 1
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, message, fingerprint, is_first_message, response_text, scope=''):
+        """Cache a reply. Returns the new entry, or None if the message can't be cached."""
+        key = self.key(message, fingerprint, is_first_message, scope)
+        if not key or not response_text:
+            return None
+        entry = {'response': response_text, 'created': time.monotonic(), 'hits': 0, 'audio': {}}
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def remember_audio(self, entry, variant, audio_url):
+        """Remember the audio URL rendered for an entry (variant is e.g. language and speed)."""
+        if entry is not None and audio_url:
+            with self._lock:
+                entry['audio'][variant] = audio_url
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and size of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+    def _check_fingerprint(self, fingerprint):
+        """Invalidate all entries when the prompt context changed. Caller holds self._lock."""
+        if fingerprint == self._fingerprint:
+            return
+        if self._entries:
+            logger.info(f"Prompt context changed, invalidating {len(self._entries)} cached responses")
+            self._entries.clear()
+            self.invalidations += 1
+        self._fingerprint = fingerprint
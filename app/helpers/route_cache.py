@@ -0,0 +1,119 @@
+import os
+import math
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Cache settings, overridable from the environment
+ROUTE_GRID_METERS = float(os.getenv('ROUTE_GRID_METERS', 200))
+# Geometry and instructions hardly change; traffic conditions change by the minute
+ROUTE_STATIC_TTL = int(os.getenv('ROUTE_STATIC_TTL', 7 * 24 * 3600))
+ROUTE_TRAFFIC_TTL = int(os.getenv('ROUTE_TRAFFIC_TTL', 300))
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv('ROUTE_CACHE_MAX_ENTRIES', 5000))
+
+METERS_PER_DEGREE_LAT = 111320.0
+
+def snap_to_grid(lat, lon, grid_meters=ROUTE_GRID_METERS):
+    """Snap coordinates to the center of a grid cell roughly grid_meters wide."""
+    lat_step = grid_meters / METERS_PER_DEGREE_LAT
+    snapped_lat = (math.floor(lat / lat_step) + 0.5) * lat_step
+    lon_step = grid_meters / (METERS_PER_DEGREE_LAT * max(0.01, math.cos(math.radians(snapped_lat))))
+    snapped_lon = (math.floor(lon / lon_step) + 0.5) * lon_step
+    return round(snapped_lat, 6), round(snapped_lon, 6)
+
+class RouteCache:
+    """
+    Route cache keyed by grid-snapped start and end points plus travel mode.
+
+    Each entry has two parts with separate lifetimes: the static part
+    (distance, instructions) is kept for static_ttl, while the traffic part
+    (travel time, traffic delay) expires after traffic_ttl. A request whose
+    static part is cached but whose traffic is stale only needs a cheap
+    summary-only refresh from the provider.
+    """
+
+    def __init__(self, grid_meters=ROUTE_GRID_METERS, static_ttl=ROUTE_STATIC_TTL,
+                 traffic_ttl=ROUTE_TRAFFIC_TTL, max_entries=ROUTE_CACHE_MAX_ENTRIES):
+        self.grid_meters = grid_meters
+        self.static_ttl = static_ttl
+        self.traffic_ttl = traffic_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> {'static', 'static_at', 'traffic', 'traffic_at'}
+        self._lock = threading.Lock()
+        self.static_hits = 0
+        self.static_misses = 0
+        self.traffic_hits = 0
+        self.traffic_misses = 0
+
+    def key(self, start_lat, start_lon, end_lat, end_lon, mode):
+        """Return the cache key: snapped start, snapped end and travel mode."""
+        return (
+            snap_to_grid(start_lat, start_lon, self.grid_meters),
+            snap_to_grid(end_lat, end_lon, self.grid_meters),
+            mode
+        )
+
+    def get(self, key):
+        """
+        Return the fresh (static, traffic) parts of a route; either may be None.
+        Both lookups are counted as a hit or miss.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            static = traffic = None
+            if entry is not None:
+                if now - entry['static_at'] <= self.static_ttl:
+                    static = entry['static']
+                    self._entries.move_to_end(key)
+                    if entry['traffic'] is not None and now - entry['traffic_at'] <= self.traffic_ttl:
+                        traffic = entry['traffic']
+                else:
+                    del self._entries[key]
+            if static is not None:
+                self.static_hits += 1
+            else:
+                self.static_misses += 1
+            if traffic is not None:
+                self.traffic_hits += 1
+            else:
+                self.traffic_misses += 1
+            return static, traffic
+
+    def put(self, key, static=None, traffic=None):
+        """Store the static and/or traffic part of a route."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if static is None:
+                    return
+                entry = {'static': None, 'static_at': now, 'traffic': None, 'traffic_at': now}
+                self._entries[key] = entry
+            if static is not None:
+                entry['static'], entry['static_at'] = static, now
+            if traffic is not None:
+                entry['traffic'], entry['traffic_at'] = traffic, now
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Return size and hit ratios of the static and traffic parts."""
+        def ratio(hits, misses):
+            return round(hits / (hits + misses), 3) if hits + misses else None
+
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'grid_meters': self.grid_meters,
+                'static_hits': self.static_hits,
+                'static_misses': self.static_misses,
+                'static_hit_ratio': ratio(self.static_hits, self.static_misses),
+                'traffic_hits': self.traffic_hits,
+                'traffic_misses': self.traffic_misses,
+                'traffic_hit_ratio': ratio(self.traffic_hits, self.traffic_misses)
+            }
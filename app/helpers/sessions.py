@@ -0,0 +1,202 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Default limits, overridable from the environment
+SESSION_MAX_SESSIONS = int(os.getenv('SESSION_MAX_SESSIONS', 1000))
+SESSION_MAX_TURNS = int(os.getenv('SESSION_MAX_TURNS', 20))
+SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', 1800))
+SESSION_LOCK_STRIPES = int(os.getenv('SESSION_LOCK_STRIPES', 64))
+
+# Every store created in this process, for stats reporting
+_stores = []
+
+class SessionStore:
+    """
+    Bounded, thread-safe store for per-session conversation state.
+
+    Sessions are kept in least-recently-used order. A session is dropped when
+    it has been idle for longer than ttl_seconds, and the least recently used
+    session is evicted once more than max_sessions are stored. Histories are
+    trimmed to the last max_turns user/assistant exchanges.
+
+    Values are either message lists ({"role": ..., "content": ...} dicts) or
+    objects exposing a `history` list, such as genai.ChatSession. Work on a
+    single session is serialized with lock(session_id), which hands out one
+    of a fixed set of striped locks.
+    """
+
+    def __init__(self, name, max_sessions=SESSION_MAX_SESSIONS, max_turns=SESSION_MAX_TURNS,
+                 ttl_seconds=SESSION_TTL_SECONDS, lock_stripes=SESSION_LOCK_STRIPES, keep_head=0):
+        """
+        Args:
+            name: Name used in logs and stats
+            max_sessions: Maximum number of sessions kept in memory
+            max_turns: Maximum user/assistant exchanges kept per session
+            ttl_seconds: Idle time after which a session expires
+            lock_stripes: Number of per-session locks
+            keep_head: Leading history entries of object values (e.g. the
+                system prompt exchange of a chat session) that are never trimmed
+        """
+        self.name = name
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.ttl_seconds = ttl_seconds
+        self.keep_head = keep_head
+        self._entries = OrderedDict()  # session_id -> [value, last_access]
+        self._lock = threading.Lock()
+        self._stripes = [threading.RLock() for _ in range(lock_stripes)]
+        self.evictions = 0
+        self.expirations = 0
+        _stores.append(self)
+
+    def lock(self, session_id):
+        """Return the striped lock that serializes work on a session."""
+        return self._stripes[hash(session_id) % len(self._stripes)]
+
+    def get(self, session_id, default=None):
+        """Get a session's value, marking it as recently used."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return default
+            now = time.monotonic()
+            if now - entry[1] > self.ttl_seconds:
+                del self._entries[session_id]
+                self.expirations += 1
+                return default
+            entry[1] = now
+            self._entries.move_to_end(session_id)
+            return entry[0]
+
+    def get_or_create(self, session_id, factory):
+        """
+        Get a session's value, creating it with factory() if missing.
+
+        The factory runs outside the store lock since it may be slow (e.g.
+        priming a chat session); hold lock(session_id) to avoid creating the
+        same session twice.
+        """
+        value = self.get(session_id)
+        if value is not None:
+            return value
+
+        value = factory()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                return entry[0]
+            self._entries[session_id] = [value, time.monotonic()]
+            self._evict_locked()
+        return value
+
+    def append(self, session_id, *messages):
+        """Append messages to a list-valued session, trimming it to max_turns."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                entry = [[], time.monotonic()]
+                self._entries[session_id] = entry
+            entry[0].extend(messages)
+            entry[1] = time.monotonic()
+            self._entries.move_to_end(session_id)
+            self._trim_value(entry[0])
+            self._evict_locked()
+
+    def trim(self, session_id):
+        """Trim a session's history to max_turns after it was updated in place."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                self._trim_value(entry[0])
+
+    def discard(self, session_id):
+        """Remove a session if present."""
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def evict_expired(self):
+        """Drop all idle sessions. Returns the number of sessions removed."""
+        with self._lock:
+            before = len(self._entries)
+            self._evict_locked()
+            return before - len(self._entries)
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return size, limits and approximate memory use of the store."""
+        with self._lock:
+            histories = [_history_of(entry[0]) for entry in self._entries.values()]
+            return {
+                'sessions': len(self._entries),
+                'messages': sum(len(history) for history in histories),
+                'approx_bytes': sum(estimate_history_bytes(history) for history in histories),
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'max_sessions': self.max_sessions,
+                'max_turns': self.max_turns,
+                'ttl_seconds': self.ttl_seconds
+            }
+
+    def _evict_locked(self):
+        """Expire idle sessions and enforce max_sessions. Caller holds self._lock."""
+        # Entries are in access order, so idle sessions are at the front
+        now = time.monotonic()
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            if now - entry[1] <= self.ttl_seconds:
+                break
+            del self._entries[session_id]
+            self.expirations += 1
+
+        while len(self._entries) > self.max_sessions:
+            session_id, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            logger.info(f"Session store '{self.name}' evicted session {session_id}")
+
+    def _trim_value(self, value):
+        """Trim a history list or history-bearing object to max_turns."""
+        keep_tail = 2 * self.max_turns
+        if isinstance(value, list):
+            # System prompts at the head of a message list are always kept
+            head = 0
+            while head < len(value) and isinstance(value[head], dict) and value[head].get('role') == 'system':
+                head += 1
+            if len(value) > head + keep_tail:
+                del value[head:len(value) - keep_tail]
+            return
+
+        history = getattr(value, 'history', None)
+        if history is not None and len(history) > self.keep_head + keep_tail:
+            value.history = list(history[:self.keep_head]) + list(history[-keep_tail:])
+
+def _history_of(value):
+    """Return the message list held by a session value."""
+    if isinstance(value, list):
+        return value
+    return getattr(value, 'history', None) or []
+
+def estimate_history_bytes(history):
+    """Estimate the memory used by a history from the size of its message text."""
+    total = 0
+    for message in history:
+        if isinstance(message, dict):
+            total += len(str(message.get('content', '')).encode('utf-8'))
+        else:
+            # genai Content objects hold their text in parts
+            for part in getattr(message, 'parts', []):
+                total += len(getattr(part, 'text', '').encode('utf-8'))
+    return total
+
+def all_session_stats():
+    """Return stats for every session store in the process, keyed by name."""
+    return {store.name: store.stats() for store in _stores}
@@ -0,0 +1,82 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every group created in this process, for stats reporting
+_groups = []
+
+class _Call:
+    """An in-flight computation and its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    De-duplicates concurrent identical work within the process.
+
+    The first caller of do() for a key runs the function; callers arriving
+    with the same key while it is in flight wait for it and share its result
+    (or its exception) instead of repeating the work. The key is released as
+    soon as the call finishes, so results are not cached here; callers should
+    re-check their own cache inside the function.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}  # key -> _Call
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+        _groups.append(self)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) once per key among concurrent callers and return its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            logger.debug(f"Single-flight '{self.name}' coalesced call for {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Return execution and coalescing counters."""
+        with self._lock:
+            calls = self.executions + self.coalesced
+            return {
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'coalesced_ratio': round(self.coalesced / calls, 3) if calls else None,
+                'in_flight': len(self._calls)
+            }
+
+def all_singleflight_stats():
+    """Return stats for every single-flight group in the process, keyed by name."""
+    return {group.name: group.stats() for group in _groups}
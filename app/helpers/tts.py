@@ -1,12 +1,64 @@
 import os
 import re
+import math
 import hashlib
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from gtts import gTTS
 from flask import current_app
+from app.helpers.audio_cache import get_audio_cache
+from app.helpers.ffmpeg import FFmpegError, ffmpeg_pool
+from app.helpers.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# Worker pool used to synthesize the sentences of a reply concurrently
+TTS_MAX_WORKERS = int(os.getenv('TTS_MAX_WORKERS', 4))
+_tts_executor = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix='tts')
+
+# gTTS splits longer input itself (sequentially), so keep segments below this
+MAX_SEGMENT_LENGTH = 200
+
+# Tempo variants are cached per speed bucket of this width
+SPEED_BUCKET = 0.05
+# Playback speeds accepted from clients
+MIN_SPEED = 0.5
+MAX_SPEED = 2.0
+
+# Concurrent requests for the same uncached audio share one synthesis
+_tts_flight = SingleFlight('tts')
+
+# Splice reusable template parts (fixed phrases, readout tokens) out of sentences
+TTS_SPLICE_TEMPLATES = os.getenv('TTS_SPLICE_TEMPLATES', 'true').lower() == 'true'
+
+# Readout tokens from a small vocabulary that recur across replies
+TOKEN_PATTERN = re.compile(
+    r'\b[A-Z]{2}\s?\d{1,2}\s?[A-Z]{1,3}\s?\d{4}\b'  # Vehicle number, e.g. UP32 BZ 5678
+    r'|\b\d+(?:\.\d+)?\s?(?:%|percent|km|kilometers|minutes|hours)(?!\w)'  # e.g. 93 percent, 1.5 km
+)
+
+# Fixed phrases registered for splicing, longest first
+_template_phrases = []
+
+_tts_stats = {
+    'segments_cached': 0,
+    'segments_synthesized': 0,
+    'segments_spliced': 0,
+    'parts_reused': 0,
+    'parts_synthesized': 0
+}
+_tts_stats_lock = threading.Lock()
+
+def _count(stat, amount=1):
+    with _tts_stats_lock:
+        _tts_stats[stat] += amount
+
+def get_tts_stats():
+    """Return counters of cached, synthesized and spliced TTS segments."""
+    with _tts_stats_lock:
+        return dict(_tts_stats)
+
 def clean_text_for_tts(text):
     """Clean text for text-to-speech."""
     # Remove markdown formatting
@@ -27,12 +79,340 @@ def clean_text_for_tts(text):
     return text
 
 def get_cache_key(text, lang, slow):
-    """Generate a unique cache key based on text content and TTS parameters."""
+    """
+    Generate a unique cache key based on text content and TTS parameters.
+    This identifies the 1.0x master; see get_speed_variant_filename for tempo variants.
+    """
     # Create a string that includes all parameters that affect the audio output
     key_string = f"{text}_{lang}_{slow}"
     # Generate a hash of this string to use as the cache key
     return hashlib.md5(key_string.encode()).hexdigest()
 
+def parse_speed(value):
+    """
+    Parse a client-supplied playback speed.
+    Raises ValueError unless it is a finite number between MIN_SPEED and MAX_SPEED.
+    """
+    speed = float(value)
+    if not math.isfinite(speed) or not MIN_SPEED <= speed <= MAX_SPEED:
+        raise ValueError(f"Speed must be between {MIN_SPEED:g} and {MAX_SPEED:g}")
+    return speed
+
+def speed_bucket(speed):
+    """
+    Round a playback speed to its cache bucket (e.g. 1.23 -> 1.25).
+    Speeds outside MIN_SPEED to MAX_SPEED are clamped, so the bucket is always positive.
+    """
+    speed = float(speed)
+    if not math.isfinite(speed):
+        raise ValueError(f"Invalid speed: {speed}")
+    speed = min(max(speed, MIN_SPEED), MAX_SPEED)
+    return round(round(speed / SPEED_BUCKET) * SPEED_BUCKET, 2)
+
+def get_speed_variant_filename(master_filename, speed):
+    """Cache filename of a master file's tempo variant for a speed bucket."""
+    bucket = speed_bucket(speed)
+    if bucket == 1.0:
+        return master_filename
+    return f"{os.path.splitext(master_filename)[0]}_x{bucket:g}.mp3"
+
+def derive_speed_variant(master_filename, speed, cache_dir=None):
+    """
+    Get the tempo variant of a cached 1.0x master file.
+    
+    Variants are derived lazily with ffmpeg's atempo filter and cached
+    separately per speed bucket, so each speed is encoded at most once and
+    the master is never modified. Falls back to the master on error.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    variant_filename = get_speed_variant_filename(master_filename, speed)
+    if variant_filename == master_filename:
+        return master_filename
+    
+    cache = get_audio_cache(cache_dir)
+    if cache.lookup(variant_filename):
+        logger.info(f"Using cached tempo variant: {variant_filename}")
+        return variant_filename
+    
+    def encode(path):
+        ffmpeg_pool.atempo(os.path.join(cache_dir, master_filename), path, speed_bucket(speed))
+    
+    def render():
+        if not cache.contains(variant_filename):
+            cache.put(variant_filename, encode)
+    
+    try:
+        _tts_flight.do(('variant', cache.cache_dir, variant_filename), render)
+        logger.info(f"Derived tempo variant {variant_filename} at speed {speed_bucket(speed)}")
+        return variant_filename
+    except FFmpegError as e:
+        logger.error(f"FFmpeg error deriving tempo variant: {e}")
+    except Exception as e:
+        logger.error(f"Error deriving tempo variant: {e}")
+    # If there's an error, we'll just use the original audio file
+    return master_filename
+
+def get_cache_dir(cache_dir=None):
+    """Resolve the TTS cache directory, defaulting to the current app's static folder."""
+    if cache_dir is None:
+        cache_dir = os.path.join(current_app.static_folder, 'audio', 'cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def split_into_sentences(text, max_length=MAX_SEGMENT_LENGTH):
+    """
+    Split cleaned text into sentence-sized segments for synthesis.
+    
+    Sentences longer than max_length are broken at the last clause or word
+    boundary that fits, so no part of the text is dropped.
+    """
+    segments = []
+    for sentence in re.split(r'(?<=[.!?।])\s+', text):
+        sentence = sentence.strip()
+        while len(sentence) > max_length:
+            cut = sentence.rfind(', ', 0, max_length)
+            if cut <= 0:
+                cut = sentence.rfind(' ', 0, max_length)
+            if cut > 0:
+                # Keep the separator (a comma) with the first part
+                cut += 1
+            else:
+                cut = max_length
+            segments.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            segments.append(sentence)
+    return segments
+
+def register_template_phrases(phrases):
+    """Register fixed phrases whose cached audio is reused when they appear inside a sentence."""
+    for phrase in phrases:
+        phrase = phrase.strip()
+        if phrase and phrase not in _template_phrases:
+            _template_phrases.append(phrase)
+    _template_phrases.sort(key=len, reverse=True)
+
+def split_template_parts(sentence):
+    """
+    Split a sentence into registered fixed phrases, readout tokens and the
+    novel text between them.
+    
+    Returns a list of (text, is_template) tuples; a single part means there
+    is nothing to splice. Punctuation-only gaps are dropped.
+    """
+    spans = []
+    
+    def overlaps(start, end):
+        return any(start < other_end and other_start < end for other_start, other_end in spans)
+    
+    for phrase in _template_phrases:
+        start = sentence.find(phrase)
+        while start != -1:
+            end = start + len(phrase)
+            if not overlaps(start, end):
+                spans.append((start, end))
+            start = sentence.find(phrase, end)
+    
+    for match in TOKEN_PATTERN.finditer(sentence):
+        if not overlaps(*match.span()):
+            spans.append(match.span())
+    
+    parts = []
+    
+    def add_novel(text):
+        text = text.strip()
+        if any(ch.isalnum() for ch in text):
+            parts.append((text, False))
+    
+    position = 0
+    for start, end in sorted(spans):
+        add_novel(sentence[position:start])
+        parts.append((sentence[start:end], True))
+        position = end
+    add_novel(sentence[position:])
+    return parts
+
+def _synthesize_single(text, lang, slow, cache):
+    """
+    Synthesize text with one gTTS call unless it is already cached.
+    Returns (filename, was_cached).
+    """
+    filename = f"{get_cache_key(text, lang, slow)}.mp3"
+    if cache.lookup(filename):
+        return filename, True
+    
+    def render():
+        if not cache.contains(filename):
+            logger.info(f"Generating TTS segment for text: {text[:50]}...")
+            cache.put(filename, gTTS(text=text, lang=lang, slow=slow).save)
+    
+    _tts_flight.do(('single', cache.cache_dir, filename), render)
+    return filename, False
+
+def synthesize_segment(text, lang, slow, cache_dir):
+    """
+    Synthesize a single segment with gTTS, caching it under its own key.
+    
+    Uncached sentences containing fixed phrases or readout tokens (numbers
+    with units, vehicle numbers) whose audio is already cached (e.g. by the
+    phrase bank warm-up) are spliced together from the cached parts, so only
+    the novel text between them costs a gTTS call. Sentences that would need
+    more than one gTTS call to splice are synthesized whole instead.
+    Returns the cached filename.
+    """
+    cache = get_audio_cache(cache_dir)
+    filename = f"{get_cache_key(text, lang, slow)}.mp3"
+    
+    if cache.lookup(filename):
+        logger.info(f"Using cached TTS segment: {filename}")
+        _count('segments_cached')
+        return filename
+    
+    return _tts_flight.do(('segment', cache.cache_dir, filename), _render_segment, text, lang, slow, cache_dir, filename)
+
+def _splice_pays_off(parts, lang, slow, cache):
+    """
+    True if every template part is cached and at most one part is left to
+    synthesize, so splicing costs no more gTTS round trips than the whole sentence.
+    """
+    uncached = 0
+    for part_text, is_template in parts:
+        if cache.contains(f"{get_cache_key(part_text, lang, slow)}.mp3"):
+            continue
+        if is_template:
+            return False
+        uncached += 1
+    return uncached <= 1
+
+def _render_segment(text, lang, slow, cache_dir, filename):
+    """Render an uncached segment, splicing cached template parts where possible."""
+    cache = get_audio_cache(cache_dir)
+    if cache.contains(filename):
+        # Rendered by a concurrent request that finished before this one started
+        return filename
+    
+    parts = split_template_parts(text) if TTS_SPLICE_TEMPLATES else []
+    if len(parts) > 1 and _splice_pays_off(parts, lang, slow, cache):
+        try:
+            part_filenames = []
+            for part_text, _ in parts:
+                part_filename, was_cached = _synthesize_single(part_text, lang, slow, cache)
+                part_filenames.append(part_filename)
+                _count('parts_reused' if was_cached else 'parts_synthesized')
+            concatenate_segments(part_filenames, cache_dir, filename)
+            _count('segments_spliced')
+            logger.info(f"Spliced TTS segment from {len(parts)} parts: {text[:50]}...")
+            return filename
+        except Exception as e:
+            logger.warning(f"Splicing TTS segment failed, synthesizing it whole: {e}")
+    
+    filename, _ = _synthesize_single(text, lang, slow, cache)
+    _count('segments_synthesized')
+    return filename
+
+def submit_segment(text, lang, slow, cache_dir):
+    """Queue a segment on the TTS worker pool; returns a Future of its cached filename."""
+    return _tts_executor.submit(synthesize_segment, text, lang, slow, cache_dir)
+
+def synthesize_segments(segments, lang, slow, cache_dir):
+    """
+    Synthesize segments concurrently on the TTS worker pool.
+    
+    All segments are submitted up front; filenames are yielded in order as
+    soon as each one is ready, so the first sentence can be played while the
+    rest are still being produced. Failed segments yield None.
+    """
+    futures = [submit_segment(segment, lang, slow, cache_dir) for segment in segments]
+    for segment, future in zip(segments, futures):
+        try:
+            yield future.result()
+        except Exception as e:
+            logger.error(f"Error generating TTS segment '{segment[:50]}': {e}")
+            yield None
+
+def _strip_id3(data):
+    """Strip a leading ID3v2 tag so only MPEG frames remain."""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return data
+    # Tag size is a 28-bit syncsafe integer; a footer adds another 10 bytes
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return data[10 + size + footer:]
+
+def concatenate_segments(filenames, cache_dir, output_filename):
+    """
+    Join cached MP3 segments into a single file.
+    
+    MP3 frames are self-contained, so the segments can be concatenated frame
+    for frame (gTTS does the same for its own chunks) without re-encoding.
+    """
+    def write(path):
+        with open(path, 'wb') as out:
+            for filename in filenames:
+                with open(os.path.join(cache_dir, filename), 'rb') as segment:
+                    out.write(_strip_id3(segment.read()))
+    
+    get_audio_cache(cache_dir).put(output_filename, write)
+    return output_filename
+
+def join_segments(filenames, text, lang, slow, cache_dir):
+    """
+    Join the segments synthesized for a text into one file cached under the
+    text's key, as synthesize_text would. Returns the filename, or None if
+    any segment failed (None), so a partial render is never cached as the text.
+    """
+    if not filenames or None in filenames:
+        return None
+    if len(filenames) == 1:
+        return filenames[0]
+    return concatenate_segments(filenames, cache_dir, f"{get_cache_key(text, lang, slow)}.mp3")
+
+def synthesize_playlist(text, lang='en', slow=False, cache_dir=None):
+    """
+    Synthesize cleaned text sentence by sentence.
+    Returns the ordered list of cached segment filenames, or None if any
+    sentence could not be synthesized.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    segments = split_into_sentences(text) or [text]
+    filenames = list(synthesize_segments(segments, lang, slow, cache_dir))
+    if None in filenames:
+        logger.error(f"TTS failed for {filenames.count(None)} of {len(filenames)} segments")
+        return None
+    return filenames
+
+def synthesize_text(text, lang='en', slow=False, cache_dir=None):
+    """
+    Synthesize cleaned text into one cached MP3 covering the whole text.
+    Returns the cached filename, or None if nothing could be synthesized.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    cache_key = get_cache_key(text, lang, slow)
+    output_filename = f"{cache_key}.mp3"
+    
+    cache = get_audio_cache(cache_dir)
+    if cache.lookup(output_filename):
+        logger.info(f"Using cached TTS file: {output_filename}")
+        return output_filename
+    
+    return _tts_flight.do(('text', cache.cache_dir, output_filename), _render_text, text, lang, slow, cache_dir, output_filename)
+
+def _render_text(text, lang, slow, cache_dir, output_filename):
+    """
+    Render uncached text sentence by sentence and join the sentences.
+    Only complete renders are cached under the text's key.
+    """
+    if get_audio_cache(cache_dir).contains(output_filename):
+        return output_filename
+    
+    filenames = synthesize_playlist(text, lang, slow, cache_dir)
+    if not filenames:
+        return None
+    if len(filenames) == 1:
+        # A single sentence is cached under the same key as the full text
+        return filenames[0]
+    return concatenate_segments(filenames, cache_dir, output_filename)
+
 def generate_tts(text, lang='en', speed=1.0):
     """
     Generate TTS audio using Google Text-to-Speech (gTTS).
@@ -45,50 +425,17 @@ def generate_tts(text, lang='en', speed=1.0):
         # Set slow parameter based on speed
         slow = speed < 0.9
         
-        # Generate a cache key
-        cache_key = get_cache_key(text, lang, slow)
-        
-        # Ensure cache directory exists
-        app_static_folder = current_app.static_folder
-        cache_dir = os.path.join(app_static_folder, 'audio', 'cache')
-        os.makedirs(cache_dir, exist_ok=True)
+        filename = synthesize_text(text, lang, slow)
+        if not filename:
+            return None
         
-        # Check if we already have this text cached
-        cache_file = os.path.join(cache_dir, f"{cache_key}.mp3")
-        if os.path.exists(cache_file):
-            logger.info(f"Using cached TTS file: {cache_file}")
-            return f"static/audio/cache/{cache_key}.mp3"
-        
-        # Breaking text into smaller chunks if too long
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        chunks = []
-        current_chunk = ""
-
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) < 500:  # Reasonable chunk size
-                current_chunk += sentence + " "
-            else:
-                chunks.append(current_chunk.strip())
-                current_chunk = sentence + " "
-
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-
-        # If text is short enough, just use it directly
-        if not chunks:
-            chunks = [text]
-
-        # Process only the first chunk for now to reduce latency
-        text_to_process = chunks[0]
-
-        # Create MP3 file with gTTS
-        logger.info(f"Generating TTS for text: {text_to_process[:50]}...")
-        tts = gTTS(text=text_to_process, lang=lang, slow=slow)
-        tts.save(cache_file)
+        # Speeds not covered by gTTS's slow mode get a derived tempo variant
+        if not slow and speed_bucket(speed) != 1.0:
+            filename = derive_speed_variant(filename, speed)
         
-        logger.info(f"TTS file generated: {cache_file}")
-        return f"static/audio/cache/{cache_key}.mp3"
+        logger.info(f"TTS file generated: {filename}")
+        return f"static/audio/cache/{filename}"
         
     except Exception as e:
         logger.error(f"Error generating TTS: {e}", exc_info=True)
-        return None 
\ No newline at end of file
+        return None
@@ -0,0 +1,141 @@
+import os
+import time
+import uuid
+import queue
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Worker count, tunable to the host's cores and the gTTS rate limit
+TTS_WORKERS = int(os.getenv('TTS_WORKERS', min(4, os.cpu_count() or 1)))
+# Finished jobs are kept this long for clients to fetch their result
+TTS_JOB_TTL = int(os.getenv('TTS_JOB_TTL', 600))
+
+class TTSJobQueue:
+    """
+    Background TTS worker pool fed by a job queue.
+
+    submit() queues a render callable and returns a job id straight away, so
+    a chat reply can be sent before its audio exists. Worker threads (started
+    on the first submit) run the jobs and record the resulting audio URL in
+    the job table, where clients poll or long-poll for it with wait().
+    Finished jobs are forgotten after job_ttl seconds.
+    """
+
+    def __init__(self, workers=TTS_WORKERS, job_ttl=TTS_JOB_TTL):
+        self.workers = max(1, workers)
+        self.job_ttl = job_ttl
+        self.queue = queue.Queue()
+        self.jobs = {}  # job_id -> job dict
+        self._lock = threading.Lock()
+        self._threads = []
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, render, *args, **kwargs):
+        """
+        Queue a render job.
+
+        Args:
+            render: Callable returning the audio URL (or None if no audio)
+            *args, **kwargs: Arguments for render
+
+        Returns:
+            The job id
+        """
+        self.start()
+        job_id = uuid.uuid4().hex
+        job = {
+            'status': 'pending',
+            'audio_url': None,
+            'error': None,
+            'created': time.time(),
+            'finished': None,
+            'done': threading.Event()
+        }
+        with self._lock:
+            self._prune_locked()
+            self.jobs[job_id] = job
+        self.queue.put((job_id, render, args, kwargs))
+        return job_id
+
+    def get(self, job_id):
+        """Return the public state of a job, or None if it is unknown or expired."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return self._public(job_id, job)
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job has finished or timeout elapsed; returns its public state."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job['done'].wait(timeout)
+        return self.get(job_id)
+
+    def start(self):
+        """Start the worker threads (only the first call has an effect)."""
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f'tts-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Started {self.workers} TTS workers")
+
+    def stats(self):
+        """Return queue depth and job counters."""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queued': self.queue.qsize(),
+                'jobs': len(self.jobs),
+                'completed': self.completed,
+                'failed': self.failed
+            }
+
+    def _worker_loop(self):
+        while True:
+            job_id, render, args, kwargs = self.queue.get()
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is not None:
+                    job['status'] = 'running'
+            try:
+                audio_url = render(*args, **kwargs)
+                status, error = ('done', None) if audio_url else ('error', 'No audio could be generated')
+            except Exception as e:
+                logger.error(f"TTS job {job_id} failed: {e}", exc_info=True)
+                audio_url, status, error = None, 'error', str(e)
+            with self._lock:
+                if job is not None:
+                    job.update(status=status, audio_url=audio_url, error=error, finished=time.time())
+                if status == 'done':
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            if job is not None:
+                job['done'].set()
+            self.queue.task_done()
+
+    def _prune_locked(self):
+        """Forget finished jobs older than job_ttl. Caller holds self._lock."""
+        cutoff = time.time() - self.job_ttl
+        for job_id in [job_id for job_id, job in self.jobs.items() if job['finished'] and job['finished'] < cutoff]:
+            del self.jobs[job_id]
+
+    @staticmethod
+    def _public(job_id, job):
+        return {
+            'job_id': job_id,
+            'status': job['status'],
+            'audio_url': job['audio_url'],
+            'error': job['error']
+        }
@@ -0,0 +1,109 @@
+import io
+import os
+import queue
+import threading
+import logging
+from app.helpers.audio import CHANNELS, SAMPLE_RATE, EndpointDetector, speech_wav
+from app.helpers.ffmpeg import FFMPEG_JOB_TIMEOUT, FFMPEG_MAX_PROCESSES, FFmpegPool, pipe_through_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Streaming decoders live as long as the utterance, so they get their own pool
+# instead of holding workers of the shared ffmpeg pool; sockets beyond this are rejected
+VOICE_STREAM_MAX_DECODERS = int(os.getenv('VOICE_STREAM_MAX_DECODERS', FFMPEG_MAX_PROCESSES))
+stream_decoder_pool = FFmpegPool(VOICE_STREAM_MAX_DECODERS, VOICE_STREAM_MAX_DECODERS, name='ffmpeg-stream')
+
+# Decode with minimal probing and buffering so PCM comes out while chunks arrive
+STREAM_DECODE_ARGS = [
+    '-fflags', 'nobuffer', '-probesize', '32768', '-analyzeduration', '0',
+    '-i', 'pipe:0', '-f', 's16le', '-acodec', 'pcm_s16le',
+    '-ar', str(SAMPLE_RATE), '-ac', str(CHANNELS), '-flush_packets', '1', 'pipe:1'
+]
+
+class _ChunkReader(io.RawIOBase):
+    """Blocking file-like reader over audio chunks pushed from another thread."""
+
+    def __init__(self):
+        self._chunks = queue.Queue()
+        self._buffer = b''
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            if self._eof:
+                return 0
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._eof = True
+                return 0
+            self._buffer = chunk
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def push(self, chunk):
+        self._chunks.put(chunk)
+
+    def end(self):
+        self._chunks.put(None)
+
+class VoiceStream:
+    """
+    One utterance of live audio (e.g. MediaRecorder WebM chunks over a WebSocket).
+
+    Chunks are piped into an ffmpeg job on stream_decoder_pool as they arrive, and
+    the PCM it produces runs through an EndpointDetector, so the end of the
+    utterance is known the moment the driver stops talking. finish() then
+    closes ffmpeg's input and returns the trimmed WAV for recognition.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.detector = EndpointDetector(sample_rate)
+        self.ended = threading.Event()
+        self.bytes_received = 0
+        self._input = _ChunkReader()
+        self._future = None
+
+    def start(self):
+        """Start the decoder job. Raises FFmpegBusyError if every decoder is in use."""
+        self._future = stream_decoder_pool.submit(pipe_through_ffmpeg, STREAM_DECODE_ARGS, self._input, self._on_pcm)
+
+    @property
+    def speech_started(self):
+        return self.detector.speech_started
+
+    @property
+    def done(self):
+        """True once the decoder job has exited (finished or failed)."""
+        return self._future is not None and self._future.done()
+
+    def feed(self, chunk):
+        """Push an encoded audio chunk to the decoder."""
+        if chunk and not self.ended.is_set():
+            self.bytes_received += len(chunk)
+            self._input.push(bytes(chunk))
+
+    def finish(self, timeout=FFMPEG_JOB_TIMEOUT):
+        """
+        End the input and wait for the decoder.
+        Returns the trimmed WAV file object (the caller closes it).
+        """
+        self.ended.set()
+        self._input.end()
+        with self._future.result(timeout) as pcm:
+            return speech_wav(pcm.read(), self.sample_rate)
+
+    def abort(self):
+        """Stop decoding, e.g. when the client disconnected."""
+        self.ended.set()
+        self._input.end()
+
+    def _on_pcm(self, pcm_bytes):
+        if self.detector.feed(pcm_bytes) and not self.ended.is_set():
+            logger.info(f"End of utterance detected after {self.bytes_received} bytes received")
+            self.ended.set()
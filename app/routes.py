@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, jsonify, current_app
 import logging
 import datetime
 from app.helpers.llm import get_llm_response
+from app.helpers.phrases import FALLBACK_RESPONSE_WITH_CONTACT
 from app.helpers.tts import generate_tts
 
 # Create blueprint
@@ -53,9 +54,7 @@ def chat():
         
     except Exception as e:
         logger.error(f"Error processing chat request: {e}", exc_info=True)
-        fallback_response = "Namaste! I am your SMV E-rickshaw assistant. I apologize, but I'm experiencing technical difficulties. Please try again. For assistance, contact SMV at 1800-XXX-XXXX"
-        
         return jsonify({
             'error': str(e),
-            'response': fallback_response
+            'response': FALLBACK_RESPONSE_WITH_CONTACT
         }), 500 
\ No newline at end of file
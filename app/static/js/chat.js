@@ -99,6 +99,31 @@ document.addEventListener('DOMContentLoaded', function() {
         audio.play().catch(e => console.error('Audio error:', e));
     }
     
+    // Play per-sentence audio segments back to back as they arrive
+    const audioQueue = [];
+    let audioPlaying = false;
+    
+    function enqueueAudio(url) {
+        audioQueue.push(url);
+        if (!audioPlaying) playNextAudio();
+    }
+    
+    function playNextAudio() {
+        const url = audioQueue.shift();
+        if (!url) {
+            audioPlaying = false;
+            return;
+        }
+        audioPlaying = true;
+        const audio = new Audio(url);
+        audio.addEventListener('ended', playNextAudio);
+        audio.addEventListener('error', playNextAudio);
+        audio.play().catch(e => {
+            console.error('Audio error:', e);
+            playNextAudio();
+        });
+    }
+    
     // Create chat elements if not found
     function createChatElements() {
         console.log("Creating chat elements dynamically");
@@ -340,19 +365,139 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    // Send message to backend
+    // Create an empty bot message that is filled in as the reply streams in
+    function createStreamingMessage() {
+        const messageElement = document.createElement('div');
+        messageElement.classList.add('message');
+        messageElement.classList.add('bot-message');
+        
+        const textElement = document.createElement('span');
+        messageElement.appendChild(textElement);
+        
+        const timeElement = document.createElement('div');
+        timeElement.classList.add('message-time');
+        const now = new Date();
+        timeElement.textContent = now.getHours() + ':' + 
+            (now.getMinutes() < 10 ? '0' : '') + now.getMinutes();
+        messageElement.appendChild(timeElement);
+        
+        chatMessages.appendChild(messageElement);
+        return textElement;
+    }
+    
+    // Send message to backend, rendering the reply token by token
     function sendMessage(message) {
+        const payload = JSON.stringify({
+            message: message,
+            session_id: sessionId,
+            language: 'en',
+            speed: 1.0,
+            // Driver position from map.js, for nearby places in the reply
+            ...(typeof currentLocation !== 'undefined' && currentLocation ? currentLocation : {})
+        });
+        
+        let textElement = null;
+        let streamedText = '';
+        
+        function handleEvent(event) {
+            if (event.type === 'delta') {
+                if (!textElement) {
+                    // First words arrived: swap the typing indicator for the message
+                    hideTypingIndicator();
+                    textElement = createStreamingMessage();
+                }
+                streamedText += event.text;
+                textElement.textContent = streamedText;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            } else if (event.type === 'audio') {
+                enqueueAudio(event.url);
+            } else if (event.type === 'done' || event.type === 'error') {
+                hideTypingIndicator();
+                if (!textElement) {
+                    textElement = createStreamingMessage();
+                }
+                textElement.innerHTML = formatLinks(event.response || streamedText);
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+                
+                // Replies stream their audio sentence by sentence; errors carry a fixed phrase
+                if (event.type === 'error' && event.audio_url) {
+                    playAudio(event.audio_url);
+                }
+            }
+        }
+        
+        fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: payload
+        })
+        .then(response => {
+            if (!response.ok || !response.body) {
+                throw new Error('Streaming not available: ' + response.status);
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            function read() {
+                return reader.read().then(({ done, value }) => {
+                    if (done) return;
+                    
+                    buffer += decoder.decode(value, { stream: true });
+                    
+                    // SSE frames are separated by a blank line
+                    let boundary = buffer.indexOf('\n\n');
+                    while (boundary !== -1) {
+                        const frame = buffer.slice(0, boundary);
+                        buffer = buffer.slice(boundary + 2);
+                        frame.split('\n')
+                            .filter(line => line.startsWith('data: '))
+                            .forEach(line => handleEvent(JSON.parse(line.slice(6))));
+                        boundary = buffer.indexOf('\n\n');
+                    }
+                    return read();
+                });
+            }
+            return read();
+        })
+        .catch(error => {
+            console.error('Streaming error:', error);
+            if (textElement) {
+                // Keep what we already rendered rather than duplicating the reply
+                hideTypingIndicator();
+                return;
+            }
+            sendMessageNonStreaming(payload);
+        });
+    }
+    
+    // Long-poll a background TTS job and play its audio when ready
+    function waitForAudioJob(jobId, attempts = 6) {
+        fetch(`/api/tts/jobs/${jobId}?wait=10`)
+        .then(response => response.json())
+        .then(job => {
+            if (job.status === 'done' && job.audio_url) {
+                playAudio(job.audio_url);
+            } else if ((job.status === 'pending' || job.status === 'running') && attempts > 1) {
+                waitForAudioJob(jobId, attempts - 1);
+            } else if (job.error) {
+                console.error('TTS job failed:', job.error);
+            }
+        })
+        .catch(error => console.error('Error fetching audio job:', error));
+    }
+    
+    // Fallback: send message to the regular (non-streaming) endpoint
+    function sendMessageNonStreaming(payload) {
         fetch('/api/chat', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({
-                message: message,
-                session_id: sessionId,
-                language: 'en',
-                speed: 1.0
-            })
+            body: payload
         })
         .then(response => response.json())
         .then(data => {
@@ -363,9 +508,11 @@ document.addEventListener('DOMContentLoaded', function() {
             if (data.response) {
                 addMessage(data.response, 'bot');
                 
-                // Play audio if available
+                // Play audio if available, or once its background job has finished
                 if (data.audio_url) {
                     playAudio(data.audio_url);
+                } else if (data.audio_job_id) {
+                    waitForAudioJob(data.audio_job_id);
                 }
             } else if (data.error) {
                 addMessage('Sorry, I encountered an error: ' + data.error, 'bot');
@@ -11,6 +11,7 @@ let watchId = null;
 let nearbyMarkers = [];
 let trafficLayer = null;
 let trafficIncidentsLayer = null;
+let currentLocation = null; // Latest {lat, lon}, sent with chat messages
 const DEFAULT_LOCATION = [26.8467, 80.9462]; // Lucknow coordinates for fallback
 
 // Initialize the map when the page loads
@@ -111,6 +112,8 @@ document.addEventListener('DOMContentLoaded', function() {
 
 // Update location on map
 function updateLocationOnMap(latitude, longitude) {
+    currentLocation = { lat: latitude, lon: longitude };
+    
     // Update map view
     map.setView([latitude, longitude], 14);
     
@@ -191,11 +194,8 @@ function updateLocationText(latitude, longitude) {
     locationElement.textContent = `${latitude.toFixed(6)}, ${longitude.toFixed(6)}`;
     
     // Then try to get human-readable address
-    fetch(`https://nominatim.openstreetmap.org/reverse?format=json&lat=${latitude}&lon=${longitude}&zoom=18&addressdetails=1`, {
-        headers: {
-            'User-Agent': 'SMVGreenRickshawApp/1.0'
-        }
-    })
+    // The server caches addresses and keeps us within Nominatim's rate limit
+    fetch(`/api/reverse-geocode?lat=${latitude}&lon=${longitude}`)
     .then(response => {
         if (!response.ok) throw new Error('Network response was not ok');
         return response.json();
@@ -211,21 +211,56 @@ function updateLocationText(latitude, longitude) {
     });
 }
 
+// Place types shown on the dashboard, keyed by /api/nearby category
+const NEARBY_TYPES = {
+    schools: 'school',
+    bus_stations: 'bus_station',
+    malls: 'mall'
+};
+
 // Search for nearby places
 function searchNearbyPlaces(latitude, longitude) {
     // Clear previous markers
     nearbyMarkers.forEach(marker => map.removeLayer(marker));
     nearbyMarkers = [];
     
-    // Search for each type of place
-    searchNearPlace(latitude, longitude, 'school');
-    searchNearPlace(latitude, longitude, 'bus_station');
-    searchNearPlace(latitude, longitude, 'mall');
+    Object.values(NEARBY_TYPES).forEach(type => {
+        const { nameElement, distanceElement } = getPlaceElements(type);
+        if (nameElement) nameElement.textContent = "Searching...";
+        if (distanceElement) distanceElement.textContent = "";
+    });
+    
+    // One server call answers every category from the server's place index
+    fetch(`/api/nearby?lat=${latitude}&lon=${longitude}&categories=${Object.keys(NEARBY_TYPES).join(',')}`)
+    .then(response => {
+        if (!response.ok) throw new Error('Network response was not ok');
+        return response.json();
+    })
+    .then(data => {
+        Object.entries(NEARBY_TYPES).forEach(([category, type]) => {
+            const places = (data.places && data.places[category]) || [];
+            if (places.length > 0) {
+                showNearestPlace({
+                    name: places[0].name,
+                    lat: places[0].lat,
+                    lon: places[0].lon,
+                    distance: places[0].distance_km
+                }, type);
+            } else {
+                // If no results found, use simulated place
+                showSimulatedPlace(latitude, longitude, type);
+            }
+        });
+    })
+    .catch(error => {
+        console.error('Error searching for nearby places:', error);
+        // Use simulated places on error
+        Object.values(NEARBY_TYPES).forEach(type => showSimulatedPlace(latitude, longitude, type));
+    });
 }
 
-// Search for a specific type of place
-function searchNearPlace(latitude, longitude, type) {
-    // Get relevant elements
+// Get the dashboard elements of a place type
+function getPlaceElements(type) {
     let nameElement, distanceElement;
     
     switch(type) {
@@ -243,128 +278,53 @@ function searchNearPlace(latitude, longitude, type) {
             break;
     }
     
-    // Show "Searching..." state
-    if (nameElement) nameElement.textContent = "Searching...";
-    if (distanceElement) distanceElement.textContent = "";
+    return { nameElement, distanceElement };
+}
+
+// Show the nearest place of a type on the dashboard and the map
+function showNearestPlace(place, type) {
+    const { nameElement, distanceElement } = getPlaceElements(type);
     
-    // Create simulated place (guaranteed to work)
-    const createSimulatedPlace = () => {
-        // Define default places based on type
-        let name, distance, lat, lng;
-        
-        switch(type) {
-            case 'school':
-                name = "APS Academy";
-                distance = 1.1;
-                lat = latitude + 0.01;
-                lng = longitude - 0.01;
-                break;
-            case 'bus_station':
-                name = "Central Bus Terminal";
-                distance = 0.7;
-                lat = latitude - 0.005;
-                lng = longitude + 0.008;
-                break;
-            case 'mall':
-                name = "City Center Mall";
-                distance = 1.5;
-                lat = latitude + 0.007;
-                lng = longitude + 0.012;
-                break;
-        }
-        
-        // Update UI
-        if (nameElement) nameElement.textContent = name;
-        if (distanceElement) distanceElement.textContent = distance.toFixed(1) + " km";
-        
-        // Add marker
-        addPlaceMarker({
-            name: name,
-            lat: lat,
-            lon: lng,
-            distance: distance
-        }, type);
-    };
+    // Update UI
+    if (nameElement) nameElement.textContent = place.name;
+    if (distanceElement) distanceElement.textContent = place.distance.toFixed(1) + " km";
     
-    // Try real search with OpenStreetMap, fall back to simulation if needed
-    const radius = 3000; // 3km
-    let query;
+    // Add marker
+    addPlaceMarker(place, type);
+}
+
+// Show a simulated place (guaranteed to work)
+function showSimulatedPlace(latitude, longitude, type) {
+    // Define default places based on type
+    let name, distance, lat, lng;
     
     switch(type) {
         case 'school':
-            query = 'amenity=school';
+            name = "APS Academy";
+            distance = 1.1;
+            lat = latitude + 0.01;
+            lng = longitude - 0.01;
             break;
         case 'bus_station':
-            query = 'highway=bus_stop';
+            name = "Central Bus Terminal";
+            distance = 0.7;
+            lat = latitude - 0.005;
+            lng = longitude + 0.008;
             break;
         case 'mall':
-            query = 'shop=mall';
+            name = "City Center Mall";
+            distance = 1.5;
+            lat = latitude + 0.007;
+            lng = longitude + 0.012;
             break;
     }
     
-    const overpassQuery = `
-        [out:json][timeout:25];
-        (
-            node[${query}](around:${radius},${latitude},${longitude});
-            way[${query}](around:${radius},${latitude},${longitude});
-        );
-        out center;
-    `;
-    
-    fetch('https://overpass-api.de/api/interpreter', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/x-www-form-urlencoded'
-        },
-        body: 'data=' + encodeURIComponent(overpassQuery)
-    })
-    .then(response => {
-        if (!response.ok) throw new Error('Network response was not ok');
-        return response.json();
-    })
-    .then(data => {
-        if (data.elements && data.elements.length > 0) {
-            // Process results
-            const places = data.elements
-                .filter(el => el.tags && el.tags.name)
-                .map(el => {
-                    const placeLat = el.lat || (el.center && el.center.lat);
-                    const placeLon = el.lon || (el.center && el.center.lon);
-                    
-                    if (!placeLat || !placeLon) return null;
-                    
-                    return {
-                        name: el.tags.name,
-                        lat: placeLat,
-                        lon: placeLon,
-                        distance: calculateDistance(latitude, longitude, placeLat, placeLon)
-                    };
-                })
-                .filter(place => place !== null)
-                .sort((a, b) => a.distance - b.distance);
-            
-            if (places.length > 0) {
-                // Get nearest place
-                const nearest = places[0];
-                
-                // Update UI
-                if (nameElement) nameElement.textContent = nearest.name;
-                if (distanceElement) distanceElement.textContent = nearest.distance.toFixed(1) + " km";
-                
-                // Add marker
-                addPlaceMarker(nearest, type);
-                return; // Success!
-            }
-        }
-        
-        // If no results found, use simulated place
-        createSimulatedPlace();
-    })
-    .catch(error => {
-        console.error(`Error searching for ${type}:`, error);
-        // Use simulated place on error
-        createSimulatedPlace();
-    });
+    showNearestPlace({
+        name: name,
+        lat: lat,
+        lon: lng,
+        distance: distance
+    }, type);
 }
 
 // Add marker for a place
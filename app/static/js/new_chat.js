@@ -85,9 +85,75 @@ document.addEventListener('DOMContentLoaded', function() {
       // Scroll to bottom
       chatContainer.scrollTop = chatContainer.scrollHeight;
       
-      // DIRECT API CALL - Force using fetch to call our backend
+      // Remove loading indicator
+      function removeLoading() {
+        const loadingIndicator = document.querySelector('.loading-indicator');
+        if (loadingIndicator) loadingIndicator.remove();
+      }
+      
+      // Bot message that is filled in as the reply streams in
+      let botDiv = null;
+      let streamedText = '';
+      
+      // Per-sentence audio segments, played back to back as they arrive
+      const audioQueue = [];
+      let audioPlaying = false;
+      
+      function playNextAudio() {
+        const url = audioQueue.shift();
+        audioPlaying = !!url;
+        if (!url) return;
+        const audio = new Audio(url);
+        audio.addEventListener('ended', playNextAudio);
+        audio.addEventListener('error', playNextAudio);
+        audio.play().catch(e => {
+          console.error('Audio error:', e);
+          playNextAudio();
+        });
+      }
+      
+      function handleEvent(data) {
+        if (data.type === 'audio') {
+          audioQueue.push(data.url);
+          if (!audioPlaying) playNextAudio();
+        } else if (data.type === 'delta') {
+          if (!botDiv) {
+            removeLoading();
+            botDiv = document.createElement('div');
+            botDiv.className = 'bot-message';
+            chatContainer.appendChild(botDiv);
+            updateDebug('First tokens received');
+          }
+          streamedText += data.text;
+          botDiv.textContent = streamedText;
+          chatContainer.scrollTop = chatContainer.scrollHeight;
+        } else if (data.type === 'done' || data.type === 'error') {
+          removeLoading();
+          updateDebug('Got data: ' + (data.response ? data.response.substring(0, 20) + '...' : 'No response'));
+          
+          if (data.response) {
+            if (!botDiv) {
+              botDiv = document.createElement('div');
+              botDiv.className = 'bot-message';
+              chatContainer.appendChild(botDiv);
+            }
+            botDiv.innerHTML = data.response.replace(/\n/g, '<br>');
+            
+            // Scroll to bottom
+            chatContainer.scrollTop = chatContainer.scrollHeight;
+            
+            // Replies stream their audio sentence by sentence; errors carry a fixed phrase
+            if (data.type === 'error' && data.audio_url) {
+              const audio = new Audio(data.audio_url);
+              audio.play().catch(e => console.error('Audio error:', e));
+            }
+          }
+        }
+      }
+      
+      // DIRECT API CALL - Stream the reply from our backend as Server-Sent Events
       updateDebug('Calling API...');
-      fetch('/api/chat', {
+      fetch('/api/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -101,41 +167,39 @@ document.addEventListener('DOMContentLoaded', function() {
       })
       .then(response => {
         updateDebug('API responded: ' + response.status);
-        if (!response.ok) {
+        if (!response.ok || !response.body) {
           throw new Error('API error: ' + response.status);
         }
-        return response.json();
-      })
-      .then(data => {
-        // Remove loading indicator
-        const loadingIndicator = document.querySelector('.loading-indicator');
-        if (loadingIndicator) loadingIndicator.remove();
         
-        updateDebug('Got data: ' + (data.response ? data.response.substring(0, 20) + '...' : 'No response'));
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
         
-        if (data.response) {
-          // Display bot message
-          const botDiv = document.createElement('div');
-          botDiv.className = 'bot-message';
-          botDiv.innerHTML = data.response.replace(/\n/g, '<br>');
-          chatContainer.appendChild(botDiv);
-          
-          // Scroll to bottom
-          chatContainer.scrollTop = chatContainer.scrollHeight;
-          
-          // Play audio if available
-          if (data.audio_url) {
-            const audio = new Audio(data.audio_url);
-            audio.play().catch(e => console.error('Audio error:', e));
-          }
+        function read() {
+          return reader.read().then(({ done, value }) => {
+            if (done) return;
+            
+            buffer += decoder.decode(value, { stream: true });
+            
+            // SSE frames are separated by a blank line
+            let boundary = buffer.indexOf('\n\n');
+            while (boundary !== -1) {
+              const frame = buffer.slice(0, boundary);
+              buffer = buffer.slice(boundary + 2);
+              frame.split('\n')
+                .filter(line => line.startsWith('data: '))
+                .forEach(line => handleEvent(JSON.parse(line.slice(6))));
+              boundary = buffer.indexOf('\n\n');
+            }
+            return read();
+          });
         }
+        return read();
       })
       .catch(error => {
         updateDebug('Error: ' + error.message);
         
-        // Remove loading indicator
-        const loadingIndicator = document.querySelector('.loading-indicator');
-        if (loadingIndicator) loadingIndicator.remove();
+        removeLoading();
         
         // Display error message
         const errorDiv = document.createElement('div');
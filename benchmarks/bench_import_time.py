@@ -0,0 +1,40 @@
+"""
+Check that importing app.py stays within an import-time budget.
+
+The module is imported in a fresh interpreter with fast boot enabled, so the
+measurement covers everything a worker restart pays before it can serve.
+Exits non-zero if the import takes longer than the budget. The same budget is
+checked by tests/test_import_time.py as part of the test suite.
+
+Usage:
+    python benchmarks/bench_import_time.py [budget_seconds]
+"""
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run app.py under a module name that does not clash with the app/ package
+IMPORT_SNIPPET = """
+import time, runpy
+start = time.perf_counter()
+runpy.run_path('app.py', run_name='smv_app')
+print(time.perf_counter() - start)
+"""
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else float(os.getenv('IMPORT_BUDGET_SECONDS', 3.0))
+    env = dict(os.environ, SMV_FAST_BOOT='true')
+    result = subprocess.run(
+        [sys.executable, '-c', IMPORT_SNIPPET],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    elapsed = float(result.stdout.decode().strip().splitlines()[-1])
+    print(f"app.py import time: {elapsed * 1000:.0f} ms (budget {budget * 1000:.0f} ms)")
+    if elapsed > budget:
+        print("Import-time budget exceeded")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
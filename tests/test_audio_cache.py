@@ -0,0 +1,40 @@
+import time
+from app.helpers.audio_cache import AudioCache
+
+def test_flush_merges_entries_of_other_workers(tmp_path):
+    # Two caches on one directory stand in for two worker processes
+    first, second = AudioCache(str(tmp_path)), AudioCache(str(tmp_path))
+    first.put_bytes('a.mp3', b'a' * 10)
+    second.put_bytes('b.mp3', b'b' * 10)
+    first.flush()
+    second.flush()
+    assert set(AudioCache(str(tmp_path))._index) == {'a.mp3', 'b.mp3'}
+
+def test_byte_budget_holds_across_workers(tmp_path):
+    first = AudioCache(str(tmp_path), max_bytes=250)
+    second = AudioCache(str(tmp_path), max_bytes=250)
+    for i in range(2):
+        first.put_bytes(f'first{i}.mp3', b'x' * 100)
+        time.sleep(0.01)
+    first.flush()
+    time.sleep(0.01)
+    second.put_bytes('second.mp3', b'x' * 100)
+    second.evict()
+    second.flush(force=True)
+    files = {path.name for path in tmp_path.glob('*.mp3')}
+    assert sum(path.stat().st_size for path in tmp_path.glob('*.mp3')) <= 250
+    # The least recently used file went, even though another worker wrote it
+    assert files == {'first1.mp3', 'second.mp3'}
+    # The worker that wrote it treats it as a miss instead of serving a missing file
+    assert first.lookup('first0.mp3') is None
+
+def test_pins_are_shared_between_workers(tmp_path):
+    first = AudioCache(str(tmp_path), max_bytes=150)
+    first.put_bytes('phrase.mp3', b'x' * 100)
+    first.pin('phrase.mp3')
+    first.flush(force=True)
+    second = AudioCache(str(tmp_path), max_bytes=150)
+    time.sleep(0.01)
+    second.put_bytes('reply.mp3', b'x' * 100)
+    assert (tmp_path / 'phrase.mp3').exists()
+    assert not (tmp_path / 'reply.mp3').exists()
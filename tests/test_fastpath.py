@@ -0,0 +1,47 @@
+import pytest
+from app.helpers.fastpath import FastPath
+
+DASHBOARD = {
+    'battery_percentage': 82,
+    'last_service': '2024-01-10',
+    'next_service': '2024-04-10',
+    'vehicle_number': 'UP32 AB 1234',
+    'driver_rating': 4.8
+}
+
+@pytest.fixture
+def fast_path():
+    return FastPath(enabled=True)
+
+@pytest.mark.parametrize('message', [
+    "What is my battery percentage?",
+    "How much battery is left?",
+    "battery kitni hai",
+    "बैटरी कितनी है",
+])
+def test_battery_status_questions_are_answered(fast_path, message):
+    assert fast_path.answer(message, DASHBOARD) == "Your battery is at 82%."
+
+@pytest.mark.parametrize('message', [
+    "how do I charge my battery",
+    "how charge battery",
+    "battery level of my phone",
+    "what is the battery percentage of my mobile",
+    "why is my battery level dropping",
+    "battery charging status",
+    "battery ki life kitni hai",
+    "battery warranty",
+])
+def test_battery_false_positives_fall_through(fast_path, message):
+    assert fast_path.answer(message, DASHBOARD) is None
+
+def test_other_rules_still_answer(fast_path):
+    assert fast_path.answer("what is my vehicle number", DASHBOARD) == "Your vehicle number is UP32 AB 1234."
+    assert fast_path.answer("next service kab hai", DASHBOARD) == "Your next service is due on 2024-04-10."
+
+@pytest.mark.parametrize('message', [
+    "how do I charge my battery",
+    "battery level of my phone",
+])
+def test_battery_exclusions_do_not_depend_on_confidence(message):
+    assert FastPath(min_confidence=0.5, enabled=True).answer(message, DASHBOARD) is None
@@ -0,0 +1,28 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Worker restarts pay this before serving; see benchmarks/bench_import_time.py
+IMPORT_BUDGET_SECONDS = float(os.getenv('IMPORT_BUDGET_SECONDS', 3.0))
+
+# Run app.py under a module name that does not clash with the app/ package
+IMPORT_SNIPPET = """
+import time, runpy
+start = time.perf_counter()
+runpy.run_path('app.py', run_name='smv_app')
+print(time.perf_counter() - start)
+"""
+
+def test_app_import_stays_within_budget():
+    env = dict(os.environ, SMV_FAST_BOOT='true')
+    result = subprocess.run(
+        [sys.executable, '-c', IMPORT_SNIPPET],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    assert result.returncode == 0, result.stderr.decode()
+    elapsed = float(result.stdout.decode().strip().splitlines()[-1])
+    assert elapsed <= IMPORT_BUDGET_SECONDS, (
+        f"app.py import took {elapsed * 1000:.0f} ms (budget {IMPORT_BUDGET_SECONDS * 1000:.0f} ms)"
+    )
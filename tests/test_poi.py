@@ -0,0 +1,46 @@
+import math
+import random
+import time
+import pytest
+from app.helpers.poi import POIIndex, haversine_km
+
+def brute_force(places, lat, lon, k, max_km):
+    found = sorted(
+        (haversine_km(lat, lon, place_lat, place_lon), place_lat, place_lon, name)
+        for place_lat, place_lon, name in places
+    )
+    best, names = [], set()
+    for distance, place_lat, place_lon, name in found:
+        if distance <= max_km and name not in names:
+            names.add(name)
+            best.append((distance, place_lat, place_lon, name))
+    return best[:k]
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(7)
+    places = [(26.85 + rng.uniform(-0.2, 0.2), 80.95 + rng.uniform(-0.2, 0.2), f"School {i}") for i in range(500)]
+    index = POIIndex({'schools': [list(place) for place in places]})
+    for _ in range(50):
+        lat, lon = 26.85 + rng.uniform(-0.25, 0.25), 80.95 + rng.uniform(-0.25, 0.25)
+        assert index.nearest(lat, lon, 'schools', k=3, max_km=5) == brute_force(places, lat, lon, 3, 5)
+
+def test_nearest_near_the_pole_is_fast():
+    index = POIIndex({'schools': [[89.49, 10.2, "Polar School"], [26.85, 80.95, "APS Academy"]]})
+    started = time.perf_counter()
+    result = index.nearest(89.5, 10, 'schools', k=2, max_km=5)
+    assert time.perf_counter() - started < 1.0
+    assert [name for _, _, _, name in result] == ["Polar School"]
+
+@pytest.mark.parametrize('lat, lon, max_km', [
+    (math.nan, 80.9, 5),
+    (26.8, math.nan, 5),
+    (26.8, 80.9, math.nan),
+    (26.8, 80.9, math.inf),
+    (26.8, 80.9, 0),
+    (91, 80.9, 5),
+    (26.8, 181, 5),
+])
+def test_nearest_rejects_invalid_queries(lat, lon, max_km):
+    index = POIIndex({'schools': [[26.85, 80.95, "APS Academy"]]})
+    with pytest.raises(ValueError):
+        index.nearest(lat, lon, 'schools', max_km=max_km)
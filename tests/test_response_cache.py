@@ -0,0 +1,12 @@
+from app.helpers.response_cache import ResponseCache, normalize_message
+
+def test_stretched_letters_are_collapsed():
+    assert normalize_message("Hiiii!!") == normalize_message("hi")
+
+def test_numbers_are_not_collapsed():
+    assert normalize_message("route for 1000 km") != normalize_message("route for 10 km")
+    assert normalize_message("service at 111") != normalize_message("service at 1")
+
+def test_different_numbers_have_different_keys():
+    cache = ResponseCache()
+    assert cache.key("how far is 1000 km", 'ctx', False) != cache.key("how far is 10 km", 'ctx', False)
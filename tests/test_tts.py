@@ -0,0 +1,47 @@
+import pytest
+from app.helpers import tts
+
+class FakeTTS:
+    """Stands in for gTTS and records the text of every synthesis call."""
+    calls = []
+
+    def __init__(self, text, lang, slow):
+        self.text = text
+        FakeTTS.calls.append(text)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.text.encode())
+
+@pytest.fixture
+def fake_gtts(monkeypatch):
+    FakeTTS.calls = []
+    monkeypatch.setattr(tts, 'gTTS', FakeTTS)
+    return FakeTTS.calls
+
+def test_cold_sentence_with_tokens_is_synthesized_whole(fake_gtts, tmp_path):
+    sentence = "It is 1.5 km away, 10 minutes."
+    tts.synthesize_segment(sentence, 'en', False, str(tmp_path))
+    assert fake_gtts == [sentence]
+
+def test_sentence_with_cached_tokens_is_spliced(fake_gtts, tmp_path):
+    cache_dir = str(tmp_path)
+    tts.synthesize_segment("1.5 km", 'en', False, cache_dir)
+    tts.synthesize_segment("10 minutes", 'en', False, cache_dir)
+    fake_gtts.clear()
+    tts.synthesize_segment("The station is 1.5 km away, about 10 minutes.", 'en', False, cache_dir)
+    # Two novel parts would take two calls, so the sentence is synthesized whole
+    assert fake_gtts == ["The station is 1.5 km away, about 10 minutes."]
+    fake_gtts.clear()
+    tts.synthesize_segment("It is 1.5 km", 'en', False, cache_dir)
+    assert fake_gtts == ["It is"]
+
+@pytest.mark.parametrize('text', [
+    "x" * 450,
+    "word " * 100,
+    "one, two, three " * 30,
+], ids=['no-boundary', 'words', 'clauses'])
+def test_long_sentences_are_split_within_max_length(text):
+    segments = tts.split_into_sentences(text)
+    assert all(0 < len(segment) <= tts.MAX_SEGMENT_LENGTH for segment in segments)
+    assert "".join(segments).replace(" ", "") == text.replace(" ", "")